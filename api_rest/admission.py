@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Contrôle d'admission de l'API: limitation de débit et plafonds de concurrence
+- Débit: seau à jetons par (token API, adresse IP) et par route. Un client qui
+  dépasse reçoit immédiatement 429 + Retry-After au lieu de charger MariaDB.
+  Mémoire locale par défaut (par worker gunicorn: la limite effective est
+  multipliée par le nombre de workers), ou Redis partagé (RATE_LIMIT_BACKEND=redis://...).
+- Concurrence: nombre maximal de requêtes en cours par route et par worker;
+  au-delà, 503 + Retry-After tout de suite plutôt qu'une file d'attente.
+
+Configuration (routes = nom des fonctions: dashboard, history, export_data, list_photos...):
+    RATE_LIMITS="history=5/20,export_data=0.2/2"     jetons par seconde / capacité du seau
+    CONCURRENCY_LIMITS="history=8,export_data=2"
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_KEYS = 50000        # seaux gardés en mémoire (les plus anciens sont oubliés)
+
+
+def parse_rates(text):
+    """ "route=taux/capacité,..." -> {route: (taux, capacité)}
+
+    ValueError au démarrage si un taux n'est pas > 0 ou une capacité < 1 (le seau
+    ne délivrerait jamais de jeton et Retry-After diviserait par zéro).
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        route, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        try:
+            rate = float(rate)
+            burst = float(burst) if burst else max(1.0, rate)     # capacité par défaut: 1 s de débit
+        except ValueError:
+            raise ValueError(f"RATE_LIMITS invalide: '{item}' (attendu: route=taux/capacité)")
+        if not rate > 0:
+            raise ValueError(f"RATE_LIMITS invalide: '{item}' (taux > 0 requis)")
+        if not burst >= 1:
+            raise ValueError(f"RATE_LIMITS invalide: '{item}' (capacité >= 1 requise)")
+        limits[route.strip()] = (rate, burst)
+    return limits
+
+
+def parse_caps(text):
+    """ "route=n,..." -> {route: n}"""
+    caps = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        route, _, value = item.partition("=")
+        caps[route.strip()] = int(value)
+    return caps
+
+
+class MemoryBuckets:
+    """Seaux à jetons en mémoire du processus"""
+
+    def __init__(self, max_keys=MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # clé -> [jetons, time.monotonic()]
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Consomme un jeton; retourne (accepté, jetons restants)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, bucket[0]
+            return False, bucket[0]
+
+
+class RedisBuckets:
+    """Seaux partagés entre workers et machines (script Lua atomique, horloge du serveur Redis)"""
+
+    SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HMSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        try:
+            allowed, tokens = self.script(keys=[f"ratelimit:{key}"], args=[rate, burst])
+            return bool(allowed), float(tokens)
+        except Exception as e:
+            # Redis indisponible: on laisse passer plutôt que de bloquer toute l'API
+            logger.warning(f"Limiteur Redis indisponible: {e}")
+            return True, burst
+
+
+def make_backend(spec):
+    if spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBuckets(spec)
+    return MemoryBuckets()
+
+
+class Ticket:
+    """Résultat d'admission: `failure` = (corps, code, en-têtes) si refusé; release() libère la place"""
+
+    __slots__ = ("failure", "_cap", "_released")
+
+    def __init__(self, failure=None, cap=None):
+        self.failure = failure
+        self._cap = cap
+        self._released = False
+
+    def release(self):
+        if self._cap is not None and not self._released:
+            self._released = True
+            self._cap.release()
+
+
+class Admission:
+    def __init__(self, rates, caps, backend=None, enabled=True):
+        self.rates = rates
+        self.caps = {route: threading.BoundedSemaphore(n) for route, n in caps.items() if n > 0}
+        self.backend = backend or MemoryBuckets()
+        self.enabled = enabled
+        self.stats = {"rate_limited": 0, "overloaded": 0}
+
+    def admit(self, route, client):
+        """Décide tout de suite (jamais d'attente); `client` = identité du demandeur (token|IP)"""
+        if not self.enabled:
+            return Ticket()
+
+        limit = self.rates.get(route)
+        if limit is not None:
+            rate, burst = limit
+            allowed, tokens = self.backend.take(f"{route}|{client}", rate, burst)
+            if not allowed:
+                self.stats["rate_limited"] += 1
+                retry_after = max(1, math.ceil((1 - tokens) / rate))
+                return Ticket(({"error": "Too many requests"}, 429, {"Retry-After": str(retry_after)}))
+
+        cap = self.caps.get(route)
+        if cap is not None:
+            if not cap.acquire(blocking=False):
+                self.stats["overloaded"] += 1
+                return Ticket(({"error": "Server busy"}, 503, {"Retry-After": "1"}))
+            return Ticket(cap=cap)
+        return Ticket()
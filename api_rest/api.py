@@ -9,11 +9,16 @@ Corrections apportées:
 - Validation des paramètres
 - Configuration flexible
 """
-from flask import Flask, jsonify, request, render_template, send_file
+from flask import Flask, Response, g, jsonify, request, render_template, send_file, make_response, stream_with_context
 from flask_cors import CORS
+from flask_sock import Sock
 import functools
-import hmac
 import os
+import queue
+import tempfile
+import threading
+import time
+import zlib
 import pymysql
 import paho.mqtt.publish as publish
 import logging
@@ -34,85 +39,208 @@ CORS(app, resources={
     }
 })
 
-# Configuration DB (avec variables d'environnement)
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_USER = os.getenv("DB_USER", "apiuser")
-DB_PASS = os.getenv("DB_PASS", "apipass")
-DB_NAME = os.getenv("DB_NAME", "serverroom")
+sock = Sock(app)
+
+# Configuration, validateurs et photos partagés avec api_async.py
+from common import (  # noqa: E402
+    DB_HOST, DB_USER, DB_PASS, DB_NAME, MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASS, WS_QUEUE_SIZE,
+    VERSION_REFRESH, METRICS_PUBLIC, PHOTO_DIR, RECENT_PHOTOS, PHOTO_CACHE_MAX_AGE, THUMB_QUALITY, THUMB_SIZES,
+    derivative_dimensions, derivative_path, VALID_SENSORS, MAX_HISTORY_LIMIT, MIN_HISTORY_LIMIT,
+    validate_sensor, validate_state, safe_filename, location_filter, location_clause, export_params,
+    recent_photos, cache_photo, photos_version,
+)
+from services import (  # noqa: E402
+    registry, REQUEST_DURATION, REQUEST_ERRORS, DB_CONNECT_DURATION, DB_QUERY_DURATION, DB_ERRORS,
+    DB_IN_FLIGHT, MQTT_PUBLISH_DURATION, MQTT_PUBLISH_ERRORS,
+    ws_hub, query_cache, admission, get_ingest_watcher,
+)
+from auth import authenticate, check_request, token_store  # noqa: E402
+import export  # noqa: E402
+import response_encoding  # noqa: E402
+from query_cache import ALL_SENSORS  # noqa: E402
+
+# Pillow (optionnel): génération à la volée des miniatures manquantes (photos antérieures)
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
-# Configuration MQTT
-MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
-MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
-MQTT_USER = os.getenv("MQTT_USER", "dashboard")
-MQTT_PASS = os.getenv("MQTT_PASS", "dashpass")
 
-# Configuration API Tokens
-API_TOKENS = [t.strip() for t in os.getenv("API_TOKENS", "").split(",") if t.strip()]
-_single_token = os.getenv("API_TOKEN", "").strip()
-if _single_token:
-    API_TOKENS.append(_single_token)
+def require_api_token(fn):
+    """Décorateur pour exiger un token API valide (voir auth.py)"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.api_token, failure = authenticate(request.headers, request.args, request.remote_addr)
+        if failure is not None:
+            body, status = failure
+            return jsonify(body), status
 
-# Configuration Photos (chemin relatif au projet)
-BASE_DIR = Path(__file__).parent.parent
-PHOTO_DIR = Path(os.getenv("PHOTO_DIR", str(BASE_DIR / "camera_motion" / "photos")))
+        return fn(*args, **kwargs)
 
-# Types de capteurs valides
-VALID_SENSORS = ['temperature', 'humidity', 'light', 'distance', 'motion']
+    return wrapper
 
-# États valides pour alarme/buzzer
-VALID_STATES = ['ON', 'OFF']
 
-# Limites
-MAX_HISTORY_LIMIT = 1000
-MIN_HISTORY_LIMIT = 1
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
 
-def _extract_api_token():
-    """Extrait le token depuis les headers ou query params"""
-    # Priorité 1: Authorization Bearer (recommandé)
-    auth = request.headers.get("Authorization", "").strip()
-    if auth.lower().startswith("bearer "):
-        return auth[7:].strip()
+@app.after_request
+def record_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - start, route)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(route)
+    return response
 
-    # Priorité 2: X-API-KEY header
-    x_api_key = request.headers.get("X-API-KEY", "").strip()
-    if x_api_key:
-        return x_api_key
 
-    # Priorité 3: Query parameter (moins sécurisé, mais supporté)
-    token_qs = request.args.get("token", "").strip()
-    if token_qs:
-        logger.warning("Token utilisé via query parameter (moins sécurisé)")
-        return token_qs
+def timed_execute(cursor, query, sql, params):
+    """cursor.execute() mesuré sous le nom `query` (les curseurs bufferisés lisent tout le résultat)"""
+    start = time.perf_counter()
+    DB_IN_FLIGHT.inc()
+    try:
+        cursor.execute(sql, params)
+    except pymysql.Error:
+        DB_ERRORS.inc(query)
+        raise
+    finally:
+        DB_IN_FLIGHT.dec()
+        DB_QUERY_DURATION.observe(time.perf_counter() - start, query)
 
-    return ""
 
+def admission_control(fn):
+    """Décorateur: 429/503 immédiat si le client dépasse son débit ou si la route est saturée
 
-def require_api_token(fn):
-    """Décorateur pour exiger un token API valide"""
+    A placer après @require_api_token (la limite est par token et par IP).
+    La place est libérée à la fin de l'envoi de la réponse (y compris en flux).
+    """
     @functools.wraps(fn)
     def wrapper(*args, **kwargs):
-        if not API_TOKENS:
-            logger.error("API token not configured")
-            return jsonify({"error": "API token not configured"}), 500
+        ticket = admission.admit(fn.__name__, f"{g.api_token}|{request.remote_addr}")
+        if ticket.failure is not None:
+            body, status, headers = ticket.failure
+            return jsonify(body), status, headers
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except BaseException:
+            ticket.release()
+            raise
+        response.call_on_close(ticket.release)
+        return response
 
-        provided = _extract_api_token()
-        if not provided:
-            logger.warning(f"Tentative d'accès sans token: {request.remote_addr}")
-            return jsonify({"error": "Unauthorized"}), 401
+    return wrapper
 
-        # Comparaison sécurisée des tokens
-        if not any(hmac.compare_digest(provided, t) for t in API_TOKENS):
-            logger.warning(f"Token invalide depuis {request.remote_addr}")
-            return jsonify({"error": "Unauthorized"}), 401
 
-        return fn(*args, **kwargs)
-
-    return wrapper
+_db_version = {"seen": None, "id": None, "read_at": 0.0, "changed_at": 0.0}
+_db_version_lock = threading.Lock()
+
+
+def conditional(version_fn):
+    """Décorateur: réponse 304 si le client a déjà la version courante
+
+    version_fn(*args) retourne (version, last_modified), identique d'un worker à
+    l'autre pour les mêmes données, ou None si la version n'est pas connue; dans ce
+    cas l'ETag est un hash du corps (économise la bande passante mais pas la requête).
+    A placer après @require_api_token pour ne rien révéler sans token.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            current = version_fn(*args, **kwargs)
+            etag = last_modified = None
+            # Format et compression négociés font partie de la représentation
+            variant = response_encoding.variant(request.accept_mimetypes, request.accept_encodings)
+            if current is not None:
+                version, last_modified = current
+                query = zlib.crc32(request.query_string)
+                etag = f"{request.endpoint}-{version}-{query:x}{variant}"
+                if request.if_none_match.contains(etag) or (
+                        not request.if_none_match and request.if_modified_since
+                        and int(last_modified) <= request.if_modified_since.timestamp()):
+                    response = app.response_class(status=304)
+                    response.set_etag(etag)
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                    return response
+
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            if etag is not None:
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                return response
+            response.add_etag()
+            response.set_etag(response.get_etag()[0] + variant)
+            return response.make_conditional(request)
+
+        return wrapper
+    return decorator
+
+
+def data_version():
+    """Version des mesures: MAX(id) de sensor_data, identique pour tous les workers (None si inconnue)
+
+    Relue en base quand la surveillance MQTT a vu passer un message (ou toutes les
+    VERSION_REFRESH secondes), sinon servie sans requête.
+    """
+    watcher = get_ingest_watcher()
+    if watcher is None:
+        return None
+    seen = watcher.current()
+    if seen is None:
+        return None
+    with _db_version_lock:
+        state = _db_version
+        if state["seen"] != seen or time.monotonic() - state["read_at"] > VERSION_REFRESH:
+            conn = cursor = None
+            try:
+                conn = get_db()
+                cursor = conn.cursor()
+                # Clé primaire: lecture en O(1) quelle que soit la taille de la table
+                timed_execute(cursor, "version", "SELECT MAX(id) AS id FROM sensor_data", ())
+                max_id = cursor.fetchone()["id"] or 0
+            except pymysql.Error as e:
+                logger.error(f"Erreur lecture version: {e}")
+                return None
+            finally:
+                if cursor:
+                    cursor.close()
+                if conn:
+                    conn.close()
+            if max_id != state["id"]:
+                state["changed_at"] = time.time()
+            state.update(seen=seen, id=max_id, read_at=time.monotonic())
+        return state["id"], state["changed_at"]
+
+
+def publish_command(topic, state):
+    """Publie une commande d'actionneur (QoS 1)"""
+    start = time.perf_counter()
+    try:
+        publish.single(
+            topic,
+            payload=state,
+            hostname=MQTT_BROKER,
+            port=MQTT_PORT,
+            auth={'username': MQTT_USER, 'password': MQTT_PASS},
+            qos=1
+        )
+    except Exception:
+        MQTT_PUBLISH_ERRORS.inc(topic)
+        raise
+    finally:
+        MQTT_PUBLISH_DURATION.observe(time.perf_counter() - start, topic)
 
 
 def get_db():
     """Obtient une connexion à la base de données avec gestion d'erreurs"""
+    start = time.perf_counter()
     try:
         return pymysql.connect(
             host=DB_HOST,
@@ -123,38 +251,36 @@ def get_db():
             connect_timeout=5
         )
     except pymysql.Error as e:
+        DB_ERRORS.inc("connect")
         logger.error(f"Erreur de connexion DB: {e}")
         raise
-
-
-def validate_sensor(sensor):
-    """Valide que le type de capteur est valide"""
-    if sensor not in VALID_SENSORS:
-        raise ValueError(f"Capteur invalide: {sensor}. Valides: {', '.join(VALID_SENSORS)}")
-    return sensor
-
-
-def validate_state(state):
-    """Valide que l'état est valide"""
-    state_upper = state.upper()
-    if state_upper not in VALID_STATES:
-        raise ValueError(f"État invalide: {state}. Valides: {', '.join(VALID_STATES)}")
-    return state_upper
-
-
-def safe_filename(filename):
-    """Sécurise le nom de fichier pour éviter path traversal"""
-    # Normaliser le chemin
-    path = Path(filename)
-    # Ne garder que le nom de fichier (pas de répertoires)
-    safe_name = path.name
-    # Vérifier que c'est un .jpg
-    if not safe_name.endswith('.jpg'):
-        raise ValueError("Seuls les fichiers .jpg sont autorisés")
-    # Vérifier qu'il n'y a pas de caractères dangereux
-    if '..' in safe_name or '/' in safe_name or '\\' in safe_name:
-        raise ValueError("Nom de fichier invalide")
-    return safe_name
+    finally:
+        DB_CONNECT_DURATION.observe(time.perf_counter() - start)
+
+
+def encoded_response(body, fmt, headers=None):
+    """Réponse binaire au format négocié (voir response_encoding.py)"""
+    response = app.response_class(body, content_type=fmt, headers=headers)
+    response.vary.add('Accept')
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Compression gzip/brotli des réponses négociables (JSON, colonnes, HTML)"""
+    if response.mimetype not in response_encoding.COMPRESSIBLE:
+        return response
+    response.vary.add('Accept-Encoding')
+    coding = response_encoding.negotiate_coding(request.accept_encodings)
+    if (coding is None or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    data = response.get_data()
+    if len(data) < response_encoding.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(response_encoding.compress(data, coding))
+    response.headers['Content-Encoding'] = coding
+    return response
 
 
 # ========== DASHBOARD WEB ==========
@@ -182,17 +308,56 @@ def health():
     return jsonify({
         "status": "ok",
         "database": db_status,
-        "tokens_configured": len(API_TOKENS) > 0
+        "tokens_configured": len(token_store) > 0,
+        "cache": query_cache.snapshot(),
+        "admission": admission.stats
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métriques au format Prometheus (token requis sauf METRICS_PUBLIC=1)"""
+    if not METRICS_PUBLIC:
+        failure = check_request(request.headers, request.args, request.remote_addr)
+        if failure is not None:
+            body, status = failure
+            return jsonify(body), status
+    return app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 # ========== API ENDPOINTS ==========
 @app.route('/api/dashboard', methods=['GET'])
 @require_api_token
+@admission_control
+@conditional(lambda: data_version())
 def dashboard():
-    """Récupère les dernières valeurs de tous les capteurs"""
+    """Récupère les dernières valeurs de tous les capteurs (?room= &device= pour un seul lieu)"""
+    try:
+        room, device = location_filter(request.args)
+        result = query_cache.get(("dashboard", room, device), ALL_SENSORS, lambda: fetch_latest(room, device))
+        
+        fmt = response_encoding.negotiate_format(request.accept_mimetypes)
+        if fmt != response_encoding.JSON:
+            return encoded_response(response_encoding.encode_latest(result, fmt), fmt,
+                                    {'X-Sensors': ','.join(result)})
+        response = jsonify(result)
+        response.vary.add('Accept')
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except pymysql.Error as e:
+        logger.error(f"Erreur DB dashboard: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logger.error(f"Erreur inattendue dashboard: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+def fetch_latest(room=None, device=None):
+    """Dernière mesure de chaque capteur (None si absente ou en erreur)"""
     conn = None
     cursor = None
+    where, params = location_clause(room, device)
     try:
         conn = get_db()
         cursor = conn.cursor()
@@ -200,23 +365,18 @@ def dashboard():
         result = {}
         for sensor in VALID_SENSORS:
             try:
-                cursor.execute(
-                    "SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s ORDER BY timestamp DESC LIMIT 1",
-                    (sensor,)
+                timed_execute(
+                    cursor, "latest",
+                    f"SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s{where} "
+                    "ORDER BY timestamp DESC LIMIT 1",
+                    (sensor, *params)
                 )
                 row = cursor.fetchone()
                 result[sensor] = row if row else None
             except pymysql.Error as e:
                 logger.error(f"Erreur requête capteur {sensor}: {e}")
                 result[sensor] = None
-        
-        return jsonify(result)
-    except pymysql.Error as e:
-        logger.error(f"Erreur DB dashboard: {e}")
-        return jsonify({"error": "Database error"}), 500
-    except Exception as e:
-        logger.error(f"Erreur inattendue dashboard: {e}")
-        return jsonify({"error": "Internal server error"}), 500
+        return result
     finally:
         if cursor:
             cursor.close()
@@ -226,20 +386,14 @@ def dashboard():
 
 @app.route('/api/alarm', methods=['POST'])
 @require_api_token
+@admission_control
 def alarm_control():
     """Contrôle l'alarme via MQTT"""
     try:
         data = request.get_json() or {}
         state = validate_state(data.get('state', 'OFF'))
         
-        publish.single(
-            "server-room/alarm/cmd",
-            payload=state,
-            hostname=MQTT_BROKER,
-            port=MQTT_PORT,
-            auth={'username': MQTT_USER, 'password': MQTT_PASS},
-            qos=1
-        )
+        publish_command("server-room/alarm/cmd", state)
         logger.info(f"Alarme commandée: {state}")
         return jsonify({"status": "ok", "alarm": state})
     except ValueError as e:
@@ -251,20 +405,14 @@ def alarm_control():
 
 @app.route('/api/buzzer', methods=['POST'])
 @require_api_token
+@admission_control
 def buzzer_control():
     """Contrôle le buzzer via MQTT"""
     try:
         data = request.get_json() or {}
         state = validate_state(data.get('state', 'OFF'))
         
-        publish.single(
-            "server-room/buzzer/cmd",
-            payload=state,
-            hostname=MQTT_BROKER,
-            port=MQTT_PORT,
-            auth={'username': MQTT_USER, 'password': MQTT_PASS},
-            qos=1
-        )
+        publish_command("server-room/buzzer/cmd", state)
         logger.info(f"Buzzer commandé: {state}")
         return jsonify({"status": "ok", "buzzer": state})
     except ValueError as e:
@@ -276,13 +424,14 @@ def buzzer_control():
 
 @app.route('/api/history/<sensor>', methods=['GET'])
 @require_api_token
+@admission_control
+@conditional(lambda sensor: data_version())
 def history(sensor):
-    """Récupère l'historique d'un capteur"""
-    conn = None
-    cursor = None
+    """Récupère l'historique d'un capteur (?room= &device= pour un seul lieu)"""
     try:
-        # Valider le capteur
+        # Valider le capteur et le lieu
         sensor = validate_sensor(sensor)
+        room, device = location_filter(request.args)
         
         # Valider et limiter le paramètre limit
         limit = request.args.get('limit', 100, type=int)
@@ -291,15 +440,15 @@ def history(sensor):
         elif limit > MAX_HISTORY_LIMIT:
             limit = MAX_HISTORY_LIMIT
         
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s ORDER BY timestamp DESC LIMIT %s",
-            (sensor, limit)
-        )
-        rows = cursor.fetchall()
+        rows = query_cache.get(("history", sensor, limit, room, device), sensor,
+                               lambda: fetch_history(sensor, limit, room, device))
         
-        return jsonify(rows)
+        fmt = response_encoding.negotiate_format(request.accept_mimetypes)
+        if fmt != response_encoding.JSON:
+            return encoded_response(response_encoding.encode_rows(rows, fmt), fmt)
+        response = jsonify(rows)
+        response.vary.add('Accept')
+        return response
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except pymysql.Error as e:
@@ -308,6 +457,22 @@ def history(sensor):
     except Exception as e:
         logger.error(f"Erreur inattendue history: {e}")
         return jsonify({"error": "Internal server error"}), 500
+
+
+def fetch_history(sensor, limit, room=None, device=None):
+    """Les `limit` dernières mesures d'un capteur, de la plus récente à la plus ancienne"""
+    conn = None
+    cursor = None
+    where, params = location_clause(room, device)
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        timed_execute(
+            cursor, "history",
+            f"SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s{where} ORDER BY timestamp DESC LIMIT %s",
+            (sensor, *params, limit)
+        )
+        return cursor.fetchall()
     finally:
         if cursor:
             cursor.close()
@@ -315,50 +480,184 @@ def history(sensor):
             conn.close()
 
 
+@app.route('/api/export', methods=['GET'])
+@require_api_token
+@admission_control
+def export_data():
+    """Export en flux (CSV, NDJSON, Parquet) sans limite de lignes
+
+    ?format=csv|ndjson|parquet &sensor=temperature,humidity &start=2026-01-01 &end=2026-02-01 &room= &device=
+    Réponse chunked: la mémoire utilisée ne dépend pas de la période (voir export.py).
+    """
+    try:
+        encoder, filters = export_params(request.args)
+        conn = get_db()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    except pymysql.Error as e:
+        logger.error(f"Erreur DB export: {e}")
+        return jsonify({"error": "Database error"}), 500
+
+    def generate():
+        try:
+            yield from export.stream(conn, encoder, **filters)
+        except pymysql.Error as e:
+            # Les en-têtes sont déjà partis: le client voit une réponse tronquée
+            logger.error(f"Erreur DB pendant l'export: {e}")
+
+    filename = f"sensor_data.{encoder.extension}"
+    return Response(
+        stream_with_context(generate()),
+        content_type=encoder.content_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+# ========== WEBSOCKET ==========
+@sock.route('/api/ws')
+def ws_channel(ws):
+    """Canal bidirectionnel: mesures/photos en direct + commandes avec accusé (voir ws_hub.py)
+
+    Le token passe par ?token= (les navigateurs ne peuvent pas fixer d'en-tête WebSocket).
+    Chaque connexion occupe un thread: pour beaucoup de clients, préférer api_async.py.
+    """
+    failure = check_request(request.headers, request.args, request.remote_addr)
+    if failure is not None:
+        ws.close(reason=1008, message=failure[0]["error"])
+        return
+
+    get_ingest_watcher()
+    outbox = queue.Queue(maxsize=WS_QUEUE_SIZE)
+
+    def send(text):
+        try:
+            outbox.put_nowait(text)
+        except queue.Full:
+            pass  # client trop lent: on perd des mises à jour plutôt que de bloquer MQTT
+
+    def sender():
+        while True:
+            text = outbox.get()
+            if text is None:
+                return
+            try:
+                ws.send(text)
+            except Exception:
+                return
+
+    subscriber = ws_hub.register(send)
+    threading.Thread(target=sender, daemon=True).start()
+    try:
+        while True:
+            raw = ws.receive()
+            if raw is None:
+                continue
+            command = ws_hub.parse_command(subscriber, raw)
+            if command is None:
+                continue
+            try:
+                publish_command(command[0], command[1])
+                logger.info(f"Commande WebSocket {command[3]}: {command[1]}")
+                ws_hub.command_sent(subscriber, command)
+            except Exception as e:
+                logger.error(f"Erreur commande WebSocket: {e}")
+                ws_hub.command_failed(subscriber, command)
+    except Exception:
+        pass  # connexion fermée par le client
+    finally:
+        ws_hub.unregister(subscriber)
+        try:
+            outbox.put_nowait(None)
+        except queue.Full:
+            outbox.get_nowait()
+            outbox.put_nowait(None)
+
+
 # ========== ENDPOINTS PHOTOS ==========
 @app.route('/api/photos', methods=['GET'])
 @require_api_token
+@admission_control
+@conditional(photos_version)
 def list_photos():
     """Retourne les 3 dernières photos"""
     try:
         if not PHOTO_DIR.exists():
             return jsonify([])
-        
-        # Lister tous les fichiers .jpg
-        photos = [f for f in PHOTO_DIR.iterdir() if f.is_file() and f.suffix.lower() == '.jpg']
-        
-        # Trier par date de modification (plus récent d'abord)
-        photos.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-        
-        # Prendre les 3 dernières
-        recent_photos = photos[:3]
-        
+
         # Retourner avec timestamp
         result = []
-        for photo in recent_photos:
+        for photo in recent_photos(RECENT_PHOTOS):
             result.append({
-                'filename': photo.name,
-                'timestamp': photo.stat().st_mtime,
-                'url': f'/api/photo/{photo.name}'
+                'filename': photo['filename'],
+                'timestamp': photo['timestamp'],
+                'url': f"/api/photo/{photo['filename']}",
+                'thumb_url': f"/api/photo/{photo['filename']}?size=thumb"
             })
-        
+
         return jsonify(result)
     except Exception as e:
         logger.error(f"Erreur list_photos: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def ensure_derivative(source, filename, size):
+    """Retourne le chemin de la miniature, créée et mise en cache sur disque si besoin"""
+    path = Path(derivative_path(PHOTO_DIR, filename, size))
+    if path.is_file():
+        return path
+    if Image is None:
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Fichier temporaire propre à la requête: deux requêtes pour la même miniature
+    # écrivent chacune le leur, os.replace publie une image complète
+    tmp = tempfile.NamedTemporaryFile(dir=path.parent, suffix='.tmp', delete=False)
+    try:
+        with tmp, Image.open(source) as img:
+            small = img.resize(derivative_dimensions(img.width, img.height, size), Image.LANCZOS)
+            small.save(tmp, 'JPEG', quality=THUMB_QUALITY)
+        os.replace(tmp.name, path)
+    except Exception as e:
+        logger.warning(f"Miniature {size} impossible pour {filename}: {e}")
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
+        return None
+    return path
+
+
 @app.route('/api/photo/<filename>', methods=['GET'])
 @require_api_token
+@admission_control
 def get_photo(filename):
-    """Sert une photo spécifique avec protection path traversal"""
+    """Sert une photo spécifique avec protection path traversal
+
+    ?size=thumb|medium sert une miniature (repli sur l'original si indisponible).
+    """
     try:
         # Sécuriser le nom de fichier
         safe_name = safe_filename(filename)
         filepath = PHOTO_DIR / safe_name
-        
+        size = request.args.get('size', 'full')
+        if size != 'full' and size not in THUMB_SIZES:
+            raise ValueError(f"Taille invalide: {size}. Valides: full, {', '.join(THUMB_SIZES)}")
+
         if filepath.exists() and filepath.is_file():
-            return send_file(str(filepath), mimetype='image/jpeg')
+            fallback = False
+            if size != 'full':
+                derivative = ensure_derivative(filepath, safe_name, size)
+                fallback = derivative is None
+                filepath = derivative or filepath
+            # conditional=True: ETag/Last-Modified depuis le stat(), 304 sans lire le fichier
+            response = send_file(str(filepath), mimetype='image/jpeg', max_age=PHOTO_CACHE_MAX_AGE,
+                                 conditional=True, etag=True)
+            cache_photo(response, fallback)
+            return response
         else:
             return jsonify({'error': 'Photo not found'}), 404
     except ValueError as e:
@@ -382,11 +681,11 @@ def internal_error(error):
 
 if __name__ == '__main__':
     # Vérifier la configuration
-    if not API_TOKENS:
-        logger.warning("Aucun token API configuré! Utilisez API_TOKEN ou API_TOKENS")
+    if not len(token_store):
+        logger.warning("Aucun token API configuré! Utilisez API_TOKEN, API_TOKENS ou API_TOKENS_FILE")
     
     logger.info(f"API démarrée sur 0.0.0.0:5000")
-    logger.info(f"Tokens configurés: {len(API_TOKENS)}")
+    logger.info(f"Tokens configurés: {len(token_store)}")
     logger.info(f"Photo directory: {PHOTO_DIR}")
     
     app.run(host='0.0.0.0', port=5000, debug=False)
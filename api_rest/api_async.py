@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+Variante asynchrone (ASGI) de l'API REST
+Mêmes routes, mêmes contrats JSON et même authentification que api.py, mais les
+accès MariaDB (aiomysql) et MQTT (aiomqtt) ne bloquent aucun thread: des milliers
+de connexions inactives (SSE/WebSocket, tableaux de bord) ne coûtent que de la mémoire.
+
+Usage (depuis api_rest/):
+    uvicorn api_async:app --host 0.0.0.0 --port 5000 --workers 4
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+
+import aiomqtt
+import aiomysql
+import pymysql
+from quart import Quart, g, jsonify, make_response, request, render_template, send_file, websocket
+from quart.wrappers.response import DataBody
+from quart_cors import cors
+
+# Configuration, validateurs, photos et services partagés avec la version Flask (sans importer Flask)
+from common import (
+    DB_HOST, DB_USER, DB_PASS, DB_NAME,
+    MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASS,
+    PHOTO_DIR, RECENT_PHOTOS, THUMB_SIZES, derivative_path, cache_photo,
+    VALID_SENSORS, MAX_HISTORY_LIMIT, MIN_HISTORY_LIMIT,
+    WS_QUEUE_SIZE, validate_sensor, validate_state, safe_filename, recent_photos,
+    location_filter, location_clause, export_params, METRICS_PUBLIC, VERSION_REFRESH, photos_version,
+)
+from services import (
+    get_ingest_watcher, ws_hub, query_cache, admission,
+    registry, REQUEST_DURATION, REQUEST_ERRORS, DB_QUERY_DURATION, DB_ERRORS,
+    MQTT_PUBLISH_DURATION, MQTT_PUBLISH_ERRORS,
+)
+from auth import authenticate, check_request, token_store
+import export
+import response_encoding
+from query_cache import ALL_SENSORS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Taille du pool de connexions MariaDB par worker
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+app = Quart(__name__)
+app = cors(
+    app,
+    allow_origin=os.getenv("CORS_ORIGINS", "*").split(","),
+    allow_methods=["GET", "POST"],
+    allow_headers=["Content-Type", "Authorization", "X-API-KEY"],
+)
+
+db_pool = None
+db_pool_lock = asyncio.Lock()
+mqtt_client = None
+mqtt_lock = asyncio.Lock()
+_db_version = {"seen": None, "id": None, "read_at": 0.0, "changed_at": 0.0}
+_db_version_lock = asyncio.Lock()
+
+# Pool aiomysql de ce worker (la version Flask n'a pas de pool)
+registry.callback("db_pool_size", "Connexions ouvertes du pool", lambda: db_pool.size if db_pool else 0)
+registry.callback("db_pool_free", "Connexions libres du pool", lambda: db_pool.freesize if db_pool else 0)
+
+
+@app.before_request
+async def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+async def record_request(response):
+    start = g.get('request_start')
+    if start is not None:
+        route = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(time.perf_counter() - start, route)
+        if response.status_code >= 500:
+            REQUEST_ERRORS.inc(route)
+    return response
+
+
+async def timed_execute(cursor, query, sql, params):
+    """Même mesure que api.timed_execute"""
+    start = time.perf_counter()
+    try:
+        await cursor.execute(sql, params)
+    except pymysql.Error:
+        DB_ERRORS.inc(query)
+        raise
+    finally:
+        DB_QUERY_DURATION.observe(time.perf_counter() - start, query)
+
+
+def require_api_token(fn):
+    """Décorateur pour exiger un token API valide (mêmes règles que api.py, voir auth.py)"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        g.api_token, failure = authenticate(request.headers, request.args, request.remote_addr)
+        if failure is not None:
+            body, status = failure
+            return jsonify(body), status
+
+        return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def admission_control(fn):
+    """Décorateur: mêmes limites que api.py (voir admission.py)
+
+    La place est libérée au retour de la vue: pour /api/export, c'est la taille
+    du pool aiomysql (DB_POOL_MAX) qui borne les lectures en cours.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        ticket = admission.admit(fn.__name__, f"{g.api_token}|{request.remote_addr}")
+        if ticket.failure is not None:
+            body, status, headers = ticket.failure
+            return jsonify(body), status, headers
+
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            ticket.release()
+
+    return wrapper
+
+
+def conditional(version_fn):
+    """Décorateur: réponse 304 si le client a déjà la version courante (mêmes ETag que api.conditional)
+
+    version_fn(*args) est une coroutine qui retourne (version, last_modified) ou None;
+    dans ce cas l'ETag est un hash du corps. A placer après @require_api_token.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            current = await version_fn(*args, **kwargs)
+            etag = last_modified = None
+            variant = response_encoding.variant(request.accept_mimetypes, request.accept_encodings)
+            if current is not None:
+                version, last_modified = current
+                query = zlib.crc32(request.query_string)
+                etag = f"{request.endpoint}-{version}-{query:x}{variant}"
+                if request.if_none_match.contains(etag) or (
+                        not request.if_none_match and request.if_modified_since
+                        and int(last_modified) <= request.if_modified_since.timestamp()):
+                    response = app.response_class("", status=304)
+                    response.set_etag(etag)
+                    response.cache_control.private = True
+                    response.cache_control.no_cache = True
+                    return response
+
+            response = await make_response(await fn(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            if etag is not None:
+                response.set_etag(etag)
+                response.last_modified = last_modified
+                return response
+            await response.add_etag()
+            response.set_etag(response.get_etag()[0] + variant)
+            return await response.make_conditional(request)
+
+        return wrapper
+    return decorator
+
+
+async def data_version():
+    """Même version que api.data_version (MAX(id) de sensor_data), lue via le pool"""
+    watcher = get_ingest_watcher()
+    if watcher is None:
+        return None
+    seen = watcher.current()
+    if seen is None:
+        return None
+    async with _db_version_lock:
+        state = _db_version
+        if state["seen"] != seen or time.monotonic() - state["read_at"] > VERSION_REFRESH:
+            try:
+                pool = await get_pool()
+                async with pool.acquire() as conn:
+                    async with conn.cursor() as cursor:
+                        await timed_execute(cursor, "version", "SELECT MAX(id) AS id FROM sensor_data", ())
+                        row = await cursor.fetchone()
+            except pymysql.Error as e:
+                logger.error(f"Erreur lecture version: {e}")
+                return None
+            max_id = row["id"] or 0
+            if max_id != state["id"]:
+                state["changed_at"] = time.time()
+            state.update(seen=seen, id=max_id, read_at=time.monotonic())
+        return state["id"], state["changed_at"]
+
+
+async def photo_dir_version(*args):
+    """photos_version hors de la boucle d'événements (stat() bloquant)"""
+    return await asyncio.to_thread(photos_version)
+
+
+@app.before_serving
+async def startup():
+    global db_pool
+    # Invalidation du cache (et WebSocket) par la surveillance MQTT
+    get_ingest_watcher()
+    # Un seul pool même si plusieurs premières requêtes arrivent ensemble
+    async with db_pool_lock:
+        if db_pool is not None:
+            return
+        try:
+            db_pool = await aiomysql.create_pool(
+                host=DB_HOST,
+                user=DB_USER,
+                password=DB_PASS,
+                db=DB_NAME,
+                minsize=DB_POOL_MIN,
+                maxsize=DB_POOL_MAX,
+                cursorclass=aiomysql.DictCursor,
+                autocommit=True,
+                connect_timeout=5
+            )
+        except pymysql.Error as e:
+            # L'API démarre quand même (health le signale), le pool sera recréé à la demande
+            logger.error(f"Erreur de connexion DB: {e}")
+
+
+@app.after_serving
+async def shutdown():
+    if db_pool is not None:
+        db_pool.close()
+        await db_pool.wait_closed()
+    if mqtt_client is not None:
+        try:
+            await mqtt_client.__aexit__(None, None, None)
+        except aiomqtt.MqttError:
+            pass
+
+
+async def get_pool():
+    """Pool aiomysql, recréé s'il n'a pas pu l'être au démarrage"""
+    if db_pool is None:
+        await startup()
+        if db_pool is None:
+            raise pymysql.err.OperationalError(2003, "Database unavailable")
+    return db_pool
+
+
+async def mqtt_publish(topic, payload, qos=1):
+    """Publie via une connexion MQTT persistante (reconnexion unique en cas d'erreur)"""
+    start = time.perf_counter()
+    try:
+        await _mqtt_publish(topic, payload, qos)
+    except Exception:
+        MQTT_PUBLISH_ERRORS.inc(topic)
+        raise
+    finally:
+        MQTT_PUBLISH_DURATION.observe(time.perf_counter() - start, topic)
+
+
+async def _mqtt_publish(topic, payload, qos):
+    global mqtt_client
+    async with mqtt_lock:
+        for attempt in range(2):
+            if mqtt_client is None:
+                client = aiomqtt.Client(MQTT_BROKER, MQTT_PORT, username=MQTT_USER, password=MQTT_PASS)
+                await client.__aenter__()
+                mqtt_client = client
+            try:
+                await mqtt_client.publish(topic, payload=payload, qos=qos)
+                return
+            except aiomqtt.MqttError:
+                mqtt_client = None
+                if attempt:
+                    raise
+
+
+def negotiated(body_fn, data, headers=None):
+    """JSON par défaut, sinon corps binaire au format négocié (voir response_encoding.py)"""
+    fmt = response_encoding.negotiate_format(request.accept_mimetypes)
+    if fmt == response_encoding.JSON:
+        response = jsonify(data)
+    else:
+        response = app.response_class(body_fn(data, fmt), content_type=fmt, headers=headers)
+    response.vary.add('Accept')
+    return response
+
+
+@app.after_request
+async def compress_response(response):
+    """Compression gzip/brotli (mêmes règles que api.py); les flux et fichiers sont laissés tels quels"""
+    if response.mimetype not in response_encoding.COMPRESSIBLE:
+        return response
+    response.vary.add('Accept-Encoding')
+    coding = response_encoding.negotiate_coding(request.accept_encodings)
+    if (coding is None or response.status_code != 200 or not isinstance(response.response, DataBody)
+            or 'Content-Encoding' in response.headers):
+        return response
+    data = await response.get_data()
+    if len(data) < response_encoding.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(response_encoding.compress(data, coding))
+    response.headers['Content-Encoding'] = coding
+    return response
+
+
+# ========== DASHBOARD WEB ==========
+@app.route('/')
+async def index():
+    try:
+        return await render_template('index.html')
+    except Exception as e:
+        logger.error(f"Erreur rendu template: {e}")
+        return jsonify({"error": "Template not found"}), 404
+
+
+@app.route('/api/health', methods=['GET'])
+async def health():
+    """Endpoint de santé (sans authentification)"""
+    db_status = "unknown"
+    try:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await conn.ping()
+        db_status = "ok"
+    except Exception as e:
+        logger.error(f"DB health check failed: {e}")
+        db_status = "error"
+
+    return jsonify({
+        "status": "ok",
+        "database": db_status,
+        "tokens_configured": len(token_store) > 0,
+        "cache": query_cache.snapshot(),
+        "admission": admission.stats
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    """Métriques au format Prometheus (token requis sauf METRICS_PUBLIC=1)"""
+    if not METRICS_PUBLIC:
+        failure = check_request(request.headers, request.args, request.remote_addr)
+        if failure is not None:
+            body, status = failure
+            return jsonify(body), status
+    return app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ========== API ENDPOINTS ==========
+@app.route('/api/dashboard', methods=['GET'])
+@require_api_token
+@admission_control
+@conditional(lambda: data_version())
+async def dashboard():
+    """Récupère les dernières valeurs de tous les capteurs (?room= &device= pour un seul lieu)"""
+    try:
+        room, device = location_filter(request.args)
+        result = await query_cache.aget(("dashboard", room, device), ALL_SENSORS, lambda: fetch_latest(room, device))
+
+        return negotiated(response_encoding.encode_latest, result, {'X-Sensors': ','.join(result)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except pymysql.Error as e:
+        logger.error(f"Erreur DB dashboard: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logger.error(f"Erreur inattendue dashboard: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+async def fetch_latest(room=None, device=None):
+    """Dernière mesure de chaque capteur (None si absente ou en erreur)"""
+    pool = await get_pool()
+    where, params = location_clause(room, device)
+    result = {}
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            for sensor in VALID_SENSORS:
+                try:
+                    await timed_execute(
+                        cursor, "latest",
+                        f"SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s{where} "
+                        "ORDER BY timestamp DESC LIMIT 1",
+                        (sensor, *params)
+                    )
+                    row = await cursor.fetchone()
+                    result[sensor] = row if row else None
+                except pymysql.Error as e:
+                    logger.error(f"Erreur requête capteur {sensor}: {e}")
+                    result[sensor] = None
+    return result
+
+
+async def command(topic, name):
+    """Commande ON/OFF d'un actionneur via MQTT (alarme, buzzer)"""
+    try:
+        data = await request.get_json(silent=True) or {}
+        state = validate_state(data.get('state', 'OFF'))
+
+        await mqtt_publish(topic, state, qos=1)
+        logger.info(f"{name.capitalize()} commandé: {state}")
+        return jsonify({"status": "ok", name: state})
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur contrôle {name}: {e}")
+        return jsonify({"status": "error", "message": "MQTT error"}), 500
+
+
+@app.route('/api/alarm', methods=['POST'])
+@require_api_token
+@admission_control
+async def alarm_control():
+    """Contrôle l'alarme via MQTT"""
+    return await command("server-room/alarm/cmd", "alarm")
+
+
+@app.route('/api/buzzer', methods=['POST'])
+@require_api_token
+@admission_control
+async def buzzer_control():
+    """Contrôle le buzzer via MQTT"""
+    return await command("server-room/buzzer/cmd", "buzzer")
+
+
+@app.route('/api/history/<sensor>', methods=['GET'])
+@require_api_token
+@admission_control
+@conditional(lambda sensor: data_version())
+async def history(sensor):
+    """Récupère l'historique d'un capteur"""
+    try:
+        sensor = validate_sensor(sensor)
+        room, device = location_filter(request.args)
+
+        limit = request.args.get('limit', 100, type=int)
+        limit = max(MIN_HISTORY_LIMIT, min(MAX_HISTORY_LIMIT, limit))
+
+        rows = await query_cache.aget(("history", sensor, limit, room, device), sensor,
+                                      lambda: fetch_history(sensor, limit, room, device))
+
+        return negotiated(response_encoding.encode_rows, rows)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except pymysql.Error as e:
+        logger.error(f"Erreur DB history: {e}")
+        return jsonify({"error": "Database error"}), 500
+    except Exception as e:
+        logger.error(f"Erreur inattendue history: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+
+async def fetch_history(sensor, limit, room=None, device=None):
+    """Les `limit` dernières mesures d'un capteur, de la plus récente à la plus ancienne"""
+    pool = await get_pool()
+    where, params = location_clause(room, device)
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await timed_execute(
+                cursor, "history",
+                f"SELECT value, timestamp FROM sensor_data WHERE sensor_type=%s{where} ORDER BY timestamp DESC LIMIT %s",
+                (sensor, *params, limit)
+            )
+            return await cursor.fetchall()
+
+
+@app.route('/api/export', methods=['GET'])
+@require_api_token
+@admission_control
+async def export_data():
+    """Export en flux (voir export.py), curseur non bufferisé aiomysql"""
+    try:
+        encoder, filters = export_params(request.args)
+        pool = await get_pool()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    except pymysql.Error as e:
+        logger.error(f"Erreur DB export: {e}")
+        return jsonify({"error": "Database error"}), 500
+
+    async def generate():
+        query, params = export.build_query(**filters)
+        conn = await pool.acquire()
+        cursor = None
+        finished = False
+        try:
+            cursor = await conn.cursor(aiomysql.SSCursor)
+            await cursor.execute(query, params)
+            yield encoder.begin()
+            while True:
+                rows = await cursor.fetchmany(export.CHUNK_ROWS)
+                if not rows:
+                    break
+                data = encoder.encode(rows)
+                if data:
+                    yield data
+            yield encoder.end()
+            finished = True
+        except pymysql.Error as e:
+            logger.error(f"Erreur DB pendant l'export: {e}")
+        finally:
+            # Export interrompu: fermer plutôt que lire tout le reste du résultat
+            if finished:
+                await cursor.close()
+            else:
+                conn.close()
+            pool.release(conn)
+
+    response = app.response_class(generate(), content_type=encoder.content_type)
+    response.headers["Content-Disposition"] = f'attachment; filename="sensor_data.{encoder.extension}"'
+    response.headers["X-Accel-Buffering"] = "no"
+    response.timeout = None
+    return response
+
+
+# ========== WEBSOCKET ==========
+@app.websocket('/api/ws')
+async def ws_channel():
+    """Même protocole que api.py (voir ws_hub.py), une tâche par connexion au lieu d'un thread"""
+    failure = check_request(websocket.headers, websocket.args, websocket.remote_addr)
+    if failure is not None:
+        await websocket.close(1008, failure[0]["error"])
+        return
+
+    await websocket.accept()
+    get_ingest_watcher()
+    loop = asyncio.get_running_loop()
+    outbox = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+
+    def enqueue(text):
+        if not outbox.full():
+            outbox.put_nowait(text)  # sinon client trop lent: mise à jour perdue
+
+    def send(text):
+        # Appelé depuis le thread MQTT du watcher
+        loop.call_soon_threadsafe(enqueue, text)
+
+    async def sender():
+        while True:
+            await websocket.send(await outbox.get())
+
+    subscriber = ws_hub.register(send)
+    sender_task = asyncio.create_task(sender())
+    try:
+        while True:
+            command = ws_hub.parse_command(subscriber, await websocket.receive())
+            if command is None:
+                continue
+            try:
+                await mqtt_publish(command[0], command[1], qos=1)
+                logger.info(f"Commande WebSocket {command[3]}: {command[1]}")
+                ws_hub.command_sent(subscriber, command)
+            except Exception as e:
+                logger.error(f"Erreur commande WebSocket: {e}")
+                ws_hub.command_failed(subscriber, command)
+    finally:
+        ws_hub.unregister(subscriber)
+        sender_task.cancel()
+
+
+# ========== ENDPOINTS PHOTOS ==========
+@app.route('/api/photos', methods=['GET'])
+@require_api_token
+@admission_control
+@conditional(photo_dir_version)
+async def list_photos():
+    """Retourne les 3 dernières photos"""
+    try:
+        if not PHOTO_DIR.exists():
+            return jsonify([])
+
+        # SQLite / scandir sont bloquants: exécutés hors de la boucle d'événements
+        photos = await asyncio.to_thread(recent_photos, RECENT_PHOTOS)
+
+        return jsonify([
+            {
+                'filename': photo['filename'],
+                'timestamp': photo['timestamp'],
+                'url': f"/api/photo/{photo['filename']}",
+                'thumb_url': f"/api/photo/{photo['filename']}?size=thumb"
+            }
+            for photo in photos
+        ])
+    except Exception as e:
+        logger.error(f"Erreur list_photos: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+@app.route('/api/photo/<filename>', methods=['GET'])
+@require_api_token
+@admission_control
+async def get_photo(filename):
+    """Sert une photo (ou sa miniature si elle existe déjà) avec protection path traversal"""
+    try:
+        safe_name = safe_filename(filename)
+        filepath = PHOTO_DIR / safe_name
+        size = request.args.get('size', 'full')
+        if size != 'full' and size not in THUMB_SIZES:
+            raise ValueError(f"Taille invalide: {size}. Valides: full, {', '.join(THUMB_SIZES)}")
+
+        if filepath.is_file():
+            fallback = False
+            if size != 'full':
+                derivative = Path(derivative_path(PHOTO_DIR, safe_name, size))
+                fallback = not derivative.is_file()
+                if not fallback:
+                    filepath = derivative
+            response = await send_file(filepath, mimetype='image/jpeg', conditional=True)
+            cache_photo(response, fallback)
+            return response
+        else:
+            return jsonify({'error': 'Photo not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Erreur get_photo: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+
+# ========== GESTION D'ERREURS GLOBALE ==========
+@app.errorhandler(404)
+async def not_found(error):
+    return jsonify({"error": "Not found"}), 404
+
+
+@app.errorhandler(500)
+async def internal_error(error):
+    logger.error(f"Erreur serveur: {error}")
+    return jsonify({"error": "Internal server error"}), 500
+
+
+if __name__ == '__main__':
+    if not len(token_store):
+        logger.warning("Aucun token API configuré! Utilisez API_TOKEN, API_TOKENS ou API_TOKENS_FILE")
+    app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Authentification par token API, indépendante du framework
+Utilisée par api.py (Flask) et api_async.py (Quart): mêmes règles d'extraction
+et de vérification, seuls les décorateurs require_api_token diffèrent.
+
+Les tokens ne sont gardés en mémoire que sous forme d'empreintes HMAC-SHA256
+(clé API_TOKEN_KEY): la vérification est une recherche dans un dict, en temps
+constant quel que soit le nombre de tokens. Comparer des empreintes à clé ne
+révèle rien d'exploitable par mesure du temps: sans la clé, un attaquant ne
+peut pas choisir les octets de l'empreinte qu'il fait comparer.
+
+Sources des tokens:
+- API_TOKEN / API_TOKENS (variables d'environnement, séparés par des virgules);
+- API_TOKENS_FILE: fichier relu automatiquement quand il change, une ligne par token:
+      # commentaire
+      capteur-salle-1  9f86d081884c7d65...          (token en clair)
+      dashboard-admin  hmac:3a7bd3e2360a3d29...     (empreinte, voir over/generate_token.py --digest)
+  Les empreintes ne sont valables qu'avec la même API_TOKEN_KEY: sans elle, les
+  lignes hmac: sont refusées (erreur au chargement) au lieu d'être toutes invalides.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Clé des empreintes: obligatoire si le fichier contient des empreintes, aléatoire sinon
+API_TOKEN_KEY_SET = bool(os.getenv("API_TOKEN_KEY", ""))
+API_TOKEN_KEY = os.getenv("API_TOKEN_KEY", "").encode() or os.urandom(32)
+API_TOKENS_FILE = os.getenv("API_TOKENS_FILE", "")
+TOKENS_RELOAD_INTERVAL = 2.0    # secondes entre deux vérifications de la date du fichier
+
+DIGEST_PREFIX = "hmac:"
+
+
+def token_digest(token, key=API_TOKEN_KEY):
+    """Empreinte HMAC-SHA256 d'un token (hex)"""
+    return hmac.new(key, token.encode(), hashlib.sha256).hexdigest()
+
+
+class TokenStore:
+    """Ensemble des tokens valides indexé par empreinte: empreinte -> nom"""
+
+    def __init__(self, tokens=(), path="", key=API_TOKEN_KEY, reload_interval=TOKENS_RELOAD_INTERVAL,
+                 accept_digests=API_TOKEN_KEY_SET):
+        self.key = key
+        self.accept_digests = accept_digests    # False: clé aléatoire, aucune empreinte ne peut correspondre
+        self.path = path
+        self.reload_interval = reload_interval
+        self._static = {token_digest(t, key): f"env-{i}" for i, t in enumerate(tokens)}
+        self._digests = dict(self._static)
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self.reload()
+
+    def __len__(self):
+        self._maybe_reload()
+        return len(self._digests)
+
+    def verify(self, provided):
+        """Nom du token si valide, sinon None"""
+        self._maybe_reload()
+        return self._digests.get(token_digest(provided, self.key))
+
+    def _maybe_reload(self):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def reload(self):
+        """Relit le fichier de tokens; en cas d'erreur, garde les tokens précédents"""
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path) as f:
+                    entries = self._parse(f)
+            except OSError as e:
+                logger.error(f"Fichier de tokens illisible ({self.path}): {e}")
+                self._mtime = None
+                return
+            self._mtime = mtime
+            # Remplacement atomique: les requêtes en cours voient l'ancien ou le nouveau dict
+            self._digests = {**self._static, **entries}
+        logger.info(f"Tokens chargés: {len(entries)} depuis {self.path}")
+
+    def _parse(self, lines):
+        entries = {}
+        for number, line in enumerate(lines, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                logger.warning(f"{self.path}:{number}: ligne ignorée (attendu: <nom> <token>)")
+                continue
+            name, token = parts
+            if token.startswith(DIGEST_PREFIX):
+                if not self.accept_digests:
+                    logger.error(f"{self.path}:{number}: empreinte de '{name}' refusée, API_TOKEN_KEY non définie")
+                    continue
+                entries[token[len(DIGEST_PREFIX):].lower()] = name
+            else:
+                entries[token_digest(token, self.key)] = name
+        return entries
+
+
+def _env_tokens():
+    tokens = [t.strip() for t in os.getenv("API_TOKENS", "").split(",") if t.strip()]
+    single_token = os.getenv("API_TOKEN", "").strip()
+    if single_token:
+        tokens.append(single_token)
+    return tokens
+
+
+token_store = TokenStore(_env_tokens(), path=API_TOKENS_FILE)
+
+
+def extract_api_token(headers, args):
+    """Extrait le token depuis les headers ou query params"""
+    # Priorité 1: Authorization Bearer (recommandé)
+    auth = headers.get("Authorization", "").strip()
+    if auth.lower().startswith("bearer "):
+        return auth[7:].strip()
+
+    # Priorité 2: X-API-KEY header
+    x_api_key = headers.get("X-API-KEY", "").strip()
+    if x_api_key:
+        return x_api_key
+
+    # Priorité 3: Query parameter (moins sécurisé, mais supporté)
+    token_qs = args.get("token", "").strip()
+    if token_qs:
+        logger.warning("Token utilisé via query parameter (moins sécurisé)")
+        return token_qs
+
+    return ""
+
+
+def is_valid_token(provided):
+    """Vérifie le token fourni (recherche de son empreinte, O(1))"""
+    return token_store.verify(provided) is not None
+
+
+def authenticate(headers, args, remote_addr):
+    """Retourne (nom du token, None) si la requête est authentifiée, sinon (None, (corps JSON, code HTTP))"""
+    if not len(token_store):
+        logger.error("API token not configured")
+        return None, ({"error": "API token not configured"}, 500)
+
+    provided = extract_api_token(headers, args)
+    if not provided:
+        logger.warning(f"Tentative d'accès sans token: {remote_addr}")
+        return None, ({"error": "Unauthorized"}, 401)
+
+    name = token_store.verify(provided)
+    if name is None:
+        logger.warning(f"Token invalide depuis {remote_addr}")
+        return None, ({"error": "Unauthorized"}, 401)
+
+    return name, None
+
+
+def check_request(headers, args, remote_addr):
+    """Retourne None si la requête est authentifiée, sinon (corps JSON, code HTTP)"""
+    return authenticate(headers, args, remote_addr)[1]
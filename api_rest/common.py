@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Configuration et validation communes aux deux versions de l'API
+api.py (Flask) et api_async.py (Quart) importent d'ici leurs réglages, leurs
+validateurs d'entrées et l'accès aux photos; aucun framework web n'est importé.
+"""
+import heapq
+import importlib.util
+import logging
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+import export
+
+logger = logging.getLogger(__name__)
+
+# Configuration DB (avec variables d'environnement)
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_USER = os.getenv("DB_USER", "apiuser")
+DB_PASS = os.getenv("DB_PASS", "apipass")
+DB_NAME = os.getenv("DB_NAME", "serverroom")
+
+# Configuration MQTT
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "dashboard")
+MQTT_PASS = os.getenv("MQTT_PASS", "dashpass")
+
+# Surveillance des nouvelles mesures: la version des données (ETag) n'est relue en base qu'après un message
+INGEST_WATCH = os.getenv("INGEST_WATCH", "1") == "1"
+INGEST_SETTLE = float(os.getenv("INGEST_SETTLE", "1.0"))  # secondes avant qu'une mesure soit en base
+VERSION_REFRESH = float(os.getenv("VERSION_REFRESH", "5"))  # relecture périodique (commit plus lent que INGEST_SETTLE)
+
+# Canal WebSocket /api/ws
+WS_ACK_TIMEOUT = float(os.getenv("WS_ACK_TIMEOUT", "5"))   # secondes pour la confirmation de l'appareil
+WS_QUEUE_SIZE = 100                                          # messages en attente par client lent
+
+# Cache des résultats historique/dashboard (par worker), invalidé à chaque nouvelle mesure
+CACHE_TTL = float(os.getenv("CACHE_TTL", "5"))            # secondes (0 = regroupement des requêtes seul)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+
+# Contrôle d'admission (voir admission.py): débit par token+IP et requêtes simultanées par worker
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")     # ou redis://host:6379/0
+RATE_LIMITS = os.getenv(
+    "RATE_LIMITS",
+    "dashboard=5/20,history=5/20,export_data=0.2/2,list_photos=5/20,get_photo=20/60,alarm_control=2/5,buzzer_control=2/5"
+)
+CONCURRENCY_LIMITS = os.getenv("CONCURRENCY_LIMITS", "dashboard=16,history=8,export_data=2")
+
+# Métriques Prometheus (/metrics); METRICS_DIR: dossier partagé par les workers gunicorn
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0") == "1"    # 1 = /metrics sans token (réseau interne)
+
+# Configuration Photos (chemin relatif au projet)
+BASE_DIR = Path(__file__).parent.parent
+PHOTO_DIR = Path(os.getenv("PHOTO_DIR", str(BASE_DIR / "camera_motion" / "photos")))
+RECENT_PHOTOS = 3
+
+# Index des photos maintenu par le détecteur: seul ce fichier est chargé (pas tout camera_motion/)
+PHOTO_STORE = Path(os.getenv("PHOTO_STORE", str(BASE_DIR / "camera_motion" / "photo_store.py")))
+
+
+def load_module(name, path):
+    """Charge un module depuis son chemin sans modifier sys.path"""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+photo_store = load_module("photo_store", PHOTO_STORE)
+THUMB_QUALITY = photo_store.THUMB_QUALITY
+THUMB_SIZES = photo_store.THUMB_SIZES
+PhotoIndex = photo_store.PhotoIndex
+derivative_dimensions = photo_store.derivative_dimensions
+derivative_path = photo_store.derivative_path
+
+# Les photos ne sont jamais modifiées (nom horodaté): cache navigateur longue durée
+PHOTO_CACHE_MAX_AGE = 365 * 24 * 3600
+
+_photo_index = None
+
+# Types de capteurs valides
+VALID_SENSORS = ['temperature', 'humidity', 'light', 'distance', 'motion']
+
+# États valides pour alarme/buzzer
+VALID_STATES = ['ON', 'OFF']
+
+# Limites
+MAX_HISTORY_LIMIT = 1000
+MIN_HISTORY_LIMIT = 1
+
+# Salles et appareils (segments de topic MQTT, voir mqtt_logger/topic_router.py)
+LOCATION_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{1,64}$')
+
+
+def validate_sensor(sensor):
+    """Valide que le type de capteur est valide"""
+    if sensor not in VALID_SENSORS:
+        raise ValueError(f"Capteur invalide: {sensor}. Valides: {', '.join(VALID_SENSORS)}")
+    return sensor
+
+
+def validate_location(value, kind):
+    """Valide un nom de salle ou d'appareil (None = pas de filtre)"""
+    if value is None or value == '':
+        return None
+    if not LOCATION_PATTERN.match(value):
+        raise ValueError(f"Nom de {kind} invalide: {value}")
+    return value
+
+
+def location_filter(args):
+    """Filtres ?room= et ?device= validés: (salle, appareil)"""
+    return validate_location(args.get('room'), "salle"), validate_location(args.get('device'), "appareil")
+
+
+def location_clause(room, device):
+    """Conditions SQL supplémentaires (à ajouter après WHERE ...) et leurs paramètres"""
+    sql, params = "", []
+    if room is not None:
+        sql += " AND room=%s"
+        params.append(room)
+    if device is not None:
+        sql += " AND device_id=%s"
+        params.append(device)
+    return sql, params
+
+
+def validate_state(state):
+    """Valide que l'état est valide"""
+    state_upper = state.upper()
+    if state_upper not in VALID_STATES:
+        raise ValueError(f"État invalide: {state}. Valides: {', '.join(VALID_STATES)}")
+    return state_upper
+
+
+def safe_filename(filename):
+    """Sécurise le nom de fichier pour éviter path traversal"""
+    # Normaliser le chemin
+    path = Path(filename)
+    # Ne garder que le nom de fichier (pas de répertoires)
+    safe_name = path.name
+    # Vérifier que c'est un .jpg
+    if not safe_name.endswith('.jpg'):
+        raise ValueError("Seuls les fichiers .jpg sont autorisés")
+    # Vérifier qu'il n'y a pas de caractères dangereux
+    if '..' in safe_name or '/' in safe_name or '\\' in safe_name:
+        raise ValueError("Nom de fichier invalide")
+    return safe_name
+
+
+def export_params(args):
+    """Paramètres de /api/export validés: (encodeur, filtres de export.build_query)"""
+    room, device = location_filter(args)
+    filters = {
+        "sensors": [validate_sensor(s) for value in args.getlist('sensor') for s in value.split(',') if s],
+        "start": export.parse_time(args.get('start')),
+        "end": export.parse_time(args.get('end')),
+        "room": room,
+        "device": device,
+    }
+    return export.get_encoder(args.get('format', 'csv')), filters
+
+
+def get_photo_index():
+    """Index SQLite des photos s'il existe (créé par le détecteur au premier démarrage)"""
+    global _photo_index
+    if _photo_index is None:
+        _photo_index = PhotoIndex.open_existing(PHOTO_DIR)
+    return _photo_index
+
+
+def scan_recent_photos(limit):
+    """Repli sans index: un seul stat() par fichier et sélection partielle (pas de tri complet)"""
+    with os.scandir(PHOTO_DIR) as entries:
+        photos = (
+            (entry.stat().st_mtime, entry.name)
+            for entry in entries
+            if entry.is_file() and entry.name.lower().endswith('.jpg')
+        )
+        return [{'filename': name, 'timestamp': mtime} for mtime, name in heapq.nlargest(limit, photos)]
+
+
+def recent_photos(limit):
+    """Dernières photos via l'index, ou par parcours du dossier (pas d'index, index illisible)"""
+    index = get_photo_index()
+    if index is not None:
+        try:
+            return index.recent(limit)
+        except sqlite3.Error as e:
+            logger.warning(f"Index photos illisible, parcours du dossier: {e}")
+    return scan_recent_photos(limit)
+
+
+def photos_version(*args):
+    """Le mtime du dossier change à chaque photo ajoutée ou supprimée"""
+    try:
+        mtime_ns = PHOTO_DIR.stat().st_mtime_ns
+    except OSError:
+        return None
+    return f"{mtime_ns:x}", mtime_ns / 1e9
+
+
+def cache_photo(response, fallback):
+    """Cache navigateur d'une photo: un an si c'est bien l'image demandée, sinon revalidation
+    (original servi à la place d'une miniature: la miniature doit pouvoir le remplacer)
+    """
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if fallback:
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.max_age = PHOTO_CACHE_MAX_AGE
+        response.cache_control.immutable = True
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Export en flux de l'historique des capteurs (CSV, NDJSON, Parquet)
+Les lignes sont lues avec un curseur non bufferisé (SSCursor) par paquets et
+encodées au fil de l'eau: la mémoire utilisée ne dépend pas de la période exportée.
+
+Utilisé par l'endpoint /api/export (api.py, api_async.py) et en ligne de commande:
+    python export.py --start 2026-01-01 --end 2026-02-01 > janvier.csv
+    python export.py --sensor temperature --sensor humidity --format ndjson -o climat.ndjson
+    python export.py --format parquet -o tout.parquet
+    python export.py --room baie-a --device esp32-01 --start 2026-01-01
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+
+# pyarrow (optionnel): format Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK_ROWS = 5000               # lignes lues (et encodées) par paquet
+PARQUET_ROW_GROUP = 50000       # lignes par row group Parquet (paquets regroupés)
+
+
+def parse_time(value):
+    """Date ISO 8601 (2026-01-31, 2026-01-31T12:00:00) ou timestamp Unix en secondes"""
+    if value is None or value == "":
+        return None
+    try:
+        timestamp = float(value)
+    except ValueError:
+        timestamp = None
+    try:
+        if timestamp is not None:
+            # 1e20, inf, nan: hors des dates représentables (OverflowError/OSError selon la plateforme)
+            return datetime.fromtimestamp(timestamp)
+        return datetime.fromisoformat(value)
+    except (ValueError, OverflowError, OSError):
+        raise ValueError(f"Date invalide: {value} (ISO 8601 ou timestamp Unix)")
+
+
+def build_query(sensors, start, end, room=None, device=None):
+    """Requête et paramètres, triés par date (index idx_timestamp)"""
+    clauses, params = [], []
+    if room is not None:
+        clauses.append("room = %s")
+        params.append(room)
+    if device is not None:
+        clauses.append("device_id = %s")
+        params.append(device)
+    if sensors:
+        clauses.append(f"sensor_type IN ({', '.join(['%s'] * len(sensors))})")
+        params += sensors
+    if start is not None:
+        clauses.append("timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("timestamp < %s")
+        params.append(end)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return (f"SELECT timestamp, sensor_type, value, room, device_id FROM sensor_data{where} ORDER BY timestamp, id",
+            params)
+
+
+def iter_chunks(conn, sensors=None, start=None, end=None, room=None, device=None, chunk_rows=CHUNK_ROWS):
+    """Paquets de tuples (timestamp, capteur, valeur, salle, appareil) lus en flux
+
+    `conn` doit avoir été ouverte par l'appelant; elle est fermée ici.
+    Si l'export est interrompu (client déconnecté), la connexion est fermée
+    directement: SSCursor.close() lirait sinon tout le reste du résultat.
+    """
+    import pymysql.cursors
+
+    query, params = build_query(sensors, start, end, room, device)
+    cursor = conn.cursor(pymysql.cursors.SSCursor)
+    finished = False
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+        conn.close()
+
+
+# ========== ENCODEURS ==========
+class CsvEncoder:
+    content_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def begin(self):
+        return b"timestamp,sensor,value,room,device\r\n"
+
+    def encode(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows((ts.isoformat(), sensor, value, room, device) for ts, sensor, value, room, device in rows)
+        return buffer.getvalue().encode()
+
+    def end(self):
+        return b""
+
+
+class NdjsonEncoder:
+    content_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    def begin(self):
+        return b""
+
+    def encode(self, rows):
+        return "".join(
+            f'{{"timestamp":"{ts.isoformat()}","sensor":{json.dumps(sensor)},"value":{json.dumps(value)},'
+            f'"room":{json.dumps(room)},"device":{json.dumps(device)}}}\n'
+            for ts, sensor, value, room, device in rows
+        ).encode()
+
+    def end(self):
+        return b""
+
+
+class _Drain:
+    """Fichier en mémoire vidé à chaque paquet (sortie du ParquetWriter)"""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class ParquetEncoder:
+    content_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self):
+        if pa is None:
+            raise RuntimeError("Format Parquet indisponible (pyarrow non installé)")
+        self.schema = pa.schema([
+            ("timestamp", pa.timestamp("s")),
+            ("sensor", pa.dictionary(pa.int16(), pa.string())),
+            ("value", pa.float32()),
+            ("room", pa.dictionary(pa.int16(), pa.string())),
+            ("device", pa.dictionary(pa.int16(), pa.string())),
+        ])
+        self.sink = _Drain()
+        self.writer = None
+        self.pending = []
+
+    def begin(self):
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+        return self.sink.take()
+
+    def encode(self, rows):
+        # Paquets accumulés jusqu'à un row group (trop petits, ils dégradent la compression)
+        self.pending += rows
+        if len(self.pending) < PARQUET_ROW_GROUP:
+            return b""
+        self._write_group()
+        return self.sink.take()
+
+    def end(self):
+        if self.pending:
+            self._write_group()
+        self.writer.close()
+        return self.sink.take()
+
+    def _write_group(self):
+        timestamps, sensors, values, rooms, devices = zip(*self.pending)
+        self.pending = []
+        table = pa.table({
+            "timestamp": pa.array(timestamps, pa.timestamp("s")),
+            "sensor": self._labels(sensors, "sensor"),
+            "value": pa.array(values, pa.float32()),
+            "room": self._labels(rooms, "room"),
+            "device": self._labels(devices, "device"),
+        }, schema=self.schema)
+        self.writer.write_table(table)
+
+    def _labels(self, values, field):
+        return pa.array(values, pa.string()).dictionary_encode().cast(self.schema.field(field).type)
+
+
+ENCODERS = {
+    "csv": CsvEncoder,
+    "ndjson": NdjsonEncoder,
+    "parquet": ParquetEncoder,
+}
+
+
+def get_encoder(fmt):
+    if fmt not in ENCODERS:
+        raise ValueError(f"Format invalide: {fmt}. Valides: {', '.join(ENCODERS)}")
+    return ENCODERS[fmt]()
+
+
+def stream(conn, encoder, sensors=None, start=None, end=None, room=None, device=None):
+    """Morceaux d'octets à envoyer tels quels (réponse HTTP en chunked ou fichier)"""
+    header = encoder.begin()
+    if header:
+        yield header
+    for rows in iter_chunks(conn, sensors, start, end, room, device):
+        data = encoder.encode(rows)
+        if data:
+            yield data
+    footer = encoder.end()
+    if footer:
+        yield footer
+
+
+def main():
+    import pymysql
+    # Configuration et validateurs seuls: pas l'application Flask (MQTT, WebSocket, métriques)
+    from common import DB_HOST, DB_NAME, DB_PASS, DB_USER, VALID_SENSORS, validate_location, validate_sensor
+
+    parser = argparse.ArgumentParser(description="Export de l'historique des capteurs")
+    parser.add_argument("--sensor", action="append", help=f"Capteur (répétable): {', '.join(VALID_SENSORS)}")
+    parser.add_argument("--start", help="Début inclus (ISO 8601 ou timestamp Unix)")
+    parser.add_argument("--end", help="Fin exclue (ISO 8601 ou timestamp Unix)")
+    parser.add_argument("--room", help="Salle uniquement")
+    parser.add_argument("--device", help="Appareil uniquement")
+    parser.add_argument("--format", default="csv", choices=sorted(ENCODERS))
+    parser.add_argument("-o", "--output", help="Fichier de sortie (défaut: sortie standard)")
+    args = parser.parse_args()
+
+    try:
+        sensors = [validate_sensor(s) for s in args.sensor or []]
+        start, end = parse_time(args.start), parse_time(args.end)
+        room, device = validate_location(args.room, "salle"), validate_location(args.device, "appareil")
+        encoder = get_encoder(args.format)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    try:
+        conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME, connect_timeout=5)
+    except pymysql.Error as e:
+        print(f"❌ Connexion DB impossible: {e}", file=sys.stderr)
+        return 1
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for data in stream(conn, encoder, sensors, start, end, room, device):
+            out.write(data)
+            written += len(data)
+    finally:
+        conn.close()
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"✅ {written / 1e6:.1f} Mo → {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
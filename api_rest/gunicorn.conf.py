@@ -0,0 +1,45 @@
+"""
+Configuration gunicorn (mode production) de l'API REST
+Usage: gunicorn -c gunicorn.conf.py api:app   (depuis api_rest/)
+
+Tous les réglages sont surchargeables par variables d'environnement.
+Rechargement sans coupure: kill -HUP <pid maître> (systemctl reload api-rest)
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("API_BIND", "0.0.0.0:5000")
+
+# Workers: un par coeur + 1 (les requêtes attendent surtout MariaDB/MQTT)
+workers = int(os.getenv("API_WORKERS", str(multiprocessing.cpu_count() + 1)))
+# Threads par worker (worker "gthread"): absorbe les attentes I/O sans multiplier les processus
+threads = int(os.getenv("API_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Connexions HTTP keep-alive (tableau de bord qui interroge toutes les 3 s)
+keepalive = int(os.getenv("API_KEEPALIVE", "5"))
+timeout = int(os.getenv("API_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+
+# Recyclage périodique des workers (fuites mémoire), décalé pour ne pas tous redémarrer ensemble
+max_requests = int(os.getenv("API_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("API_MAX_REQUESTS_JITTER", "1000"))
+
+# Pas de preload: chaque worker démarre ses propres threads (surveillance MQTT)
+preload_app = False
+
+# /metrics additionne les métriques de tous les workers via ce dossier (voir metrics.py)
+metrics_dir = os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "api-rest-metrics"))
+
+
+def on_starting(server):
+    # Nouveau maître: les compteurs repartent de zéro (Prometheus gère les remises à zéro)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+accesslog = os.getenv("API_ACCESS_LOG", None)   # "-" pour stdout
+errorlog = "-"
+loglevel = os.getenv("API_LOG_LEVEL", "info")
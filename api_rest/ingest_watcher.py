@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Surveillance des nouvelles mesures via MQTT
+Permet à l'API de savoir qu'une donnée a peut-être changé sans interroger MariaDB:
+chaque message reçu sur server-room/# incrémente un compteur.
+Un message à mesures multiples (telemetry.py) compte pour chacun de ses capteurs.
+
+Le compteur est propre au processus: il sert à décider quand relire la version
+en base (api.py, db_version), jamais directement dans un ETag.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+import telemetry
+
+logger = logging.getLogger(__name__)
+
+BOOT_ID = f"{os.getpid():x}{int(time.time()):x}"     # identifiant client MQTT unique par processus
+
+
+class IngestWatcher:
+    """Abonné MQTT qui compte les messages reçus (changements possibles en base)"""
+
+    def __init__(self, broker, port, user, password, topic="server-room/#", settle=1.0):
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        # Délai pendant lequel une donnée annoncée peut ne pas être encore en base
+        self.settle = settle
+        self.version = 0
+        self.last_change = 0.0          # time.monotonic() du dernier message
+        self.connected = False
+        self._listeners = []
+        self._lock = threading.Lock()
+
+        self.client = mqtt.Client(client_id=f"api-watch-{BOOT_ID}")
+        self.client.username_pw_set(user, password)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+
+    def start(self):
+        self.client.connect_async(self.broker, self.port, 60)
+        self.client.loop_start()
+
+    def stop(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+    def add_listener(self, callback):
+        """callback(sensor, topic, payload) appelé dans le thread MQTT à chaque message"""
+        self._listeners.append(callback)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            client.subscribe(self.topic)
+            # Des messages ont pu être manqués pendant la déconnexion
+            with self._lock:
+                self.version += 1
+                self.last_change = time.monotonic()
+            self.connected = True
+            logger.info(f"Surveillance MQTT active sur {self.topic}")
+        else:
+            logger.warning(f"Surveillance MQTT: connexion refusée (code {rc})")
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+
+    def _on_message(self, client, userdata, msg):
+        sensor = msg.topic.split("/")[-1]
+        if sensor != telemetry.TELEMETRY:
+            self._dispatch(sensor, msg.topic, msg.payload)
+            return
+        try:
+            readings, _, _ = telemetry.decode(msg.payload)
+        except ValueError:
+            return
+        # Les listeners reçoivent une mesure à la fois, comme pour les topics à valeur unique
+        for name, value in readings.items():
+            self._dispatch(name, msg.topic, repr(value).encode())
+
+    def _dispatch(self, sensor, topic, payload):
+        self._bump(sensor)
+        for callback in self._listeners:
+            try:
+                callback(sensor, topic, payload)
+            except Exception as e:
+                logger.error(f"Erreur listener ingestion: {e}")
+
+    def _bump(self, sensor):
+        with self._lock:
+            self.version += 1
+            self.last_change = time.monotonic()
+
+    def current(self):
+        """Compteur de messages, ou None s'il n'est pas fiable
+
+        None si le watcher est déconnecté ou si un message vient d'arriver
+        (la ligne correspondante n'est peut-être pas encore commitée).
+        """
+        if not self.connected or (time.monotonic() - self.last_change) < self.settle:
+            return None
+        return self.version
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Métriques au format texte Prometheus, sans dépendance
+Compteurs, jauges et histogrammes à un label au plus. Le chemin chaud ne fait
+qu'une recherche dans un dict et des incréments sous verrou: pas d'objet créé
+par observation (les séries sont créées à leur premier usage).
+
+Plusieurs processus (workers gunicorn): avec un dossier partagé (METRICS_DIR),
+chaque processus y écrit périodiquement son état (<pid>.json) et /metrics
+additionne tous les fichiers. Les fichiers des processus terminés sont fusionnés
+dans archive.json: les compteurs ne repartent pas à zéro quand un worker est recyclé.
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Secondes: de 1 ms (cache, MQTT local) à 10 s (export, DB saturée)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE = "archive.json"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, label=None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        with self._lock:
+            return {"type": self.kind, "help": self.help, "label": self.label, "series": self._copy()}
+
+    def _copy(self):
+        return dict(self._series)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, label="", amount=1):
+        with self._lock:
+            self._series[label] = self._series.get(label, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, label=""):
+        with self._lock:
+            self._series[label] = value
+
+    def inc(self, label="", amount=1):
+        with self._lock:
+            self._series[label] = self._series.get(label, 0) + amount
+
+    def dec(self, label="", amount=1):
+        self.inc(label, -amount)
+
+
+class GaugeCallback(_Metric):
+    """Jauge (ou compteur) lue au moment de l'export: fn() -> nombre ou {label: nombre}"""
+
+    def __init__(self, name, help, fn, label=None, kind="gauge"):
+        super().__init__(name, help, label)
+        self.fn = fn
+        self.kind = kind
+
+    def _copy(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return {}
+        return value if isinstance(value, dict) else {"": value}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, label)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, label=""):
+        series = self._series.get(label)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(label, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self):
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+    def _copy(self):
+        return {label: [list(counts), total, count] for label, (counts, total, count) in self._series.items()}
+
+
+class Registry:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self.metrics = []
+        self.directory = None
+
+    def _add(self, metric):
+        metric.name = self.prefix + metric.name
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, label=None):
+        return self._add(Counter(name, help, label))
+
+    def gauge(self, name, help, label=None):
+        return self._add(Gauge(name, help, label))
+
+    def callback(self, name, help, fn, label=None, kind="gauge"):
+        return self._add(GaugeCallback(name, help, fn, label, kind))
+
+    def histogram(self, name, help, label=None, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, label, buckets))
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    # ---------- plusieurs processus ----------
+    def share(self, directory, interval=5.0):
+        """Écrit l'état de ce processus dans `directory` toutes les `interval` secondes"""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.dump()
+
+        threading.Thread(target=loop, daemon=True, name="metrics-dump").start()
+
+    def dump(self, final=False):
+        if self.directory is None:
+            return
+        data = self.snapshot()
+        if final:
+            # Processus qui s'arrête: ses jauges ne décrivent plus rien
+            data = {name: m for name, m in data.items() if m["type"] != "gauge"}
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(data, f)
+        os.replace(path + ".tmp", path)
+
+    def collect(self):
+        """État de ce processus + celui des autres (dossier partagé), fusionnés"""
+        own = self.snapshot()
+        if self.directory is None:
+            return own
+        snapshots = [own]
+        with open(os.path.join(self.directory, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(self.directory, ARCHIVE)
+            archive = _read(archive_path) or {}
+            dead = []
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(".json") or entry.name == ARCHIVE:
+                    continue
+                pid = int(entry.name[:-5])
+                if pid == os.getpid():
+                    continue
+                data = _read(entry.path)
+                if data is None:
+                    continue
+                if _alive(pid):
+                    snapshots.append(data)
+                else:
+                    archive = merge([archive, {n: m for n, m in data.items() if m["type"] != "gauge"}])
+                    dead.append(entry.path)
+            if dead:
+                with open(archive_path + ".tmp", "w") as f:
+                    json.dump(archive, f)
+                os.replace(archive_path + ".tmp", archive_path)
+                for path in dead:
+                    os.remove(path)
+        snapshots.append(archive)
+        return merge(snapshots)
+
+    def render(self):
+        return render(self.collect())
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def merge(snapshots):
+    """Somme de plusieurs états (mêmes métriques, séries additionnées)"""
+    result = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = result.get(name)
+            if target is None:
+                result[name] = json.loads(json.dumps(metric))
+                continue
+            for label, value in metric["series"].items():
+                current = target["series"].get(label)
+                if current is None:
+                    target["series"][label] = json.loads(json.dumps(value))
+                elif metric["type"] == "histogram":
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+                else:
+                    target["series"][label] = current + value
+    return result
+
+
+def _labels(name, value, extra=""):
+    parts = [f'{name}="{value}"'] if name else []
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render(snapshot):
+    """Format d'exposition texte Prometheus 0.0.4"""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        label = metric["label"]
+        for value_label, value in sorted(metric["series"].items()):
+            key = label if value_label != "" else None
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(key, value_label)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(metric["buckets"] + ["+Inf"], counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(key, value_label, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(key, value_label)} {total}")
+            lines.append(f"{name}_count{_labels(key, value_label)} {count}")
+    return "\n".join(lines) + "\n"
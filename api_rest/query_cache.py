@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Cache des résultats de requêtes (historique, dashboard)
+LRU + durée de vie, par processus (un cache par worker gunicorn):
+- clé = paramètres normalisés (après validation et bornage);
+- une entrée est rattachée à un capteur (None = dépend de tous les capteurs) et
+  invalidée dès qu'une mesure de ce capteur arrive (listener de IngestWatcher);
+- requêtes simultanées sur une même clé absente: une seule requête DB, les autres
+  attendent son résultat (single-flight);
+- compteurs hits / misses / coalesced / invalidations / evictions pour /api/health.
+
+Sans surveillance MQTT, la fraîcheur est bornée par la durée de vie seule.
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+ALL_SENSORS = None
+WAIT_TIMEOUT = 30               # secondes max d'attente d'une requête menée par un autre thread
+
+
+class _Flight:
+    """Chargement en cours d'une clé, partagé par les requêtes qui attendent"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.future = None          # asyncio.Future (variante async)
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    def __init__(self, max_entries=256, ttl=5.0, settle=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Une mesure annoncée peut ne pas être encore en base: un résultat chargé
+        # pendant ce délai n'est gardé que jusqu'à sa fin
+        self.settle = settle
+        self._entries = OrderedDict()   # clé -> (expiration, capteur, valeur)
+        self._flights = {}
+        self._invalidated = {}          # capteur -> (compteur, time.monotonic())
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "evictions": 0}
+
+    # ---------- invalidation ----------
+    def invalidate(self, sensor):
+        """Nouvelle mesure de `sensor`: supprime ses entrées et celles qui dépendent de tous les capteurs"""
+        now = time.monotonic()
+        with self._lock:
+            for tag in (sensor, ALL_SENSORS):
+                count = self._invalidated.get(tag, (0, 0.0))[0]
+                self._invalidated[tag] = (count + 1, now)
+            stale = [key for key, (_, tag, _) in self._entries.items() if tag in (sensor, ALL_SENSORS)]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ---------- lecture ----------
+    def get(self, key, sensor, loader):
+        """Valeur en cache ou résultat de loader() (appelé une seule fois pour des requêtes simultanées)"""
+        flight, leader, marker = self._lookup(key, sensor)
+        if flight is None:
+            return marker
+        if not leader:
+            if flight.event.wait(WAIT_TIMEOUT):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            return loader()
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, sensor, flight, marker)
+        return flight.value
+
+    async def aget(self, key, sensor, loader):
+        """Variante asyncio de get(): loader est une fonction coroutine"""
+        flight, leader, marker = self._lookup(key, sensor, asynchronous=True)
+        if flight is None:
+            return marker
+        if not leader:
+            return await asyncio.shield(flight.future)
+
+        try:
+            flight.value = await loader()
+            flight.future.set_result(flight.value)
+        except Exception as e:
+            flight.error = e
+            flight.future.set_exception(e)
+            flight.future.exception()   # évite "exception never retrieved" sans attente
+            raise
+        finally:
+            self._land(key, sensor, flight, marker)
+        return flight.value
+
+    def _lookup(self, key, sensor, asynchronous=False):
+        """(None, None, valeur) si en cache, sinon (chargement, est_meneur, marqueur d'invalidation)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return None, None, entry[2]
+
+            flight = self._flights.get(key)
+            if flight is not None and (flight.future is not None) == asynchronous:
+                self.stats["coalesced"] += 1
+                return flight, False, None
+
+            flight = _Flight()
+            if asynchronous:
+                flight.future = asyncio.get_running_loop().create_future()
+            self._flights[key] = flight
+            self.stats["misses"] += 1
+            return flight, True, self._marker(sensor)
+
+    def _marker(self, sensor):
+        """Nombre d'invalidations du capteur (ALL_SENSORS: de n'importe quel capteur)"""
+        return self._invalidated.get(sensor, (0, 0.0))[0]
+
+    def _land(self, key, sensor, flight, marker):
+        """Fin du chargement: réveille les requêtes en attente et stocke le résultat s'il est encore valide"""
+        now = time.monotonic()
+        with self._lock:
+            self._flights.pop(key, None)
+            # Invalidé pendant la requête DB: le résultat est peut-être déjà périmé
+            if self.ttl > 0 and flight.error is None and self._marker(sensor) == marker:
+                expires = now + self.ttl
+                last_change = self._invalidated.get(sensor, (0, 0.0))[1]
+                if now - last_change < self.settle:
+                    expires = min(expires, last_change + self.settle)
+                self._entries[key] = (expires, sensor, flight.value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+        flight.event.set()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Négociation de contenu pour l'historique et le dashboard
+- Format (en-tête Accept):
+    application/json                       défaut, inchangé
+    application/x-msgpack                  colonnes MessagePack (msgpack optionnel)
+    application/vnd.serverroom.columns     tableaux typés bruts, sans dépendance
+- Compression (en-tête Accept-Encoding): br (brotli optionnel) puis gzip
+
+Format "columns" (little-endian, lisible directement en JavaScript):
+    octets 0-3   b"SRC1"
+    octets 4-7   uint32  n = nombre de lignes
+    puis n float64  timestamps en millisecondes epoch (NaN si absent)
+    puis n float32  valeurs (NaN si absent)
+
+    const n = new DataView(buf).getUint32(4, true);
+    const t = new Float64Array(buf, 8, n), v = new Float32Array(buf, 8 + 8 * n, n);
+
+Les DATETIME naïfs sont interprétés en UTC, comme le fait déjà jsonify.
+"""
+
+import calendar
+import gzip
+import struct
+import sys
+from array import array
+
+# msgpack / brotli (optionnels): formats proposés seulement s'ils sont installés
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = "application/json"
+MSGPACK = "application/x-msgpack"
+COLUMNS = "application/vnd.serverroom.columns"
+COLUMNS_MAGIC = b"SRC1"
+
+FORMATS = [JSON] + ([MSGPACK] if msgpack else []) + [COLUMNS]
+SHORT_NAMES = {JSON: "json", MSGPACK: "msgpack", COLUMNS: "columns"}
+
+# Compression des réponses
+COMPRESSIBLE = {JSON, MSGPACK, COLUMNS, "text/html", "text/csv", "application/x-ndjson"}
+COMPRESS_MIN_SIZE = 1024        # en dessous, l'en-tête et le CPU coûtent plus qu'ils ne rapportent
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5              # 11 = maximum mais ~20x plus lent
+CODINGS = (["br"] if brotli else []) + ["gzip"]
+
+NAN = float("nan")
+
+
+def negotiate_format(accept_mimetypes):
+    """Meilleur format pour l'en-tête Accept (JSON si */* ou absent)"""
+    return accept_mimetypes.best_match(FORMATS, default=JSON) or JSON
+
+
+def negotiate_coding(accept_encodings):
+    """'br', 'gzip' ou None d'après Accept-Encoding"""
+    return accept_encodings.best_match(CODINGS)
+
+
+def variant(accept_mimetypes, accept_encodings):
+    """Suffixe d'ETag: une représentation différente doit avoir un ETag différent"""
+    coding = negotiate_coding(accept_encodings)
+    suffix = f"-{SHORT_NAMES[negotiate_format(accept_mimetypes)]}"
+    return f"{suffix}-{coding}" if coding else suffix
+
+
+def epoch_ms(ts):
+    if ts is None:
+        return NAN
+    return calendar.timegm(ts.timetuple()) * 1000 + ts.microsecond // 1000
+
+
+def encode_columns(timestamps, values, fmt, names=None):
+    """Corps binaire (format négocié != JSON) pour deux colonnes de même longueur"""
+    if fmt == MSGPACK:
+        body = {"timestamp": timestamps, "value": values}
+        if names is not None:
+            body["sensor"] = names
+        return msgpack.packb(body, use_single_float=True)
+
+    t = array("d", (NAN if ms is None else ms for ms in timestamps))
+    v = array("f", (NAN if value is None else value for value in values))
+    if sys.byteorder == "big":
+        t.byteswap()
+        v.byteswap()
+    return COLUMNS_MAGIC + struct.pack("<I", len(t)) + t.tobytes() + v.tobytes()
+
+
+def encode_rows(rows, fmt):
+    """Historique: lignes {value, timestamp} -> colonnes"""
+    return encode_columns(
+        [epoch_ms(row["timestamp"]) for row in rows],
+        [row["value"] for row in rows],
+        fmt,
+    )
+
+
+def encode_latest(latest, fmt):
+    """Dashboard: {capteur: ligne ou None} -> colonnes dans l'ordre des capteurs
+
+    En "columns", l'ordre des capteurs est donné par l'en-tête X-Sensors.
+    """
+    names = list(latest)
+    timestamps = [epoch_ms(row["timestamp"]) if row else None for row in latest.values()]
+    values = [row["value"] if row else None for row in latest.values()]
+    return encode_columns(timestamps, values, fmt, names=names)
+
+
+def compress(data, coding):
+    if coding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
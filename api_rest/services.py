@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Services partagés par les deux versions de l'API (une instance par worker)
+Métriques, cache des requêtes, contrôle d'admission, canal WebSocket et abonné
+MQTT des nouvelles mesures; indépendants du framework web.
+"""
+import atexit
+import threading
+
+import metrics
+from admission import Admission, make_backend, parse_caps, parse_rates
+from common import (
+    MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASS, INGEST_WATCH, INGEST_SETTLE,
+    WS_ACK_TIMEOUT, CACHE_TTL, CACHE_MAX_ENTRIES,
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMITS, CONCURRENCY_LIMITS, METRICS_DIR,
+    VALID_SENSORS, validate_state,
+)
+from ingest_watcher import IngestWatcher
+from query_cache import QueryCache
+from ws_hub import TelemetryHub
+
+ws_hub = TelemetryHub(VALID_SENSORS, validate_state=validate_state, ack_timeout=WS_ACK_TIMEOUT)
+query_cache = QueryCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, settle=INGEST_SETTLE)
+
+
+def invalidate_cache(sensor, topic, payload):
+    """Listener IngestWatcher: une nouvelle mesure périme les résultats de ce capteur"""
+    if sensor in VALID_SENSORS:
+        query_cache.invalidate(sensor)
+
+
+admission = Admission(parse_rates(RATE_LIMITS), parse_caps(CONCURRENCY_LIMITS),
+                      make_backend(RATE_LIMIT_BACKEND), enabled=RATE_LIMIT_ENABLED)
+
+
+# ========== MÉTRIQUES ==========
+registry = metrics.Registry(prefix="api_")
+REQUEST_DURATION = registry.histogram("request_duration_seconds", "Durée des requêtes (jusqu'aux en-têtes)", "route")
+REQUEST_ERRORS = registry.counter("request_errors_total", "Réponses 5xx", "route")
+DB_CONNECT_DURATION = registry.histogram("db_connect_duration_seconds", "Ouverture d'une connexion MariaDB")
+DB_QUERY_DURATION = registry.histogram("db_query_duration_seconds", "Durée des requêtes SQL", "query")
+DB_ERRORS = registry.counter("db_errors_total", "Erreurs MariaDB", "query")
+DB_IN_FLIGHT = registry.gauge("db_queries_in_flight", "Requêtes SQL en cours")
+MQTT_PUBLISH_DURATION = registry.histogram("mqtt_publish_duration_seconds", "Publication d'une commande MQTT", "topic")
+MQTT_PUBLISH_ERRORS = registry.counter("mqtt_publish_errors_total", "Publications MQTT échouées", "topic")
+registry.callback("cache_events_total", "Événements du cache de requêtes", lambda: dict(query_cache.stats),
+                  "event", kind="counter")
+registry.callback("cache_entries", "Entrées du cache de requêtes", lambda: len(query_cache._entries))
+registry.callback("admission_rejections_total", "Requêtes refusées (débit ou saturation)", lambda: dict(admission.stats),
+                  "reason", kind="counter")
+registry.callback("websocket_connections", "Connexions WebSocket ouvertes", lambda: ws_hub.connections)
+
+if METRICS_DIR:
+    registry.share(METRICS_DIR)
+    atexit.register(registry.dump, final=True)
+
+
+_ingest_watcher = None
+_ingest_watcher_lock = threading.Lock()
+
+
+def get_ingest_watcher():
+    """Démarre (une fois par processus) l'abonné MQTT qui versionne les données"""
+    global _ingest_watcher
+    if not INGEST_WATCH:
+        return None
+    if _ingest_watcher is None:
+        with _ingest_watcher_lock:
+            if _ingest_watcher is None:
+                watcher = IngestWatcher(MQTT_BROKER, MQTT_PORT, MQTT_USER, MQTT_PASS, settle=INGEST_SETTLE)
+                watcher.add_listener(ws_hub.on_mqtt)
+                watcher.add_listener(invalidate_cache)
+                watcher.start()
+                _ingest_watcher = watcher
+    return _ingest_watcher
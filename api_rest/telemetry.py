@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Messages à mesures multiples: une lecture complète d'un appareil par message
+Topic <salle>/<appareil>/telemetry (ou <site>/<salle>/<appareil>/telemetry), charge utile JSON:
+    {"ts": 1760000000.25, "seq": 42, "temperature": 21.5, "humidity": 40.1}
+- ts (optionnel): horloge de l'appareil (secondes Unix, NTP), absent si non synchronisée;
+- seq (optionnel): numéro de message de l'appareil, croissant;
+- les autres clés sont des capteurs; les valeurs non numériques sont ignorées.
+
+Décodé par mqtt_logger.py (écriture) et ingest_watcher.py (invalidation, WebSocket).
+orjson (optionnel) est utilisé s'il est installé: 2 à 3 fois plus rapide que json sur ces messages.
+"""
+
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TELEMETRY = "telemetry"         # dernier segment du topic
+MAX_PAYLOAD = 4096              # octets: au-delà, message refusé sans être décodé
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def decode(payload, sensors=None):
+    """(mesures {capteur: valeur}, ts, seq); ValueError si la charge utile est invalide
+
+    `sensors`: capteurs acceptés (None = toute clé numérique).
+    """
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Message trop long ({len(payload)} octets)")
+    data = _loads(payload)
+    if not isinstance(data, dict):
+        raise ValueError("Objet JSON attendu")
+
+    ts = data.pop("ts", None)
+    seq = data.pop("seq", None)
+    if ts is not None and (isinstance(ts, bool) or not isinstance(ts, (int, float))):
+        raise ValueError(f"ts invalide: {ts!r}")
+    if seq is not None and (isinstance(seq, bool) or not isinstance(seq, int)):
+        raise ValueError(f"seq invalide: {seq!r}")
+
+    readings = {}
+    for name, value in data.items():
+        if (sensors is None or name in sensors) and isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+            if math.isfinite(value):
+                readings[name] = value
+    return readings, ts, seq
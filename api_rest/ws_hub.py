@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Canal WebSocket du tableau de bord: diffusion temps réel et commandes
+Indépendant du framework: api.py (flask-sock) et api_async.py (Quart)
+fournissent seulement la boucle de connexion.
+
+Messages serveur -> client (JSON):
+    {"type": "sensor", "sensor": "temperature", "value": 21.5, "timestamp": 1700000000.0}
+    {"type": "photo", "filename": "...", "url": "...", "thumb_url": "..."}
+    {"type": "zones", "scores": {"porte": 12}}
+    {"type": "state", "target": "buzzer", "state": "ON"}
+    {"type": "command", "id": "c1", "status": "sent"}
+    {"type": "ack", "id": "c1", "target": "buzzer", "state": "ON", "status": "ok|timeout|error"}
+    {"type": "error", "message": "..."}
+
+Messages client -> serveur:
+    {"type": "command", "id": "c1", "target": "buzzer|alarm", "state": "ON|OFF"}
+
+L'accusé "ok" n'est envoyé que lorsque l'appareil confirme sur server-room/<cible>/state.
+"""
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+COMMAND_TOPICS = {
+    "alarm": "server-room/alarm/cmd",
+    "buzzer": "server-room/buzzer/cmd",
+}
+PHOTO_TOPIC = "server-room/camera/photo"
+ZONES_TOPIC = "server-room/motion/zones"
+
+
+class Subscriber:
+    """Une connexion WebSocket: `send` doit pouvoir être appelé depuis n'importe quel thread"""
+
+    def __init__(self, send):
+        self.send = send
+
+
+class TelemetryHub:
+    """Diffuse les messages MQTT aux connexions et suit les commandes en attente d'accusé"""
+
+    def __init__(self, sensors, validate_state, ack_timeout=5.0):
+        self.sensors = set(sensors)
+        self.validate_state = validate_state
+        self.ack_timeout = ack_timeout
+        self._subscribers = set()
+        self._pending = {}              # cible -> [(subscriber, id, état, timer)]
+        self._lock = threading.Lock()
+
+    # ---------- connexions ----------
+    def register(self, send):
+        subscriber = Subscriber(send)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unregister(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            for target, waiting in self._pending.items():
+                for entry in [e for e in waiting if e[0] is subscriber]:
+                    entry[3].cancel()
+                    waiting.remove(entry)
+
+    @property
+    def connections(self):
+        return len(self._subscribers)
+
+    def broadcast(self, message):
+        text = json.dumps(message, separators=(",", ":"))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.send(text)
+            except Exception as e:
+                logger.debug(f"Envoi WebSocket impossible: {e}")
+
+    # ---------- MQTT -> clients (listener de IngestWatcher) ----------
+    def on_mqtt(self, sensor, topic, payload):
+        if not self._subscribers:
+            return
+        text = payload.decode(errors="replace").strip()
+
+        if sensor in self.sensors:
+            try:
+                value = float(text)
+            except ValueError:
+                return
+            self.broadcast({"type": "sensor", "sensor": sensor, "value": value, "timestamp": time.time()})
+        elif topic == PHOTO_TOPIC:
+            self.broadcast({
+                "type": "photo",
+                "filename": text,
+                "url": f"/api/photo/{text}",
+                "thumb_url": f"/api/photo/{text}?size=thumb",
+            })
+        elif topic == ZONES_TOPIC:
+            try:
+                self.broadcast({"type": "zones", "scores": json.loads(text)})
+            except ValueError:
+                return
+        elif sensor == "state":
+            target = topic.split("/")[-2]
+            self._confirm(target, text.upper())
+            self.broadcast({"type": "state", "target": target, "state": text.upper()})
+
+    # ---------- commandes ----------
+    def parse_command(self, subscriber, raw):
+        """Valide un message client; retourne (topic, état, id, cible) ou None (erreur déjà envoyée)"""
+        try:
+            message = json.loads(raw)
+            if message.get("type") != "command":
+                raise ValueError(f"Type de message inconnu: {message.get('type')}")
+            target = message.get("target")
+            if target not in COMMAND_TOPICS:
+                raise ValueError(f"Cible invalide: {target}. Valides: {', '.join(COMMAND_TOPICS)}")
+            state = self.validate_state(str(message.get("state", "")))
+            return COMMAND_TOPICS[target], state, str(message.get("id", "")), target
+        except (ValueError, AttributeError) as e:
+            self._reply(subscriber, {"type": "error", "message": str(e)})
+            return None
+
+    def command_sent(self, subscriber, command):
+        """La commande est publiée: on attend la confirmation de l'appareil"""
+        _, state, command_id, target = command
+        timer = threading.Timer(self.ack_timeout, self._expire, (subscriber, command_id, target))
+        timer.daemon = True
+        with self._lock:
+            self._pending.setdefault(target, []).append((subscriber, command_id, state, timer))
+        timer.start()
+        self._reply(subscriber, {"type": "command", "id": command_id, "status": "sent"})
+
+    def command_failed(self, subscriber, command):
+        _, state, command_id, target = command
+        self._reply(subscriber, {"type": "ack", "id": command_id, "target": target,
+                                 "state": state, "status": "error"})
+
+    def _confirm(self, target, state):
+        with self._lock:
+            waiting = self._pending.get(target, [])
+            confirmed = [e for e in waiting if e[2] == state]
+            for entry in confirmed:
+                waiting.remove(entry)
+        for subscriber, command_id, _, timer in confirmed:
+            timer.cancel()
+            self._reply(subscriber, {"type": "ack", "id": command_id, "target": target,
+                                     "state": state, "status": "ok"})
+
+    def _expire(self, subscriber, command_id, target):
+        with self._lock:
+            waiting = self._pending.get(target, [])
+            expired = [e for e in waiting if e[0] is subscriber and e[1] == command_id]
+            for entry in expired:
+                waiting.remove(entry)
+        for _, _, state, _ in expired:
+            self._reply(subscriber, {"type": "ack", "id": command_id, "target": target,
+                                     "state": state, "status": "timeout"})
+
+    @staticmethod
+    def _reply(subscriber, message):
+        try:
+            subscriber.send(json.dumps(message, separators=(",", ":")))
+        except Exception as e:
+            logger.debug(f"Réponse WebSocket impossible: {e}")
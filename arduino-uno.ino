@@ -2,6 +2,7 @@
 // Contrôle buzzer via 2 modes:
 // 1. server-room/buzzer/cmd → Contrôle direct ON/OFF
 // 2. server-room/alarm/cmd → Alarme distance < 50cm
+// Chaque commande appliquée est confirmée (retained) sur server-room/<buzzer|alarm>/state
 
 #include <SPI.h>
 #include <Ethernet.h>
@@ -39,6 +40,8 @@ PubSubClient client(ethClient);
 unsigned long lastPublish = 0;
 const long publishInterval = 10000; // 10 sec
 
+unsigned long seq = 0;   // numéro de message (déduplication côté logger)
+
 unsigned long lastDistanceCheck = 0;
 const long distanceCheckInterval = 1000; // 1 sec
 
@@ -51,6 +54,8 @@ float lireDistance() {
 
 // ======== CALLBACK MQTT ========
 void callback(char* topic, byte* payload, unsigned int length) {
+  // Copie du topic: publish() réutilise le buffer de PubSubClient
+  String topicStr = String(topic);
   String msg = "";
   for (int i = 0; i < length; i++) {
     msg += (char)payload[i];
@@ -76,7 +81,7 @@ void callback(char* topic, byte* payload, unsigned int length) {
   Serial.println();
 
   // 🔔 COMMANDE BUZZER DIRECT (priorité haute)
-  if (String(topic) == "server-room/buzzer/cmd") {
+  if (topicStr == "server-room/buzzer/cmd") {
     
     // Comparer avec trim() et ignorer la casse
     msg.toUpperCase();
@@ -85,11 +90,13 @@ void callback(char* topic, byte* payload, unsigned int length) {
       buzzerForce = true;
       tone(BUZZER_PIN, 2000);
       Serial.println("🔔 BUZZER FORCE ON");
+      client.publish("server-room/buzzer/state", "ON", true);
     }
     else if (msg == "OFF") {
       buzzerForce = false;
       noTone(BUZZER_PIN);
       Serial.println("🔕 BUZZER FORCE OFF");
+      client.publish("server-room/buzzer/state", "OFF", true);
     }
     else {
       Serial.print("⚠️ Commande inconnue: '");
@@ -99,13 +106,14 @@ void callback(char* topic, byte* payload, unsigned int length) {
   }
 
   // 🚨 COMMANDE ALARME DISTANCE
-  if (String(topic) == "server-room/alarm/cmd") {
+  if (topicStr == "server-room/alarm/cmd") {
     
     msg.toUpperCase();
     
     if (msg == "ON") {
       alarmeActive = true;
       Serial.println("✅ ALARME DISTANCE ACTIVEE");
+      client.publish("server-room/alarm/state", "ON", true);
     }
     else if (msg == "OFF") {
       alarmeActive = false;
@@ -114,6 +122,7 @@ void callback(char* topic, byte* payload, unsigned int length) {
         noTone(BUZZER_PIN);
       }
       Serial.println("❌ ALARME DISTANCE DESACTIVEE");
+      client.publish("server-room/alarm/state", "OFF", true);
     }
     else {
       Serial.print("⚠️ Commande alarme inconnue: '");
@@ -213,19 +222,19 @@ void loop() {
     Serial.print("Luminosite = ");
     Serial.println(analog_lum);
 
-    char lightStr[8];
-    itoa(analog_lum, lightStr, 10);
-    client.publish("server-room/light", lightStr);
-
     // ===== DISTANCE =====
     float distance = lireDistance();
     Serial.print("Distance (publication) = ");
     Serial.print(distance);
     Serial.println(" cm");
 
+    // Luminosité + distance en un seul message (snprintf AVR: pas de %f)
     char distStr[10];
-    dtostrf(distance, 4, 2, distStr);
-    client.publish("server-room/distance", distStr);
+    dtostrf(distance, 1, 2, distStr);
+    char payload[80];
+    seq++;
+    snprintf(payload, sizeof(payload), "{\"seq\":%lu,\"light\":%d,\"distance\":%s}", seq, analog_lum, distStr);
+    client.publish("server-room/arduino-uno/telemetry", payload);
     
     Serial.println("--- Cycle publication termine ---");
   }
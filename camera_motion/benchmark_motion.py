@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Benchmark du détecteur de mouvement
+Rejoue des clips annotés et mesure débit, temps CPU par étape,
+latence par image (p50/p99) et précision/rappel des événements de mouvement.
+
+Clips acceptés:
+    dossier d'images + dossier/labels.json
+    fichier vidéo clip.mp4 + clip.labels.json
+Format des annotations: {"motion": [[debut, fin], ...]}  (indices d'images, fin exclue)
+
+Sans clip en argument, les fixtures synthétiques déterministes sont utilisées.
+
+Exemples:
+    python benchmark_motion.py
+    python benchmark_motion.py --threshold 20000 --blur 11 --size 320x240
+    python benchmark_motion.py --zones zones.example.json
+    python benchmark_motion.py --make-fixtures fixtures/
+    python benchmark_motion.py fixtures/* --json resultats.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import cv2
+
+from frame_sources import ImageDirectorySource, SyntheticSource, VideoCaptureSource
+from motion_detector import BLUR_KERNEL, DIFF_THRESHOLD, FRAME_SIZE, MOTION_THRESHOLD, MotionDetector, load_zones
+
+STAGES = ('read', 'preprocess', 'motion_mask', 'largest_area')
+
+# Scénarios synthétiques: nom -> paramètres de SyntheticSource
+SYNTHETIC_FIXTURES = {
+    'passages': {'frames': 300, 'seed': 1},
+    'bruit_fort': {'frames': 300, 'seed': 2, 'noise': 12},
+    'petit_objet': {'frames': 300, 'seed': 3, 'object_size': (96, 96)},
+    'statique': {'frames': 300, 'seed': 4, 'motion_intervals': []},
+}
+
+
+class ProfiledDetector(MotionDetector):
+    """MotionDetector qui cumule le temps CPU passé dans chaque étape"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cpu = {stage: 0.0 for stage in STAGES}
+
+    def preprocess(self, frame):
+        start = time.process_time()
+        result = super().preprocess(frame)
+        self.cpu['preprocess'] += time.process_time() - start
+        return result
+
+    def motion_mask(self, gray):
+        start = time.process_time()
+        result = super().motion_mask(gray)
+        self.cpu['motion_mask'] += time.process_time() - start
+        return result
+
+    def largest_area(self, thresh):
+        start = time.process_time()
+        result = super().largest_area(thresh)
+        self.cpu['largest_area'] += time.process_time() - start
+        return result
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche (valeurs non triées acceptées)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def load_labels(path):
+    with open(path) as f:
+        data = json.load(f)
+    return [(int(a), int(b)) for a, b in data.get('motion', [])]
+
+
+def load_clip(path, size):
+    """Retourne (nom, source, intervalles annotés) pour un clip sur disque"""
+    name = os.path.basename(os.path.normpath(path))
+    if os.path.isdir(path):
+        labels = os.path.join(path, 'labels.json')
+        source = ImageDirectorySource(path, size=size)
+    else:
+        labels = os.path.splitext(path)[0] + '.labels.json'
+        source = VideoCaptureSource(path, size=size)
+    if not os.path.isfile(labels):
+        raise FileNotFoundError(f"Annotations introuvables pour {path}: {labels}")
+    return name, source, load_labels(labels)
+
+
+def synthetic_clips(size):
+    for name, params in SYNTHETIC_FIXTURES.items():
+        source = SyntheticSource(size=size, **params)
+        yield name, source, source.motion_intervals
+
+
+def make_fixtures(directory, size):
+    """Écrit les scénarios synthétiques en dossiers d'images PNG annotés"""
+    for name, source, intervals in synthetic_clips(size):
+        clip_dir = os.path.join(directory, name)
+        os.makedirs(clip_dir, exist_ok=True)
+        with source:
+            for index, frame in enumerate(source):
+                cv2.imwrite(os.path.join(clip_dir, f"frame_{index:05d}.png"), frame)
+        with open(os.path.join(clip_dir, 'labels.json'), 'w') as f:
+            json.dump({'motion': intervals, 'size': list(size)}, f)
+        print(f"📁 Fixture: {clip_dir} ({source.frames} images, {len(intervals)} événements)")
+
+
+def to_events(flags, max_gap=2):
+    """Regroupe les images détectées en événements [début, fin) en tolérant de courts trous"""
+    events = []
+    start = last = None
+    for index, flag in enumerate(flags):
+        if not flag:
+            continue
+        if start is not None and index - last <= max_gap + 1:
+            last = index
+            continue
+        if start is not None:
+            events.append((start, last + 1))
+        start = last = index
+    if start is not None:
+        events.append((start, last + 1))
+    return events
+
+
+def overlaps(a, b, tolerance):
+    return a[0] < b[1] + tolerance and b[0] < a[1] + tolerance
+
+
+def score(flags, intervals, tolerance=2):
+    """Précision/rappel au niveau image et au niveau événement
+
+    Une image détectée à moins de `tolerance` images d'un intervalle annoté
+    n'est pas comptée comme faux positif (apparition/disparition de l'objet).
+    """
+    truth = [False] * len(flags)
+    near = [False] * len(flags)
+    for start, end in intervals:
+        for index in range(max(0, start), min(len(flags), end)):
+            truth[index] = True
+        for index in range(max(0, start - tolerance), min(len(flags), end + tolerance)):
+            near[index] = True
+
+    tp = sum(1 for f, t in zip(flags, truth) if f and t)
+    fp = sum(1 for f, n in zip(flags, near) if f and not n)
+    fn = sum(1 for f, t in zip(flags, truth) if t and not f)
+
+    events = to_events(flags)
+    matched_events = sum(1 for e in events if any(overlaps(e, i, tolerance) for i in intervals))
+    found_intervals = sum(1 for i in intervals if any(overlaps(e, i, tolerance) for e in events))
+
+    return {
+        'frame_precision': tp / (tp + fp) if tp + fp else 1.0,
+        'frame_recall': tp / (tp + fn) if tp + fn else 1.0,
+        'event_precision': matched_events / len(events) if events else 1.0,
+        'event_recall': found_intervals / len(intervals) if intervals else 1.0,
+        'events_detected': len(events),
+        'events_labeled': len(intervals),
+    }
+
+
+def run_clip(name, source, intervals, detector_kwargs):
+    detector = ProfiledDetector(**detector_kwargs)
+    latencies = []
+    flags = []
+
+    with source:
+        wall_start = time.perf_counter()
+        while True:
+            cpu_start = time.process_time()
+            frame = source.read()
+            detector.cpu['read'] += time.process_time() - cpu_start
+            if frame is None:
+                break
+            start = time.perf_counter()
+            motion_detected, _ = detector.process(frame)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            flags.append(motion_detected)
+        wall = time.perf_counter() - wall_start
+
+    frames = len(flags)
+    result = {
+        'clip': name,
+        'frames': frames,
+        'fps': frames / wall if wall > 0 else 0.0,
+        'latency_ms_p50': percentile(latencies, 50),
+        'latency_ms_p99': percentile(latencies, 99),
+        'cpu_ms_per_frame': {
+            stage: (seconds * 1000.0 / frames if frames else 0.0)
+            for stage, seconds in detector.cpu.items()
+        },
+    }
+    result.update(score(flags, intervals))
+    return result
+
+
+def print_report(results, params):
+    print("=" * 100)
+    print(f"Seuil={params['threshold']}  Flou={params['blur_kernel']}  "
+          f"Diff={params['diff_threshold']}  Taille={params['size'][0]}x{params['size'][1]}  "
+          f"Zones={params['zones'] or '-'}")
+    print("=" * 100)
+    header = f"{'clip':<16}{'images':>7}{'img/s':>9}{'p50 ms':>9}{'p99 ms':>9}" \
+             f"{'P img':>8}{'R img':>8}{'P evt':>8}{'R evt':>8}{'evts':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['clip']:<16}{r['frames']:>7}{r['fps']:>9.1f}{r['latency_ms_p50']:>9.2f}"
+              f"{r['latency_ms_p99']:>9.2f}{r['frame_precision']:>8.2f}{r['frame_recall']:>8.2f}"
+              f"{r['event_precision']:>8.2f}{r['event_recall']:>8.2f}"
+              f"{r['events_detected']:>4}/{r['events_labeled']:<3}")
+    print()
+    print("Temps CPU par image (ms): " + "  ".join(STAGES))
+    for r in results:
+        cpu = r['cpu_ms_per_frame']
+        print(f"  {r['clip']:<16}" + "  ".join(f"{cpu[stage]:.3f}" for stage in STAGES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark débit/précision du détecteur de mouvement")
+    parser.add_argument('clips', nargs='*', help="Clips annotés (dossier d'images ou vidéo)")
+    parser.add_argument('--threshold', type=int, default=MOTION_THRESHOLD, help="MOTION_THRESHOLD")
+    parser.add_argument('--blur', type=int, default=BLUR_KERNEL, help="Taille du noyau de flou (impair)")
+    parser.add_argument('--diff', type=int, default=DIFF_THRESHOLD, help="Seuil de différence par pixel")
+    parser.add_argument('--size', type=parse_size, default=FRAME_SIZE, help="Résolution LxH (ex: 320x240)")
+    parser.add_argument('--zones', help="Fichier JSON de zones d'intérêt (voir ZONES_FILE)")
+    parser.add_argument('--json', help="Écrit les résultats au format JSON dans ce fichier")
+    parser.add_argument('--make-fixtures', metavar='DIR', help="Génère les fixtures synthétiques puis quitte")
+    args = parser.parse_args()
+
+    if args.blur % 2 == 0:
+        parser.error("--blur doit être impair")
+
+    if args.make_fixtures:
+        make_fixtures(args.make_fixtures, args.size)
+        return 0
+
+    params = {
+        'threshold': args.threshold,
+        'blur_kernel': args.blur,
+        'diff_threshold': args.diff,
+        'size': list(args.size),
+        'zones': args.zones,
+    }
+    detector_kwargs = {
+        'threshold': args.threshold,
+        'blur_kernel': args.blur,
+        'diff_threshold': args.diff,
+        'zones': load_zones(args.zones),
+        'frame_size': args.size,
+    }
+
+    clips = [load_clip(path, args.size) for path in args.clips] if args.clips else synthetic_clips(args.size)
+    results = [run_clip(name, source, intervals, detector_kwargs) for name, source, intervals in clips]
+
+    print_report(results, params)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'params': params, 'results': results}, f, indent=2)
+        print(f"\n💾 Résultats → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Sources d'images pour la détection de mouvement
+Permet de faire tourner le détecteur sans Pi Camera (webcam, vidéo, dossier, synthétique)
+
+Sélection par une chaîne de configuration (variable FRAME_SOURCE):
+    picamera                    Pi Camera via Picamera2 (défaut)
+    v4l2[:/dev/video0|:0]       Webcam V4L2 via cv2.VideoCapture
+    video:/chemin/clip.mp4      Fichier vidéo (rejeu)
+    images:/chemin/dossier      Dossier d'images triées par nom (rejeu)
+    synthetic[:seed=1,frames=300]  Générateur déterministe avec mouvement simulé
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """Interface commune: start() / read() / stop()
+
+    read() retourne une image BGR (numpy HxWx3) ou None en fin de flux.
+    `realtime` indique une source caméra (le détecteur doit se cadencer lui-même);
+    les sources de rejeu sont lues aussi vite que possible.
+    """
+    realtime = False
+
+    def __init__(self, size=None):
+        self.size = size
+
+    def start(self):
+        pass
+
+    def read(self):
+        raise NotImplementedError
+
+    def stop(self):
+        pass
+
+    def _resize(self, frame):
+        """Redimensionne à la taille demandée si nécessaire"""
+        if self.size is None or frame is None:
+            return frame
+        if (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, tuple(self.size), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+
+class PicameraSource(FrameSource):
+    """Pi Camera (Picamera2), importée seulement si utilisée"""
+    realtime = True
+
+    def __init__(self, size=(640, 480), warmup=2.0):
+        super().__init__(size)
+        self.warmup = warmup
+        self.picam2 = None
+
+    def start(self):
+        from picamera2 import Picamera2
+
+        self.picam2 = Picamera2()
+        config = self.picam2.create_preview_configuration(main={"format": "RGB888", "size": tuple(self.size)})
+        self.picam2.configure(config)
+        self.picam2.start()
+        time.sleep(self.warmup)  # Chauffe caméra
+
+    def read(self):
+        return self.picam2.capture_array()
+
+    def stop(self):
+        if self.picam2 is not None:
+            self.picam2.stop()
+            self.picam2 = None
+
+
+class VideoCaptureSource(FrameSource):
+    """cv2.VideoCapture: webcam V4L2 (temps réel) ou fichier vidéo (rejeu)"""
+
+    def __init__(self, target, size=None, realtime=False):
+        super().__init__(size)
+        self.target = target
+        self.realtime = realtime
+        self.capture = None
+
+    def start(self):
+        if self.realtime:
+            self.capture = cv2.VideoCapture(self.target, cv2.CAP_V4L2)
+            if self.size:
+                self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+                self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        else:
+            if not os.path.isfile(self.target):
+                raise FileNotFoundError(f"Vidéo introuvable: {self.target}")
+            self.capture = cv2.VideoCapture(self.target)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Impossible d'ouvrir la source vidéo: {self.target}")
+
+    def read(self):
+        ok, frame = self.capture.read()
+        if not ok:
+            return None
+        return self._resize(frame)
+
+    def stop(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class ImageDirectorySource(FrameSource):
+    """Dossier d'images lues dans l'ordre alphabétique (fixtures de rejeu)"""
+
+    def __init__(self, directory, size=None):
+        super().__init__(size)
+        self.directory = directory
+        self.files = []
+        self.index = 0
+
+    def start(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Dossier introuvable: {self.directory}")
+        self.files = sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.index = 0
+
+    def read(self):
+        while self.index < len(self.files):
+            path = self.files[self.index]
+            self.index += 1
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is not None:
+                return self._resize(frame)
+        return None
+
+
+class SyntheticSource(FrameSource):
+    """Générateur déterministe: fond bruité fixe + objet mobile pendant des intervalles connus
+
+    `motion_intervals` liste les plages [début, fin) d'images contenant du mouvement,
+    ce qui sert de vérité terrain pour les benchmarks.
+    """
+
+    def __init__(self, size=(640, 480), frames=300, seed=0, motion_intervals=None,
+                 noise=4, object_size=None):
+        super().__init__(size)
+        self.frames = frames
+        self.seed = seed
+        self.noise = noise
+        if motion_intervals is None:
+            # Un passage d'objet par tranche de 100 images
+            motion_intervals = [(start + 40, start + 70) for start in range(0, frames, 100)]
+        self.motion_intervals = [(int(a), int(b)) for a, b in motion_intervals]
+        width, height = self.size
+        self.object_size = object_size or (width // 3, height // 2)
+        self.index = 0
+        self.rng = None
+        self.background = None
+
+    def start(self):
+        width, height = self.size
+        self.rng = np.random.default_rng(self.seed)
+        self.background = self.rng.integers(60, 120, size=(height, width, 3), dtype=np.uint8)
+        self.index = 0
+
+    def _active_interval(self, index):
+        for start, end in self.motion_intervals:
+            if start <= index < end:
+                return start, end
+        return None
+
+    def read(self):
+        if self.index >= self.frames:
+            return None
+        index = self.index
+        self.index += 1
+
+        frame = self.background.copy()
+        if self.noise:
+            jitter = self.rng.integers(-self.noise, self.noise + 1, size=frame.shape, dtype=np.int16)
+            frame = np.clip(frame.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+
+        interval = self._active_interval(index)
+        if interval is not None:
+            start, _ = interval
+            width, height = self.size
+            obj_w, obj_h = self.object_size
+            # Déplacement d'une largeur d'objet par image (mouvement franc, type passage)
+            x = ((index - start) * obj_w) % max(1, width - obj_w)
+            y = (height - obj_h) // 2
+            frame[y:y + obj_h, x:x + obj_w] = (230, 230, 230)
+        return frame
+
+    def has_motion(self, index):
+        """Vérité terrain: l'image `index` contient-elle du mouvement ?"""
+        return self._active_interval(index) is not None
+
+
+def _parse_options(text):
+    """'seed=1,frames=300' -> {'seed': 1, 'frames': 300}"""
+    options = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = item.partition('=')
+        options[key.strip()] = int(value) if value.strip().lstrip('-').isdigit() else value.strip()
+    return options
+
+
+def open_frame_source(spec="picamera", size=(640, 480)):
+    """Construit une source d'images depuis sa chaîne de configuration"""
+    kind, _, arg = (spec or "picamera").partition(':')
+    kind = kind.strip().lower()
+
+    if kind == "picamera":
+        return PicameraSource(size=size)
+    if kind == "v4l2":
+        device = arg or "/dev/video0"
+        target = int(device) if device.isdigit() else device
+        return VideoCaptureSource(target, size=size, realtime=True)
+    if kind == "video":
+        return VideoCaptureSource(arg, size=size)
+    if kind == "images":
+        return ImageDirectorySource(arg, size=size)
+    if kind == "synthetic":
+        return SyntheticSource(size=size, **_parse_options(arg))
+    raise ValueError(f"Source d'images inconnue: {spec}. Valides: picamera, v4l2, video, images, synthetic")
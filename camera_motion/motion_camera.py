@@ -9,7 +9,9 @@ import time
 import os
 from datetime import datetime
 import paho.mqtt.publish as publish
-from picamera2 import Picamera2
+
+from frame_sources import open_frame_source
+from motion_detector import MotionDetector
 
 # ======== CONFIGURATION MQTT ========
 MQTT_BROKER = "localhost"
@@ -23,94 +25,84 @@ DELAY_BETWEEN_PHOTOS = 5      # secondes entre photos
 DELAY_BETWEEN_MQTT = 2        # secondes entre publications MQTT
 MOTION_THRESHOLD = 50000      # sensibilité (plus petit = plus sensible)
 
+# ======== SOURCE D'IMAGES ========
+FRAME_SOURCE = os.getenv("FRAME_SOURCE", "picamera")
+FRAME_SIZE = (640, 480)
+
 # ======== DOSSIER PHOTOS ========
-PHOTO_DIR = "/home/dev/IOT/camera_motion/photos"
-os.makedirs(PHOTO_DIR, exist_ok=True)
-
-# ======== INITIALISATION CAMERA ========
-print("🎥 Initialisation caméra...")
-picam2 = Picamera2()
-config = picam2.create_preview_configuration(main={"format": "RGB888", "size": (640, 480)})
-picam2.configure(config)
-picam2.start()
-time.sleep(2)  # Chauffe caméra
-
-# Variables
-last_frame = None
-last_photo_time = 0
-last_mqtt_time = 0
-photo_count = 0
-
-print(f"✅ Caméra prête")
-print(f"📁 Photos → {PHOTO_DIR}")
-print(f"🔔 Seuil détection: {MOTION_THRESHOLD}")
-print(f"📡 MQTT Broker: {MQTT_BROKER}")
-print("---")
-
-try:
-    while True:
-        # Capture image
-        frame = picam2.capture_array()
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
-
-        if last_frame is None:
-            last_frame = gray
-            continue
-
-        # Différence entre frames
-        frame_diff = cv2.absdiff(last_frame, gray)
-        thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)[1]
-        thresh = cv2.dilate(thresh, None, iterations=2)
-
-        # Calcul zone de mouvement
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        motion_detected = False
-        max_contour_area = 0
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > max_contour_area:
-                max_contour_area = area
-            if area > MOTION_THRESHOLD:
-                motion_detected = True
-
-        current_time = time.time()
-
-        # Si mouvement détecté
-        if motion_detected:
-            
-            # 📸 Prendre photo (avec délai minimum)
-            if (current_time - last_photo_time) > DELAY_BETWEEN_PHOTOS:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{PHOTO_DIR}/motion_{timestamp}.jpg"
-                cv2.imwrite(filename, frame)
-                print(f"📸 Photo: {filename} (aire={max_contour_area})")
-                photo_count += 1
-                last_photo_time = current_time
-
-            # 📡 Publier sur MQTT (avec délai minimum)
-            if (current_time - last_mqtt_time) > DELAY_BETWEEN_MQTT:
-                try:
-                    publish.single(
-                        MQTT_TOPIC,
-                        payload="1",
-                        hostname=MQTT_BROKER,
-                        port=MQTT_PORT,
-                        auth={'username': MQTT_USER, 'password': MQTT_PASS}
-                    )
-                    print(f"📡 MQTT publié: {MQTT_TOPIC} = 1")
-                    last_mqtt_time = current_time
-                except Exception as e:
-                    print(f"❌ Erreur MQTT: {e}")
-
-        last_frame = gray
-        time.sleep(0.1)
-
-except KeyboardInterrupt:
-    print("\n🛑 Arrêt détection mouvement")
-    picam2.stop()
-except Exception as e:
-    print(f"❌ Erreur: {e}")
-    picam2.stop()
+PHOTO_DIR = os.getenv("PHOTO_DIR", "/home/dev/IOT/camera_motion/photos")
+
+
+def main():
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+
+    # ======== INITIALISATION CAMERA ========
+    print("🎥 Initialisation caméra...")
+
+    source = open_frame_source(FRAME_SOURCE, FRAME_SIZE)
+    source.start()
+    detector = MotionDetector(threshold=MOTION_THRESHOLD)
+
+    print(f"✅ Caméra prête")
+    print(f"📁 Photos → {PHOTO_DIR}")
+    print(f"🔔 Seuil détection: {MOTION_THRESHOLD}")
+    print(f"📡 MQTT Broker: {MQTT_BROKER}")
+    print("---")
+
+    # Variables
+    last_photo_time = 0
+    last_mqtt_time = 0
+    photo_count = 0
+
+    try:
+        while True:
+            # Capture image
+            frame = source.read()
+            if frame is None:
+                print("🏁 Fin de la source d'images")
+                break
+
+            motion_detected, max_contour_area = detector.process(frame)
+
+            current_time = time.time()
+
+            # Si mouvement détecté
+            if motion_detected:
+
+                # 📸 Prendre photo (avec délai minimum)
+                if (current_time - last_photo_time) > DELAY_BETWEEN_PHOTOS:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"{PHOTO_DIR}/motion_{timestamp}.jpg"
+                    cv2.imwrite(filename, frame)
+                    print(f"📸 Photo: {filename} (aire={max_contour_area})")
+                    photo_count += 1
+                    last_photo_time = current_time
+
+                # 📡 Publier sur MQTT (avec délai minimum)
+                if (current_time - last_mqtt_time) > DELAY_BETWEEN_MQTT:
+                    try:
+                        publish.single(
+                            MQTT_TOPIC,
+                            payload="1",
+                            hostname=MQTT_BROKER,
+                            port=MQTT_PORT,
+                            auth={'username': MQTT_USER, 'password': MQTT_PASS}
+                        )
+                        print(f"📡 MQTT publié: {MQTT_TOPIC} = 1")
+                        last_mqtt_time = current_time
+                    except Exception as e:
+                        print(f"❌ Erreur MQTT: {e}")
+
+            if source.realtime:
+                time.sleep(0.1)
+
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt détection mouvement")
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+    finally:
+        source.stop()
+
+
+if __name__ == "__main__":
+    main()
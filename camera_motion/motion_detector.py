@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 """
-Détection de mouvement avec Pi Camera v1 (ov5647)
+Détection de mouvement avec caméra Pi
 Publie sur MQTT et sauvegarde photos
+
+La source d'images est choisie via FRAME_SOURCE (voir frame_sources.py),
+ce qui permet de rejouer des vidéos ou des images hors du Raspberry Pi.
 """
 
 import cv2
+import json
+import numpy as np
 import time
 import os
 from datetime import datetime
 import paho.mqtt.publish as publish
-from picamera2 import Picamera2
+
+from frame_sources import open_frame_source
+from photo_store import THUMB_QUALITY, THUMB_SIZES, PhotoIndex, derivative_dimensions, derivative_path
 
 # ======== CONFIGURATION MQTT ========
 MQTT_BROKER = "localhost"
@@ -17,106 +24,301 @@ MQTT_PORT = 1883
 MQTT_USER = "admin"
 MQTT_PASS = "adminpass"
 MQTT_TOPIC = "server-room/motion"
+MQTT_ZONES_TOPIC = "server-room/motion/zones"
+MQTT_PHOTO_TOPIC = "server-room/camera/photo"   # nom de chaque nouvelle photo (WebSocket du dashboard)
 
 # ======== CONFIGURATION DETECTION ========
 DELAY_BETWEEN_PHOTOS = 5      # secondes entre photos
 DELAY_BETWEEN_MQTT = 2        # secondes entre publications MQTT
 MOTION_THRESHOLD = 50000      # sensibilité (plus petit = plus sensible)
+BLUR_KERNEL = 21              # taille du flou gaussien (impair)
+DIFF_THRESHOLD = 25           # écart de luminosité minimal d'un pixel "en mouvement"
+
+# ======== CADENCE ADAPTATIVE ========
+ACTIVE_INTERVAL = 0.1         # secondes entre images en mode rafale (pleine cadence)
+IDLE_INTERVAL = 1.0           # secondes entre images en mode veille
+IDLE_AFTER = 30               # secondes sans activité avant de passer en veille
+WAKE_RATIO = 0.2              # fraction de MOTION_THRESHOLD qui suffit à repasser en rafale
+
+# ======== ZONES D'INTERET (ROI) ========
+# Fichier JSON {"porte": [[x, y], ...], "baie_a": [[x, y], ...]} en pixels de FRAME_SIZE.
+# Sans fichier, toute l'image est analysée.
+ZONES_FILE = os.getenv("ZONES_FILE", "")
+
+# ======== SOURCE D'IMAGES ========
+FRAME_SOURCE = os.getenv("FRAME_SOURCE", "picamera")
+FRAME_SIZE = (640, 480)
 
 # ======== DOSSIER PHOTOS ========
-PHOTO_DIR = "/home/dev/IOT/camera_motion/photos"
-os.makedirs(PHOTO_DIR, exist_ok=True)
-
-# ======== INITIALISATION CAMERA ========
-print("=" * 60)
-print("🎥 Initialisation Pi Camera v1 (ov5647)")
-print("=" * 60)
-
-picam2 = Picamera2()
-config = picam2.create_preview_configuration(main={"format": "RGB888", "size": (640, 480)})
-picam2.configure(config)
-picam2.start()
-time.sleep(2)  # Chauffe caméra
-
-print("✅ Caméra prête")
-print(f"📁 Photos → {PHOTO_DIR}")
-print(f"🔔 Seuil détection: {MOTION_THRESHOLD}")
-print(f"📡 MQTT: {MQTT_BROKER} → {MQTT_TOPIC}")
-print("=" * 60)
-
-# Variables
-last_frame = None
-last_photo_time = 0
-last_mqtt_time = 0
-photo_count = 0
-
-try:
-    while True:
-        # Capture image
-        frame = picam2.capture_array()
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+PHOTO_DIR = os.getenv("PHOTO_DIR", "/home/dev/IOT/camera_motion/photos")
+PHOTO_MAX_AGE_DAYS = float(os.getenv("PHOTO_MAX_AGE_DAYS", "30"))   # 0 = pas de limite d'âge
+PHOTO_MAX_MB = float(os.getenv("PHOTO_MAX_MB", "2048"))             # 0 = pas de limite de taille
+
+
+def load_zones(path):
+    """Charge les polygones de zones depuis un fichier JSON"""
+    if not path:
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    zones = {}
+    for name, points in data.items():
+        if len(points) < 3:
+            raise ValueError(f"Zone {name}: au moins 3 points requis")
+        zones[name] = [(int(x), int(y)) for x, y in points]
+    return zones or None
+
+
+class MotionDetector:
+    """Compare chaque image à la précédente et mesure la plus grande zone en mouvement
+
+    Avec des zones (polygones), seule la boîte englobante des zones est traitée
+    et les pixels hors polygones sont masqués avant la recherche de contours.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, blur_kernel=BLUR_KERNEL, diff_threshold=DIFF_THRESHOLD,
+                 zones=None, frame_size=FRAME_SIZE):
+        self.threshold = threshold
+        self.blur_kernel = (blur_kernel, blur_kernel)
+        self.diff_threshold = diff_threshold
+        self.last_frame = None
+        self.last_mask = None
+        self.crop = None
+        self.roi_mask = None
+        self.zone_masks = {}
+        if zones:
+            self._build_zone_masks(zones, frame_size)
 
-        if last_frame is None:
-            last_frame = gray
-            continue
+    def _build_zone_masks(self, zones, frame_size):
+        """Précalcule la découpe et les masques de zones (une seule fois)"""
+        width, height = frame_size
+        points = np.array([p for polygon in zones.values() for p in polygon], dtype=np.int32)
+        x0, y0 = np.clip(points.min(axis=0), 0, [width - 1, height - 1])
+        x1, y1 = np.clip(points.max(axis=0) + 1, 1, [width, height])
+        self.crop = (slice(int(y0), int(y1)), slice(int(x0), int(x1)))
 
-        # Différence entre frames
-        frame_diff = cv2.absdiff(last_frame, gray)
-        thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)[1]
+        shape = (int(y1 - y0), int(x1 - x0))
+        self.roi_mask = np.zeros(shape, dtype=np.uint8)
+        for name, polygon in zones.items():
+            mask = np.zeros(shape, dtype=np.uint8)
+            cv2.fillPoly(mask, [np.array(polygon, dtype=np.int32) - (x0, y0)], 255)
+            self.zone_masks[name] = (mask, max(1, cv2.countNonZero(mask)))
+            cv2.bitwise_or(self.roi_mask, mask, dst=self.roi_mask)
+
+    def process(self, frame):
+        """Retourne (mouvement_détecté, aire_max); (False, 0) pour la première image"""
+        gray = self.preprocess(frame)
+
+        if self.last_frame is None:
+            self.last_frame = gray
+            return False, 0
+
+        thresh = self.motion_mask(gray)
+        self.last_frame = gray
+        self.last_mask = thresh
+        max_contour_area = self.largest_area(thresh)
+
+        return max_contour_area > self.threshold, max_contour_area
+
+    def preprocess(self, frame):
+        """Niveaux de gris + flou pour lisser le bruit capteur"""
+        if self.crop is not None:
+            frame = frame[self.crop]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, self.blur_kernel, 0)
+
+    def motion_mask(self, gray):
+        """Masque binaire des pixels qui ont changé depuis l'image précédente"""
+        frame_diff = cv2.absdiff(self.last_frame, gray)
+        thresh = cv2.threshold(frame_diff, self.diff_threshold, 255, cv2.THRESH_BINARY)[1]
         thresh = cv2.dilate(thresh, None, iterations=2)
+        if self.roi_mask is not None:
+            cv2.bitwise_and(thresh, self.roi_mask, dst=thresh)
+        return thresh
 
-        # Calcul zone de mouvement
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def largest_area(self, thresh):
+        """Aire du plus grand contour de mouvement"""
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        motion_detected = False
         max_contour_area = 0
-        
         for contour in contours:
             area = cv2.contourArea(contour)
             if area > max_contour_area:
                 max_contour_area = area
-            if area > MOTION_THRESHOLD:
-                motion_detected = True
-
-        current_time = time.time()
-
-        # Si mouvement détecté
-        if motion_detected:
-            
-            # 📸 Prendre photo (avec délai minimum)
-            if (current_time - last_photo_time) > DELAY_BETWEEN_PHOTOS:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{PHOTO_DIR}/motion_{timestamp}.jpg"
-                cv2.imwrite(filename, frame)
-                print(f"📸 Photo: motion_{timestamp}.jpg (aire={max_contour_area:.0f})")
-                photo_count += 1
-                last_photo_time = current_time
-
-            # 📡 Publier sur MQTT (avec délai minimum)
-            if (current_time - last_mqtt_time) > DELAY_BETWEEN_MQTT:
-                try:
-                    publish.single(
-                        MQTT_TOPIC,
-                        payload="1",
-                        hostname=MQTT_BROKER,
-                        port=MQTT_PORT,
-                        auth={'username': MQTT_USER, 'password': MQTT_PASS}
-                    )
-                    print(f"📡 MQTT: {MQTT_TOPIC} = 1")
-                    last_mqtt_time = current_time
-                except Exception as e:
-                    print(f"❌ Erreur MQTT: {e}")
-
-        last_frame = gray
-        time.sleep(0.1)
-
-except KeyboardInterrupt:
-    print("\n" + "=" * 60)
-    print("🛑 Arrêt détection mouvement")
-    print(f"📊 Total photos prises: {photo_count}")
+        return max_contour_area
+
+    def zone_scores(self):
+        """Part (en %) de chaque zone en mouvement sur la dernière image"""
+        if not self.zone_masks or self.last_mask is None:
+            return {}
+        scores = {}
+        for name, (mask, pixels) in self.zone_masks.items():
+            moving = cv2.countNonZero(cv2.bitwise_and(self.last_mask, mask))
+            scores[name] = round(100 * moving / pixels)
+        return scores
+
+
+class AdaptiveRate:
+    """Cadence de capture: veille quand la scène est statique, rafale dès qu'elle bouge
+
+    Le réveil se fait sur un seuil plus bas que la détection (WAKE_RATIO) pour
+    revenir à pleine cadence avant que le mouvement ne franchisse MOTION_THRESHOLD.
+    """
+
+    def __init__(self, wake_area=MOTION_THRESHOLD * WAKE_RATIO, active_interval=ACTIVE_INTERVAL,
+                 idle_interval=IDLE_INTERVAL, idle_after=IDLE_AFTER):
+        self.wake_area = wake_area
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.last_activity = time.monotonic()
+        self.idle = False
+
+    def update(self, area, now=None):
+        """Met à jour l'état avec l'aire de mouvement mesurée et retourne l'intervalle cible"""
+        now = time.monotonic() if now is None else now
+        if area > self.wake_area:
+            self.last_activity = now
+            if self.idle:
+                self.idle = False
+                print("⚡ Mode rafale")
+        elif not self.idle and (now - self.last_activity) > self.idle_after:
+            self.idle = True
+            print(f"💤 Mode veille ({self.idle_interval}s entre images)")
+        return self.idle_interval if self.idle else self.active_interval
+
+
+def save_thumbnails(frame, filename):
+    """Écrit les miniatures depuis l'image déjà en mémoire (évite de relire le JPEG)"""
+    height, width = frame.shape[:2]
+    name = os.path.basename(filename)
+    for size in THUMB_SIZES:
+        path = derivative_path(PHOTO_DIR, name, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        small = cv2.resize(frame, derivative_dimensions(width, height, size), interpolation=cv2.INTER_AREA)
+        cv2.imwrite(path, small, [cv2.IMWRITE_JPEG_QUALITY, THUMB_QUALITY])
+
+
+def save_to_index(photo_index, filename, timestamp):
+    """Indexe la nouvelle photo puis applique la rétention (âge puis taille totale)"""
+    try:
+        photo_index.add(os.path.basename(filename), timestamp, os.path.getsize(filename))
+        deleted = photo_index.enforce_retention(
+            max_age=PHOTO_MAX_AGE_DAYS * 86400,
+            max_bytes=PHOTO_MAX_MB * 1024 * 1024
+        )
+        if deleted:
+            print(f"🧹 Rétention: {len(deleted)} photo(s) supprimée(s)")
+    except Exception as e:
+        print(f"❌ Erreur index photos: {e}")
+
+
+def main():
+    os.makedirs(PHOTO_DIR, exist_ok=True)
+    photo_index = PhotoIndex(PHOTO_DIR)
+    added, removed = photo_index.sync()
+    if added or removed:
+        print(f"🗂️ Index photos resynchronisé (+{added} / -{removed})")
+
+    # ======== INITIALISATION CAMERA ========
+    print("=" * 60)
+    print("🎥 Initialisation Pi Camera v1 (ov5647)")
+    print("=" * 60)
+    source = open_frame_source(FRAME_SOURCE, FRAME_SIZE)
+    source.start()
+    zones = load_zones(ZONES_FILE)
+    detector = MotionDetector(zones=zones, frame_size=FRAME_SIZE)
+    rate = AdaptiveRate()
+
+    # Variables
+    last_photo_time = 0
+    last_mqtt_time = 0
+    photo_count = 0
+
+    print("✅ Caméra prête")
+    print(f"📁 Photos → {PHOTO_DIR}")
+    print(f"🔔 Seuil détection: {MOTION_THRESHOLD}")
+    if zones:
+        print(f"🗺️ Zones: {', '.join(zones)}")
+    print(f"📡 MQTT: {MQTT_BROKER} → {MQTT_TOPIC}")
     print("=" * 60)
-    picam2.stop()
-except Exception as e:
-    print(f"❌ Erreur: {e}")
-    picam2.stop()
\ No newline at end of file
+
+    try:
+        while True:
+            loop_start = time.monotonic()
+
+            # Capture image
+            frame = source.read()
+            if frame is None:
+                print("🏁 Fin de la source d'images")
+                break
+
+            motion_detected, max_contour_area = detector.process(frame)
+
+            current_time = time.time()
+
+            # Si mouvement détecté
+            if motion_detected:
+
+                # 📸 Prendre photo (avec délai minimum)
+                if (current_time - last_photo_time) > DELAY_BETWEEN_PHOTOS:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"{PHOTO_DIR}/motion_{timestamp}.jpg"
+                    cv2.imwrite(filename, frame)
+                    save_thumbnails(frame, filename)
+                    print(f"📸 Photo: motion_{timestamp}.jpg (aire={max_contour_area:.0f})")
+                    photo_count += 1
+                    last_photo_time = current_time
+                    save_to_index(photo_index, filename, current_time)
+                    try:
+                        publish.single(
+                            MQTT_PHOTO_TOPIC,
+                            payload=os.path.basename(filename),
+                            hostname=MQTT_BROKER,
+                            port=MQTT_PORT,
+                            auth={'username': MQTT_USER, 'password': MQTT_PASS}
+                        )
+                    except Exception as e:
+                        print(f"❌ Erreur MQTT photo: {e}")
+
+                # 📡 Publier sur MQTT (avec délai minimum)
+                if (current_time - last_mqtt_time) > DELAY_BETWEEN_MQTT:
+                    messages = [{'topic': MQTT_TOPIC, 'payload': "1"}]
+                    if zones:
+                        scores = json.dumps(detector.zone_scores(), separators=(',', ':'))
+                        messages.append({'topic': MQTT_ZONES_TOPIC, 'payload': scores})
+                    try:
+                        publish.multiple(
+                            messages,
+                            hostname=MQTT_BROKER,
+                            port=MQTT_PORT,
+                            auth={'username': MQTT_USER, 'password': MQTT_PASS}
+                        )
+                        print(f"📡 MQTT: {MQTT_TOPIC} = 1")
+                        if zones:
+                            print(f"📡 MQTT: {MQTT_ZONES_TOPIC} = {scores}")
+                        last_mqtt_time = current_time
+                    except Exception as e:
+                        print(f"❌ Erreur MQTT: {e}")
+
+            interval = rate.update(max_contour_area, loop_start)
+            if source.realtime:
+                # Cadence cible: on ne dort que le temps restant après traitement
+                remaining = interval - (time.monotonic() - loop_start)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+    except KeyboardInterrupt:
+        print("\n" + "=" * 60)
+        print("🛑 Arrêt détection mouvement")
+        print(f"📊 Total photos prises: {photo_count}")
+        print("=" * 60)
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+    finally:
+        source.stop()
+        photo_index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Index SQLite des photos de mouvement + rétention
+Écrit par le détecteur à chaque photo, lu par l'API pour lister les dernières
+photos sans parcourir tout le dossier.
+
+Le fichier d'index vit dans le dossier photos (PHOTO_DIR/index.sqlite3),
+les miniatures dans PHOTO_DIR/.thumbs/<taille>/.
+Ce module n'utilise que la bibliothèque standard (chargé par l'API REST, voir PHOTO_STORE).
+Seul le détecteur écrit l'index (schéma, WAL); l'API l'ouvre en lecture seule.
+"""
+
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+
+INDEX_NAME = "index.sqlite3"
+PHOTO_EXTENSION = ".jpg"
+
+# Images dérivées (miniatures): nom -> largeur en pixels, stockées dans PHOTO_DIR/.thumbs/<nom>/
+THUMB_DIR = ".thumbs"
+THUMB_SIZES = {"thumb": 160, "medium": 320}
+THUMB_QUALITY = 80
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    filename TEXT PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_photos_timestamp ON photos (timestamp);
+"""
+
+
+def derivative_path(photo_dir, filename, size):
+    """Chemin de la version `size` d'une photo (le fichier peut ne pas encore exister)"""
+    return os.path.join(str(photo_dir), THUMB_DIR, size, filename)
+
+
+def derivative_dimensions(width, height, size):
+    """Dimensions d'une dérivée en conservant le ratio"""
+    target = THUMB_SIZES[size]
+    return target, max(1, round(height * target / width))
+
+
+class PhotoIndex:
+    """Index des photos (nom, date, taille) trié par date via un index SQLite"""
+
+    def __init__(self, photo_dir, db_path=None, read_only=False):
+        self.photo_dir = str(photo_dir)
+        self.db_path = str(db_path or os.path.join(self.photo_dir, INDEX_NAME))
+        self.read_only = read_only
+        self._local = threading.local()
+
+    @classmethod
+    def open_existing(cls, photo_dir):
+        """Index en lecture seule s'il a déjà été créé par le détecteur, sinon None"""
+        if os.path.isfile(os.path.join(str(photo_dir), INDEX_NAME)):
+            return cls(photo_dir, read_only=True)
+        return None
+
+    def _conn(self):
+        """Une connexion par thread (sqlite3 n'aime pas le partage entre threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.read_only:
+                # Ni schéma ni changement de journal: le fichier appartient au détecteur
+                uri = pathlib.Path(self.db_path).resolve().as_uri() + "?mode=ro"
+                conn = sqlite3.connect(uri, uri=True, timeout=5)
+            else:
+                conn = sqlite3.connect(self.db_path, timeout=5)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def add(self, filename, timestamp, size):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO photos (filename, timestamp, size) VALUES (?, ?, ?)",
+                (filename, timestamp, size)
+            )
+
+    def recent(self, limit):
+        """Les `limit` photos les plus récentes (parcours de l'index, O(limit))"""
+        rows = self._conn().execute(
+            "SELECT filename, timestamp, size FROM photos ORDER BY timestamp DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def sync(self):
+        """Resynchronise l'index avec le dossier (photos ajoutées ou supprimées à la main)
+
+        Retourne (ajoutées, retirées).
+        """
+        on_disk = {}
+        with os.scandir(self.photo_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(PHOTO_EXTENSION):
+                    st = entry.stat()
+                    on_disk[entry.name] = (st.st_mtime, st.st_size)
+
+        conn = self._conn()
+        indexed = {row[0] for row in conn.execute("SELECT filename FROM photos")}
+        added = [(name, *on_disk[name]) for name in on_disk.keys() - indexed]
+        removed = [(name,) for name in indexed - on_disk.keys()]
+        with conn:
+            conn.executemany("INSERT INTO photos (filename, timestamp, size) VALUES (?, ?, ?)", added)
+            conn.executemany("DELETE FROM photos WHERE filename = ?", removed)
+        return len(added), len(removed)
+
+    def enforce_retention(self, max_age=None, max_bytes=None, now=None):
+        """Supprime les photos plus vieilles que `max_age` secondes puis les plus anciennes
+        tant que le total dépasse `max_bytes`. Retourne la liste des fichiers supprimés.
+        """
+        conn = self._conn()
+        now = time.time() if now is None else now
+        expired = []
+
+        if max_age:
+            expired += [row[0] for row in conn.execute(
+                "SELECT filename FROM photos WHERE timestamp < ?", (now - max_age,)
+            )]
+
+        if max_bytes:
+            total = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM photos WHERE timestamp >= ?",
+                (now - max_age if max_age else float("-inf"),)
+            ).fetchone()[0]
+            if total > max_bytes:
+                cursor = conn.execute(
+                    "SELECT filename, size FROM photos WHERE timestamp >= ? ORDER BY timestamp ASC",
+                    (now - max_age if max_age else float("-inf"),)
+                )
+                for filename, size in cursor:
+                    if total <= max_bytes:
+                        break
+                    expired.append(filename)
+                    total -= size
+
+        if not expired:
+            return []
+
+        for filename in expired:
+            self._remove_files(filename)
+        with conn:
+            conn.executemany("DELETE FROM photos WHERE filename = ?", [(f,) for f in expired])
+        return expired
+
+    def _remove_files(self, filename):
+        paths = [os.path.join(self.photo_dir, filename)]
+        paths += [derivative_path(self.photo_dir, filename, size) for size in THUMB_SIZES]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -8,7 +8,22 @@ USE serverroom;
 -- Créer la table
 CREATE TABLE IF NOT EXISTS sensor_data (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    room VARCHAR(64),
+    device_id VARCHAR(64),
     sensor_type VARCHAR(50),
     value FLOAT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,   -- fourni par mqtt_logger: heure de l'appareil ou de réception
+    INDEX idx_timestamp (timestamp),
+    INDEX idx_sensor_timestamp (sensor_type, timestamp),
+    INDEX idx_room_sensor_timestamp (room, sensor_type, timestamp),
+    INDEX idx_device_sensor_timestamp (device_id, sensor_type, timestamp)
 );
+
+-- Base existante (créée sans index): export par période et historique par capteur
+-- ALTER TABLE sensor_data ADD INDEX idx_timestamp (timestamp), ADD INDEX idx_sensor_timestamp (sensor_type, timestamp);
+
+-- Base existante (une seule salle): salle et appareil d'origine de chaque mesure (voir mqtt_logger/topic_router.py)
+-- ALTER TABLE sensor_data ADD COLUMN room VARCHAR(64) AFTER id, ADD COLUMN device_id VARCHAR(64) AFTER room,
+--     ADD INDEX idx_room_sensor_timestamp (room, sensor_type, timestamp),
+--     ADD INDEX idx_device_sensor_timestamp (device_id, sensor_type, timestamp);
+-- UPDATE sensor_data SET room = 'server-room' WHERE room IS NULL;
@@ -20,6 +20,8 @@ DHT dht(DHTPIN, DHTTYPE);
 WiFiClient espClient;
 PubSubClient client(espClient);
 
+unsigned long seq = 0;   // numéro de message (déduplication côté logger)
+
 void setup_wifi() {
   Serial.print("Connexion WiFi");
   WiFi.begin(ssid, password);
@@ -85,19 +87,13 @@ void loop() {
   float hum = dht.readHumidity();
 
   if (!isnan(temp) && !isnan(hum)) {
-    // Température
-    char tempStr[8];
-    dtostrf(temp, 4, 2, tempStr);
-    client.publish("server-room/temperature", tempStr);
-    Serial.print("Temperature publiee: ");
-    Serial.println(tempStr);
-
-    // Humidité
-    char humStr[8];
-    dtostrf(hum, 4, 2, humStr);
-    client.publish("server-room/humidity", humStr);
-    Serial.print("Humidite publiee: ");
-    Serial.println(humStr);
+    // Température + humidité en un seul message (voir api_rest/telemetry.py)
+    char payload[96];
+    seq++;
+    snprintf(payload, sizeof(payload), "{\"seq\":%lu,\"temperature\":%.2f,\"humidity\":%.2f}", seq, temp, hum);
+    client.publish("server-room/esp32-serverroom/telemetry", payload);
+    Serial.print("Mesures publiees: ");
+    Serial.println(payload);
   }
 
   delay(10000); // 10 secondes
@@ -1,6 +1,7 @@
 #include <WiFi.h>
 #include <PubSubClient.h>
 #include <DHT.h>
+#include <time.h>
 
 #define DHTPIN 18
 #define DHTTYPE DHT11
@@ -19,6 +20,11 @@ PubSubClient client(espClient);
 unsigned long lastPublish = 0;
 const long publishInterval = 10000;
 
+// Une lecture complète par message JSON (voir api_rest/telemetry.py)
+const char* telemetry_topic = "server-room/esp32-dht11/telemetry";
+const char* ntp_server = "192.168.4.1";
+unsigned long seq = 0;
+
 void setup_wifi() {
   Serial.println("Connexion WiFi...");
   WiFi.begin(ssid, password);
@@ -63,6 +69,8 @@ void setup() {
   Serial.println("DHT11 pret");
   
   setup_wifi();
+  // Horodatage des mesures par l'appareil (ts omis tant que l'heure n'est pas synchronisée)
+  configTime(0, 0, ntp_server, "pool.ntp.org");
   client.setServer(mqtt_server, mqtt_port);
   client.setBufferSize(512);
   client.setCallback(callback);
@@ -94,25 +102,20 @@ void loop() {
       return;
     }
     
-    char tempStr[10];
-    char humStr[10];
-    snprintf(tempStr, sizeof(tempStr), "%.2f", temp);
-    snprintf(humStr, sizeof(humStr), "%.2f", hum);
-    
-    // Publication température
-    Serial.print("=> Pub temp...");
-    if (client.publish("server-room/temperature", tempStr)) {
-      Serial.println("OK");
+    // Température + humidité en un seul message
+    char payload[128];
+    time_t ts = time(nullptr);
+    seq++;
+    if (ts > 1700000000) {
+      snprintf(payload, sizeof(payload), "{\"ts\":%ld,\"seq\":%lu,\"temperature\":%.2f,\"humidity\":%.2f}",
+               (long)ts, seq, temp, hum);
     } else {
-      Serial.println("ECHEC");
+      snprintf(payload, sizeof(payload), "{\"seq\":%lu,\"temperature\":%.2f,\"humidity\":%.2f}",
+               seq, temp, hum);
     }
     
-    client.loop();
-    delay(500);  // Délai important entre les deux publications
-    
-    // Publication humidité
-    Serial.print("=> Pub hum...");
-    if (client.publish("server-room/humidity", humStr)) {
+    Serial.print("=> Pub telemetry...");
+    if (client.publish(telemetry_topic, payload)) {
       Serial.println("OK");
     } else {
       Serial.println("ECHEC");
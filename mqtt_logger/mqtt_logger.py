@@ -1,19 +1,157 @@
 #!/usr/bin/env python3
+"""
+Enregistreur MQTT -> MariaDB
+Les messages reçus (server-room/# par défaut) sont routés vers (salle, appareil,
+capteur) selon TOPIC_PATTERNS (voir topic_router.py), mis en file puis écrits par lots
+(un INSERT multi-lignes + un commit par lot) par un thread dédié, sur une
+connexion persistante: le thread MQTT ne fait jamais d'attente réseau vers la base.
+
+Charges utiles: une valeur par topic (server-room/temperature -> "21.50") ou
+plusieurs mesures par message JSON sur .../telemetry (voir api_rest/telemetry.py);
+les mesures d'un même message sont écrites dans le même INSERT. Si la base refuse
+un lot pour une ligne, le lot est coupé en deux jusqu'à isoler la ligne fautive:
+seule celle-ci est perdue.
+
+Horodatage: chaque ligne porte l'heure de l'appareil (ts) si elle est plausible,
+sinon l'heure de réception, jamais l'heure du commit: tampons, lots et reprises
+après coupure ne décalent pas la série. Les messages numérotés (seq) déjà reçus
+sont ignorés (sequence_window.py); les messages en retard sont écrits à leur date.
+
+Plusieurs instances (processus ou machines): SHARED_GROUP=loggers abonne chaque
+instance à $share/loggers/server-room/# (MQTT v5): le broker répartit les messages
+entre les membres du groupe, chaque message n'est écrit qu'une fois. Chaque instance
+a son propre identifiant client (LOGGER_INSTANCE, par défaut <hôte>-<pid>).
+La déduplication par seq reste locale à une instance: un renvoi distribué à une
+autre instance du groupe n'est pas détecté.
+
+Plusieurs processus sur une machine (le GIL limite un processus à un coeur):
+--workers N (ou LOGGER_WORKERS=N) lance un superviseur et N processus; chacun
+reçoit tous les messages et ne traite que les appareils qui lui reviennent par
+hachage cohérent (sharding.py). Le superviseur relance les processus arrêtés et
+expose leurs métriques additionnées (METRICS_DIR). Incompatible avec SHARED_GROUP
+(le broker répartit déjà les messages): combiner les deux perdrait des messages.
+
+Observabilité (pas de print par message):
+- métriques Prometheus sur http://METRICS_HOST:METRICS_PORT/metrics: messages
+  reçus par topic, insérés par capteur, échecs par cause, taille des lots, durée
+  des commits et latence réception -> commit;
+- une ligne de synthèse toutes les STATS_INTERVAL secondes;
+- LOG_LEVEL=DEBUG: un message sur LOG_SAMPLE est journalisé en détail.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import paho.mqtt.client as mqtt
 import pymysql
-import time
+
+# Registre de métriques partagé avec l'API (api_rest/metrics.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api_rest"))
+import metrics  # noqa: E402
+import telemetry  # noqa: E402
+from sequence_window import DUPLICATE, LATE, RESTART, SequenceWindow  # noqa: E402
+from sharding import HashRing, shard_key  # noqa: E402
+from topic_router import TopicRouter  # noqa: E402
 
 # Configuration DB
-DB_HOST = "localhost"
-DB_USER = "apiuser"
-DB_PASS = "apipass"
-DB_NAME = "serverroom"
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_USER = os.getenv("DB_USER", "apiuser")
+DB_PASS = os.getenv("DB_PASS", "apipass")
+DB_NAME = os.getenv("DB_NAME", "serverroom")
 
 # Configuration MQTT
-MQTT_BROKER = "localhost"
-MQTT_PORT = 1883
-MQTT_USER = "logger"
-MQTT_PASS = "logpass"
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "logger")
+MQTT_PASS = os.getenv("MQTT_PASS", "logpass")
+MQTT_TOPICS = os.getenv("MQTT_TOPICS", "server-room/#").split(",")     # abonnements (un par site)
+MQTT_QOS = int(os.getenv("MQTT_QOS", "1"))      # 1: pas de perte broker -> logger, doublons filtrés par seq
+
+# ======== CONFIG INSTANCES ========
+LOGGER_INSTANCE = os.getenv("LOGGER_INSTANCE", "") or f"{socket.gethostname()}-{os.getpid()}"
+SHARED_GROUP = os.getenv("SHARED_GROUP", "")    # ex: loggers -> $share/loggers/<topic>, "" = abonnement normal
+MQTT_V5 = os.getenv("MQTT_V5", "1" if SHARED_GROUP else "0") == "1"
+
+# ======== CONFIG MULTI-PROCESSUS ========
+LOGGER_WORKERS = int(os.getenv("LOGGER_WORKERS", "1"))  # >1: superviseur + N processus
+LOGGER_SHARD = int(os.getenv("LOGGER_SHARD", "0"))      # fixés par le superviseur pour chaque processus
+LOGGER_SHARDS = int(os.getenv("LOGGER_SHARDS", "1"))
+METRICS_DIR = os.getenv("METRICS_DIR", "")              # état des processus, additionné par le superviseur
+WORKER_RESTART_DELAY = 2.0      # secondes avant de relancer un processus arrêté
+
+VALID_SENSORS = ('temperature', 'light', 'motion', 'humidity', 'distance')
+
+# ======== CONFIG INGESTION ========
+BATCH_MAX = int(os.getenv("BATCH_MAX", "200"))          # lignes max par INSERT
+BATCH_WAIT = float(os.getenv("BATCH_WAIT", "0.2"))      # secondes max avant l'écriture d'un lot incomplet
+QUEUE_MAX = int(os.getenv("QUEUE_MAX", "10000"))        # messages; au-delà (base indisponible), ils sont perdus
+# Hiérarchie multi-appareils d'abord, topics d'origine (salle unique, appareil inconnu) ensuite.
+# server-room/alarm/state correspond aussi à {room}/{device}/{sensor}: ignoré (capteur "state" inconnu)
+TOPIC_PATTERNS = os.getenv("TOPIC_PATTERNS", "{site}/{room}/{device}/{sensor},{room}/{device}/{sensor},{room}/{sensor}")
+# Horloge de l'appareil acceptée de MAX_CLOCK_AHEAD s dans le futur à MAX_BACKFILL s dans le passé
+MAX_CLOCK_AHEAD = float(os.getenv("MAX_CLOCK_AHEAD", "300"))
+MAX_BACKFILL = float(os.getenv("MAX_BACKFILL", str(7 * 24 * 3600)))
+DEDUP_WINDOW = int(os.getenv("DEDUP_WINDOW", "1024"))     # numéros de séquence mémorisés par flux
+
+# ======== CONFIG OBSERVABILITÉ ========
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9101"))   # 0 = pas de serveur HTTP
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE = max(1, int(os.getenv("LOG_SAMPLE", "100")))
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", "60"))
+MAX_TOPIC_LABELS = 1000         # topics distincts suivis; les suivants sont comptés sous "other"
+
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger("mqtt_logger")
+
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Jusqu'à plusieurs minutes: rattrapage après une coupure de la base
+LATENCY_BUCKETS = metrics.DEFAULT_BUCKETS + (30.0, 60.0, 300.0)
+
+registry = metrics.Registry(prefix="mqtt_logger_")
+RECEIVED = registry.counter("messages_received_total", "Messages MQTT reçus", label="topic")
+INSERTED = registry.counter("messages_inserted_total", "Mesures écrites en base", label="sensor")
+FAILED = registry.counter("messages_failed_total", "Messages perdus", label="reason")
+BATCH_SIZE = registry.histogram("batch_size", "Lignes par INSERT", buckets=BATCH_BUCKETS)
+COMMIT_DURATION = registry.histogram("commit_duration_seconds", "Durée INSERT + commit d'un lot")
+DUPLICATES = registry.counter("messages_duplicate_total", "Messages déjà reçus (même seq), ignorés")
+OUT_OF_ORDER = registry.counter("messages_out_of_order_total", "Messages arrivés après un seq plus récent")
+RESTARTS = registry.counter("device_restarts_total", "Redémarrages d'appareils détectés (seq)")
+CLOCK_REJECTED = registry.counter("device_clock_rejected_total",
+                                  "Horodatages d'appareil hors limites (heure de réception utilisée)")
+INGEST_LATENCY = registry.histogram(
+    "ingest_latency_seconds",
+    "Délai jusqu'au commit: depuis la réception (receive) ou l'horloge de l'appareil (device)",
+    label="source", buckets=LATENCY_BUCKETS,
+)
+
+
+# Codes serveur d'une base indisponible (trop de connexions, accès refusé, arrêt, connexion tuée);
+# les codes >= 2000 sont ceux du client (serveur injoignable, connexion perdue)
+CONNECTION_ERROR_CODES = {1040, 1044, 1045, 1053, 1927}
+
+
+def connection_error(error):
+    """True si toute écriture échouerait (base indisponible), False si la base a refusé des lignes"""
+    if isinstance(error, (pymysql.err.InterfaceError, OSError)):
+        return True
+    if isinstance(error, pymysql.err.OperationalError) and error.args and isinstance(error.args[0], int):
+        return error.args[0] >= 2000 or error.args[0] in CONNECTION_ERROR_CODES
+    return False
+
 
 def get_db():
     return pymysql.connect(
@@ -23,43 +161,443 @@ def get_db():
         database=DB_NAME
     )
 
-def on_connect(client, userdata, flags, rc):
+
+class BatchWriter:
+    """Thread d'écriture: vide la file par lots d'environ BATCH_MAX lignes (messages entiers)"""
+
+    def __init__(self, connect=get_db, batch_max=BATCH_MAX, batch_wait=BATCH_WAIT, queue_max=QUEUE_MAX):
+        self.connect = connect
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait
+        self.queue = queue.Queue(maxsize=queue_max)
+        self.conn = None
+        self.last_commit = None         # time.time() du dernier commit réussi
+        self._thread = threading.Thread(target=self._run, daemon=True, name="db-writer")
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, rows):
+        """Lignes d'un message: (salle, appareil, capteur, valeur, réception, ts appareil, seq)
+
+        Retourne False si la file est pleine.
+        """
+        try:
+            self.queue.put_nowait(rows)
+            return True
+        except queue.Full:
+            return False
+
+    def stop(self, timeout=10.0):
+        """Écrit ce qui est déjà en file puis arrête le thread"""
+        if self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+    def _next_batch(self):
+        """(lot, arrêt demandé)"""
+        batch = []
+        item = self.queue.get()
+        deadline = time.monotonic() + self.batch_wait
+        while item is not None:
+            batch += item
+            if len(batch) >= self.batch_max:
+                break
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+        return batch, item is None
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if not batch:
+                continue
+            self.write_isolating(batch)
+
+    def write_isolating(self, batch):
+        """Écrit le lot; si la base refuse une ligne (valeur invalide...), écrit chaque moitié
+        séparément pour n'en perdre que la ligne fautive
+
+        Retourne l'erreur de connexion qui a interrompu l'écriture (lignes restantes perdues), sinon None.
+        """
+        try:
+            self.write(batch)
+            return None
+        except Exception as e:
+            if len(batch) == 1 or connection_error(e):
+                FAILED.inc("db", len(batch))
+                if len(batch) == 1:
+                    logger.error(f"Mesure refusée par la base {batch[0][:4]}: {e}")
+                else:
+                    logger.error(f"Écriture d'un lot de {len(batch)} mesures impossible: {e}")
+                return e if connection_error(e) else None
+        middle = len(batch) // 2
+        error = self.write_isolating(batch[:middle])
+        if error is not None:
+            FAILED.inc("db", len(batch) - middle)
+            return error
+        return self.write_isolating(batch[middle:])
+
+    def write(self, batch):
+        start = time.perf_counter()
+        try:
+            self._insert(batch)
+        except pymysql.err.Error as e:
+            if not connection_error(e):
+                raise
+            # Connexion fermée par le serveur (wait_timeout, redémarrage): une seule reprise
+            self._close()
+            self._insert(batch)
+        COMMIT_DURATION.observe(time.perf_counter() - start)
+        BATCH_SIZE.observe(len(batch))
+
+        now = self.last_commit = time.time()
+        for _, _, sensor, _, received, device_ts, _ in batch:
+            INSERTED.inc(sensor)
+            INGEST_LATENCY.observe(now - received, "receive")
+            if device_ts is not None:
+                INGEST_LATENCY.observe(max(0.0, now - device_ts), "device")
+
+    def _insert(self, batch):
+        if self.conn is None:
+            self.conn = self.connect()
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO sensor_data (room, device_id, sensor_type, value, timestamp) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    [(room, device, sensor, value, datetime.fromtimestamp(received if device_ts is None else device_ts))
+                     for room, device, sensor, value, received, device_ts, _ in batch]
+                )
+            self.conn.commit()
+        except Exception as e:
+            if connection_error(e):
+                self._close()
+            else:
+                # Lot refusé: la connexion reste utilisable pour réessayer ses moitiés
+                try:
+                    self.conn.rollback()
+                except Exception:
+                    self._close()
+            raise
+
+    def _close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+
+writer = BatchWriter()
+sequences = SequenceWindow(window=DEDUP_WINDOW)
+router = TopicRouter.from_string(TOPIC_PATTERNS)
+ring = HashRing(LOGGER_SHARDS) if LOGGER_SHARDS > 1 else None
+debug_sample = logger.isEnabledFor(logging.DEBUG)
+topic_labels = set()
+received_count = 0
+
+
+def topic_label(topic):
+    if topic in topic_labels:
+        return topic
+    if len(topic_labels) < MAX_TOPIC_LABELS:
+        topic_labels.add(topic)
+        return topic
+    return "other"
+
+
+def subscriptions():
+    """Filtres d'abonnement (partagés entre les instances du groupe si SHARED_GROUP)"""
+    prefix = f"$share/{SHARED_GROUP}/" if SHARED_GROUP else ""
+    return [(prefix + topic, MQTT_QOS) for topic in MQTT_TOPICS]
+
+
+def on_connect(client, userdata, flags, rc, properties=None):
+    # properties: présent en MQTT v5 (rc est alors un ReasonCode, comparable à 0)
     if rc == 0:
-        print("Connected to MQTT broker")
-        client.subscribe("server-room/#")
+        topics = subscriptions()
+        logger.info(f"Connected to MQTT broker ({client_id()}: {', '.join(t for t, _ in topics)})")
+        client.subscribe(topics)
     else:
-        print(f"Connection failed with code {rc}")
+        logger.error(f"Connection failed with code {rc}")
+
 
 def on_message(client, userdata, msg):
+    global received_count
+    received = time.time()
     topic = msg.topic
-    payload = msg.payload.decode()
-    
-    # Extraire le type de capteur du topic
-    sensor_type = topic.split("/")[-1]
-    
-    # Ne logger que les capteurs valides
-    if sensor_type in ['temperature', 'light', 'motion', 'humidity', 'distance']:
-        try:
-            value = float(payload)
-            conn = get_db()
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO sensor_data (sensor_type, value) VALUES (%s, %s)",
-                (sensor_type, value)
-            )
-            conn.commit()
-            cursor.close()
-            conn.close()
-            print(f"Logged: {topic} = {value}")
-        except Exception as e:
-            print(f"Error logging {topic}: {e}")
 
-# Créer le client MQTT
-client = mqtt.Client(client_id="mqtt-logger")
+    # Salle, appareil et type de capteur d'après le topic
+    route = router.route(topic)
+
+    # Plusieurs processus: les appareils des autres sont ignorés avant tout décodage
+    if ring is not None and ring.shard(shard_key(topic, route)) != LOGGER_SHARD:
+        return
+    received_count += 1
+    RECEIVED.inc(topic_label(topic))
+
+    if route is None:
+        return
+    room, device, sensor_type = route
+
+    try:
+        if sensor_type == telemetry.TELEMETRY:
+            readings, device_ts, seq = telemetry.decode(msg.payload, VALID_SENSORS)
+            if device_ts is not None and not received - MAX_BACKFILL <= device_ts <= received + MAX_CLOCK_AHEAD:
+                CLOCK_REJECTED.inc()
+                device_ts = None
+            if seq is not None and not accept_sequence(topic, seq, device_ts):
+                return
+            rows = [(room, device, name, value, received, device_ts, seq) for name, value in readings.items()]
+        elif sensor_type in VALID_SENSORS:
+            value = float(msg.payload)
+            if not math.isfinite(value):
+                # nan/inf: refusés par MariaDB, ils feraient échouer tout le lot
+                raise ValueError(f"Valeur non finie: {value}")
+            rows = [(room, device, sensor_type, value, received, None, None)]
+        else:
+            # Commandes, états, photos: ignorés
+            return
+    except ValueError:
+        FAILED.inc("invalid")
+        logger.warning(f"Message invalide sur {topic}: {msg.payload[:50]!r}")
+        return
+    if not rows:
+        return
+    if not writer.put(rows):
+        FAILED.inc("queue_full", len(rows))
+        return
+    if debug_sample and received_count % LOG_SAMPLE == 0:
+        logger.debug(f"Reçu: {topic} = {[row[2:4] for row in rows]} (file: {writer.queue.qsize()})")
+
+
+def accept_sequence(topic, seq, device_ts):
+    """False si le message a déjà été reçu"""
+    verdict = sequences.check(topic, seq, device_ts)
+    if verdict == DUPLICATE:
+        DUPLICATES.inc()
+        if debug_sample:
+            logger.debug(f"Doublon ignoré: {topic} seq={seq}")
+        return False
+    if verdict == LATE:
+        OUT_OF_ORDER.inc()
+    elif verdict == RESTART:
+        RESTARTS.inc()
+        logger.info(f"Séquence réinitialisée: {topic} seq={seq}")
+    return True
+
+
+# ---------- exposition ----------
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = registry.render().encode()
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/health":
+            body = json.dumps(health()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Pas de ligne de journal par scrape
+        pass
+
+
+def start_metrics_server():
+    try:
+        server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+    except OSError as e:
+        # Autre instance sur la même machine: METRICS_PORT distinct par instance
+        logger.warning(f"Métriques indisponibles sur le port {METRICS_PORT}: {e}")
+        return
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    logger.info(f"Métriques sur http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
+workers = {}                    # superviseur: numéro -> subprocess.Popen
+
+
+def health():
+    if workers:
+        return {
+            "instance": LOGGER_INSTANCE,
+            "workers": {str(shard): proc.poll() is None for shard, proc in workers.items()},
+        }
+    return {
+        "instance": LOGGER_INSTANCE,
+        "mqtt_connected": client.is_connected(),
+        "queue": writer.queue.qsize(),
+        "last_commit": writer.last_commit,
+    }
+
+
+def totals():
+    """Compteurs principaux, tous processus confondus"""
+    snapshot = registry.collect()
+
+    def total(metric):
+        return sum(snapshot.get(registry.prefix + metric, {}).get("series", {}).values())
+
+    return {
+        "received": total("messages_received_total"),
+        "inserted": total("messages_inserted_total"),
+        "failed": total("messages_failed_total"),
+        "queue": total("queue_depth"),
+    }
+
+
+def log_stats():
+    """Synthèse périodique à la place d'une ligne par message"""
+    previous = totals()
+    while True:
+        time.sleep(STATS_INTERVAL)
+        current = totals()
+        logger.info(
+            f"Ingestion: {(current['received'] - previous['received']) / STATS_INTERVAL:.1f} msg/s reçus, "
+            f"{(current['inserted'] - previous['inserted']) / STATS_INTERVAL:.1f} mesures/s écrites, "
+            f"{current['failed']} perdues au total, file {current['queue']}"
+        )
+        previous = current
+
+
+registry.callback("queue_depth", "Messages en attente d'écriture", lambda: writer.queue.qsize())
+
+
+def client_id():
+    return f"mqtt-logger-{LOGGER_INSTANCE}"
+
+
+# Créer le client MQTT (identifiant unique: deux instances ne s'éjectent pas du broker)
+client = mqtt.Client(client_id=client_id(), protocol=mqtt.MQTTv5 if MQTT_V5 else mqtt.MQTTv311)
 client.username_pw_set(MQTT_USER, MQTT_PASS)
 client.on_connect = on_connect
 client.on_message = on_message
 
-# Connexion au broker
-client.connect(MQTT_BROKER, MQTT_PORT, 60)
-client.loop_forever()
+registry.callback("mqtt_connected", "1 si connecté au broker", lambda: int(client.is_connected()))
+
+
+
+# ---------- exécution ----------
+def run_worker():
+    """Un processus d'ingestion (seul, ou l'un des N processus d'un superviseur)"""
+    if METRICS_DIR:
+        registry.share(METRICS_DIR, interval=1.0)
+
+    def stop(signum, frame):
+        logger.info("Arrêt demandé")
+        client.disconnect()
+
+    signal.signal(signal.SIGTERM, stop)
+    writer.start()
+    if METRICS_PORT:
+        start_metrics_server()
+    if STATS_INTERVAL > 0:
+        threading.Thread(target=log_stats, daemon=True, name="stats").start()
+
+    # Connexion au broker
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    # Les mesures déjà reçues sont écrites avant de quitter
+    writer.stop()
+    registry.dump(final=True)
+
+
+def spawn_worker(shard, count, directory):
+    env = dict(
+        os.environ,
+        LOGGER_WORKERS="1",
+        LOGGER_SHARD=str(shard),
+        LOGGER_SHARDS=str(count),
+        LOGGER_INSTANCE=f"{LOGGER_INSTANCE}-{shard}",
+        METRICS_DIR=directory,
+        METRICS_PORT="0",
+        STATS_INTERVAL="0",
+    )
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+
+def supervise(count):
+    """Lance `count` processus, les relance s'ils s'arrêtent, expose leurs métriques additionnées"""
+    if SHARED_GROUP:
+        logger.error("--workers et SHARED_GROUP sont incompatibles (voir en tête de fichier)")
+        return 1
+    temporary = not METRICS_DIR
+    directory = METRICS_DIR or tempfile.mkdtemp(prefix="mqtt-logger-metrics-")
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            os.remove(os.path.join(directory, name))
+    registry.directory = directory
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for shard in range(count):
+        workers[shard] = spawn_worker(shard, count, directory)
+    logger.info(f"{count} processus d'ingestion démarrés (métriques: {directory})")
+    if METRICS_PORT:
+        start_metrics_server()
+    if STATS_INTERVAL > 0:
+        threading.Thread(target=log_stats, daemon=True, name="stats").start()
+
+    restart_at = {}
+    while not stopping.wait(0.5):
+        now = time.monotonic()
+        for shard, proc in workers.items():
+            if proc.poll() is None:
+                continue
+            if shard not in restart_at:
+                logger.warning(f"Processus {shard} arrêté (code {proc.returncode}), "
+                               f"relance dans {WORKER_RESTART_DELAY}s")
+                restart_at[shard] = now + WORKER_RESTART_DELAY
+            elif now >= restart_at[shard]:
+                del restart_at[shard]
+                workers[shard] = spawn_worker(shard, count, directory)
+
+    for proc in workers.values():
+        if proc.poll() is None:
+            proc.terminate()
+    for proc in workers.values():
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    if temporary:
+        shutil.rmtree(directory, ignore_errors=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enregistreur MQTT -> MariaDB")
+    parser.add_argument("--workers", type=int, default=LOGGER_WORKERS,
+                        help="Processus d'ingestion (répartition des appareils par hachage cohérent)")
+    args = parser.parse_args()
+    if args.workers > 1:
+        return supervise(args.workers)
+    run_worker()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Déduplication des messages numérotés (champ seq des messages telemetry)
+Pour chaque flux (topic d'un appareil): plus grand seq vu + bitmap des WINDOW
+numéros précédents. Mémoire bornée: quelques dizaines d'octets par flux, flux
+les moins récents oubliés au-delà de MAX_STREAMS.
+
+Verdicts:
+- NEW: seq plus grand que tout ce qui a été vu;
+- LATE: seq inférieur mais pas encore vu (message retardé, vidage d'un tampon): à écrire;
+- DUPLICATE: déjà vu (redistribution QoS 1, renvoi après reconnexion), ou message d'avant
+  le dernier redémarrage redistribué après celui-ci (seq jusqu'au dernier seq d'avant le
+  redémarrage et horodatage antérieur à celui-ci): à ignorer;
+- RESTART: redémarrage de l'appareil (seq revenu à 1 sans ts, ou horodatage plus récent que
+  tout ce qui a été vu avec un seq déjà passé) ou écart hors fenêtre: l'état repart de ce message.
+
+Un recul de l'horloge de l'appareil (correction NTP) sans redémarrage ne fait rien ignorer:
+seuls les messages d'avant un redémarrage sont écartés d'après leur horodatage.
+"""
+
+from collections import OrderedDict
+
+NEW = "new"
+LATE = "late"
+DUPLICATE = "duplicate"
+RESTART = "restart"
+
+WINDOW = 1024
+MAX_STREAMS = 10000
+
+
+class SequenceWindow:
+    def __init__(self, window=WINDOW, max_streams=MAX_STREAMS):
+        self.window = window
+        self.max_streams = max_streams
+        self._full = (1 << window) - 1
+        # flux -> [plus grand seq, bitmap, ts le plus récent, (seq, ts) du dernier redémarrage ou None]
+        self._streams = OrderedDict()
+
+    def __len__(self):
+        return len(self._streams)
+
+    def check(self, stream, seq, ts=None):
+        """Verdict pour le message `seq` du flux; enregistre le message s'il est à écrire"""
+        state = self._streams.get(stream)
+        if state is None:
+            self._reset(stream, seq, ts)
+            return NEW
+        self._streams.move_to_end(stream)
+
+        top, mask, newest, restart = state
+        if restart is not None:
+            previous_top, restart_ts = restart
+            if seq > previous_top:
+                # Numéros au-delà de la session précédente: plus de confusion possible
+                state[3] = None
+            elif ts is not None and restart_ts is not None and ts < restart_ts:
+                # Message de la session précédente, redistribué après le redémarrage
+                return DUPLICATE
+
+        if seq > top:
+            shift = seq - top
+            state[0] = seq
+            state[1] = ((mask << shift) | 1) & self._full if shift < self.window else 1
+            if ts is not None and (newest is None or ts > newest):
+                state[2] = ts
+            return NEW
+
+        distance = top - seq
+        if distance >= self.window or self._restarted(seq, distance, ts, newest):
+            self._reset(stream, seq, ts, restart=(top, ts))
+            return RESTART
+
+        bit = 1 << distance
+        if mask & bit:
+            return DUPLICATE
+        state[1] = mask | bit
+        return LATE
+
+    @staticmethod
+    def _restarted(seq, distance, ts, newest):
+        if ts is not None and newest is not None:
+            # Une redistribution garde son horodatage d'origine, jamais plus récent
+            return ts > newest
+        # Sans horloge: seul le premier message après démarrage est reconnaissable
+        return seq == 1 and distance > 0
+
+    def _reset(self, stream, seq, ts, restart=None):
+        self._streams[stream] = [seq, 1, ts, restart]
+        self._streams.move_to_end(stream)
+        if len(self._streams) > self.max_streams:
+            self._streams.popitem(last=False)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Répartition des appareils entre les processus du logger (hachage cohérent)
+Chaque processus reçoit tous les messages et ne traite que ceux des appareils
+qui lui reviennent: tous les messages d'un appareil passent par le même processus
+(ordre et déduplication par seq conservés). Passer de N à N+1 processus ne
+déplace qu'environ 1/(N+1) des appareils.
+
+Le hachage (blake2b) est stable d'un processus à l'autre, contrairement à hash().
+"""
+
+import bisect
+import hashlib
+
+REPLICAS = 128                  # points par processus sur l'anneau (équilibre de la répartition)
+MAX_CACHED_KEYS = 100000
+
+
+def _hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    def __init__(self, shards, replicas=REPLICAS):
+        self.shards = shards
+        points = sorted((_hash(f"shard-{shard}#{i}"), shard) for shard in range(shards) for i in range(replicas))
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+        self._cache = {}
+
+    def shard(self, key):
+        """Numéro du processus (0..shards-1) responsable de `key`"""
+        owner = self._cache.get(key)
+        if owner is None:
+            index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+            owner = self._owners[index]
+            if len(self._cache) >= MAX_CACHED_KEYS:
+                self._cache.clear()
+            self._cache[key] = owner
+        return owner
+
+
+def shard_key(topic, route):
+    """Appareil si le topic le désigne, sinon le topic lui-même (firmware d'origine)"""
+    if route is not None and route[1] is not None:
+        return f"{route[0]}/{route[1]}"
+    return topic
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests de la déduplication par numéro de séquence (sequence_window.py)
+Usage: python3 test_sequence_window.py   (ou pytest)
+"""
+import sys
+
+from sequence_window import DUPLICATE, LATE, NEW, RESTART, SequenceWindow
+
+
+def verdicts(messages, window=None):
+    """Verdicts successifs pour une liste de (seq, ts) d'un même flux"""
+    sequences = SequenceWindow() if window is None else SequenceWindow(window=window)
+    return [sequences.check("salle/esp32-01/telemetry", seq, ts) for seq, ts in messages]
+
+
+def test_redelivery():
+    """Redistribution QoS 1 d'un message déjà écrit"""
+    assert verdicts([(1, 100), (2, 101), (2, 101), (1, 100)]) == [NEW, NEW, DUPLICATE, DUPLICATE]
+
+
+def test_late_arrival():
+    """Message retardé (vidage d'un tampon): écrit une fois, puis doublon"""
+    assert verdicts([(1, 100), (3, 102), (2, 101), (2, 101)]) == [NEW, NEW, LATE, DUPLICATE]
+
+
+def test_restart():
+    """seq revenu à 1 avec un horodatage plus récent, ou sans horodatage"""
+    assert verdicts([(10, 100), (11, 110), (1, 200), (2, 210)]) == [NEW, NEW, RESTART, NEW]
+    assert verdicts([(10, None), (11, None), (1, None), (2, None)]) == [NEW, NEW, RESTART, NEW]
+
+
+def test_stale_after_restart():
+    """Message d'avant le redémarrage redistribué après celui-ci: ignoré"""
+    assert verdicts([(10, 100), (11, 110), (1, 200), (2, 210), (11, 110)]) == [NEW, NEW, RESTART, NEW, DUPLICATE]
+    # seq inférieur au plus grand de la nouvelle session, pas encore vu dans celle-ci
+    assert verdicts([(10, 100), (11, 110), (1, 200), (5, 240), (3, 105)]) == [NEW, NEW, RESTART, NEW, DUPLICATE]
+    # Au-delà des numéros de la session précédente, l'horodatage seul ne fait plus rien ignorer
+    assert verdicts([(10, 100), (1, 200), (12, 300), (13, 150)]) == [NEW, RESTART, NEW, NEW]
+
+
+def test_clock_step_backwards():
+    """Correction NTP sans redémarrage: les nouvelles mesures sont écrites"""
+    assert verdicts([(1, 1000), (2, 1001), (3, 999.5), (4, 1000.5)]) == [NEW, NEW, NEW, NEW]
+
+
+def test_gap_outside_window():
+    """Écart plus grand que la fenêtre: l'état repart de ce message"""
+    assert verdicts([(100, None), (10, None), (11, None)], window=64) == [NEW, RESTART, NEW]
+
+
+def main():
+    tests = [(name, fn) for name, fn in globals().items() if name.startswith("test_") and callable(fn)]
+    failed = 0
+    for name, fn in tests:
+        try:
+            fn()
+            print(f"✓ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"✗ {name} {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} tests réussis")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
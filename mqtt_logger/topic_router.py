@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Routage des topics MQTT vers (salle, appareil, capteur)
+Les motifs sont compilés une fois au démarrage, regroupés par nombre de segments;
+le résultat de chaque topic est gardé en cache (une flotte publie toujours les
+mêmes topics): un message ne coûte en général qu'un split et une recherche dans un dict.
+
+Syntaxe d'un motif: segments séparés par "/", littéraux ou champs {nom}, "+" = segment ignoré.
+    {site}/{room}/{device}/{sensor}     server-room/baie-a/esp32-01/temperature
+    {room}/{device}/{sensor}            server-room/esp32-dht11/telemetry
+    {room}/{sensor}                     server-room/temperature (firmware d'origine)
+Le premier motif qui correspond l'emporte. Champs utilisés: room, device, sensor
+(obligatoire); les autres (site...) servent uniquement à la correspondance.
+"""
+
+MAX_CACHED_TOPICS = 10000
+MAX_FIELD_LENGTH = 64           # taille des colonnes room / device_id
+
+
+class Pattern:
+    def __init__(self, text):
+        self.text = text
+        segments = text.split("/")
+        self.length = len(segments)
+        self.literals = []      # (index, texte attendu)
+        self.fields = []        # (index, nom du champ)
+        for index, segment in enumerate(segments):
+            if segment.startswith("{") and segment.endswith("}"):
+                self.fields.append((index, segment[1:-1]))
+            elif segment != "+":
+                if not segment or "#" in segment or "+" in segment or "{" in segment:
+                    raise ValueError(f"Motif de topic invalide: {text} (segment {segment!r})")
+                self.literals.append((index, segment))
+        if "sensor" not in (name for _, name in self.fields):
+            raise ValueError(f"Motif de topic sans {{sensor}}: {text}")
+
+    def match(self, parts):
+        for index, literal in self.literals:
+            if parts[index] != literal:
+                return None
+        return {name: parts[index] for index, name in self.fields}
+
+
+class TopicRouter:
+    def __init__(self, patterns, cache_size=MAX_CACHED_TOPICS):
+        self.patterns = [Pattern(p) for p in patterns]
+        self._by_length = {}
+        for pattern in self.patterns:
+            self._by_length.setdefault(pattern.length, []).append(pattern)
+        self.cache_size = cache_size
+        self._cache = {}
+
+    @classmethod
+    def from_string(cls, text):
+        """ "motif1,motif2" (variable d'environnement)"""
+        return cls([p.strip() for p in text.split(",") if p.strip()])
+
+    def route(self, topic):
+        """(salle, appareil, capteur) ou None si aucun motif ne correspond; salle/appareil peuvent valoir None"""
+        try:
+            return self._cache[topic]
+        except KeyError:
+            pass
+        result = self._route(topic)
+        if len(self._cache) >= self.cache_size:
+            # Topics toujours nouveaux (client mal configuré): on repart de zéro plutôt que de grossir
+            self._cache.clear()
+        self._cache[topic] = result
+        return result
+
+    def _route(self, topic):
+        parts = topic.split("/")
+        for pattern in self._by_length.get(len(parts), ()):
+            fields = pattern.match(parts)
+            if fields is None:
+                continue
+            room, device, sensor = fields.get("room"), fields.get("device"), fields["sensor"]
+            if any(value is not None and (not value or len(value) > MAX_FIELD_LENGTH)
+                   for value in (room, device)):
+                return None
+            return room, device, sensor
+        return None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Test de montée en charge de l'API en mode production (gunicorn)
+Démarre l'API avec 1, 2, ... N workers et mesure le débit obtenu par un
+ensemble de clients concurrents, pour vérifier que le débit suit le nombre de coeurs.
+
+Usage:
+    python bench_api_workers.py                       # 1..nb_coeurs workers
+    python bench_api_workers.py --workers 1,2,4 --clients 32 --duration 10
+    python bench_api_workers.py --endpoint /api/dashboard --json workers.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+# Configuration
+TEST_TOKEN = os.getenv("TEST_TOKEN", "test-token-123")
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api_rest")
+API_PROCESS = None
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+
+def cleanup():
+    """Arrête le processus API si en cours"""
+    global API_PROCESS
+    if API_PROCESS:
+        try:
+            API_PROCESS.terminate()
+            API_PROCESS.wait(timeout=10)
+        except Exception:
+            try:
+                API_PROCESS.kill()
+            except Exception:
+                pass
+        API_PROCESS = None
+
+
+def signal_handler(sig, frame):
+    """Gestionnaire de signal pour arrêter proprement"""
+    cleanup()
+    sys.exit(0)
+
+
+def start_gunicorn(port, workers, threads, env_extra=None):
+    """Démarre l'API sous gunicorn et attend qu'elle réponde"""
+    global API_PROCESS
+    env = os.environ.copy()
+    env.update({
+        "API_TOKEN": TEST_TOKEN,
+        "API_BIND": f"127.0.0.1:{port}",
+        "API_WORKERS": str(workers),
+        "API_THREADS": str(threads),
+        "API_LOG_LEVEL": "warning",
+        # Tous les clients partagent un token et une IP: sans cela, on mesurerait le limiteur
+        "RATE_LIMIT_ENABLED": "0",
+    })
+    env.update(env_extra or {})
+
+    API_PROCESS = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api:app"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=API_DIR
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(40):
+        time.sleep(0.25)
+        if API_PROCESS.poll() is not None:
+            print(f"{RED}Erreur au démarrage de gunicorn:{RESET}")
+            print(API_PROCESS.stderr.read().decode())
+            return None
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return base_url
+        except requests.RequestException:
+            pass
+    return None
+
+
+def client_loop(url, duration, results):
+    """Un client: requêtes en boucle sur une connexion keep-alive pendant `duration` secondes"""
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TEST_TOKEN}"
+    ok = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            response = session.get(url, timeout=10)
+            if response.status_code < 500:
+                ok += 1
+            else:
+                errors += 1
+        except requests.RequestException:
+            errors += 1
+    results.put((ok, errors))
+
+
+def run_load(url, clients, duration):
+    """Lance `clients` processus clients (évite que le GIL du client soit le goulot)"""
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client_loop, args=(url, duration, results)) for _ in range(clients)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    totals = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    ok = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    return ok / elapsed, ok, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit de l'API selon le nombre de workers gunicorn")
+    parser.add_argument("--workers", default=",".join(str(n) for n in range(1, os.cpu_count() + 1)),
+                        help="Liste de nombres de workers (ex: 1,2,4)")
+    parser.add_argument("--threads", type=int, default=1, help="Threads par worker (1 = worker sync)")
+    parser.add_argument("--clients", type=int, default=max(8, 4 * os.cpu_count()), help="Clients concurrents")
+    parser.add_argument("--duration", type=float, default=10, help="Durée de chaque palier (s)")
+    parser.add_argument("--endpoint", default="/api/photos", help="Endpoint testé (défaut: sans DB)")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    # Dossier photos temporaire: /api/photos sert sans dépendre de MariaDB
+    photo_dir = tempfile.mkdtemp(prefix="bench-photos-")
+    for i in range(3):
+        with open(os.path.join(photo_dir, f"motion_2026010{i}_000000.jpg"), "wb") as f:
+            f.write(b"\xff\xd8\xff\xd9")
+
+    print(f"\n{YELLOW}{'=' * 60}")
+    print("MONTÉE EN CHARGE - WORKERS GUNICORN")
+    print(f"{'=' * 60}{RESET}")
+    print(f"Machine: {os.cpu_count()} coeurs | Clients: {args.clients} | Endpoint: {args.endpoint}\n")
+
+    results = []
+    baseline = None
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            print(f"{BLUE}Démarrage: {workers} worker(s) x {args.threads} thread(s)...{RESET}")
+            base_url = start_gunicorn(args.port, workers, args.threads, {"PHOTO_DIR": photo_dir})
+            if base_url is None:
+                print(f"{RED}Impossible de démarrer l'API{RESET}")
+                return 1
+            rps, ok, errors = run_load(base_url + args.endpoint, args.clients, args.duration)
+            cleanup()
+
+            baseline = baseline or rps
+            results.append({"workers": workers, "threads": args.threads, "rps": rps,
+                            "requests": ok, "errors": errors, "speedup": rps / baseline})
+            color = GREEN if errors == 0 else RED
+            print(f"{color}  {workers:>3} worker(s): {rps:8.1f} req/s  x{rps / baseline:.2f}  "
+                  f"(erreurs: {errors}){RESET}")
+    finally:
+        cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "clients": args.clients, "endpoint": args.endpoint,
+                       "duration": args.duration, "results": results}, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
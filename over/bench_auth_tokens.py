@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark du coût de l'authentification par requête
+Compare l'ancienne vérification (hmac.compare_digest sur chaque token configuré)
+à l'index d'empreintes HMAC de api_rest/auth.py, pour 10, 1 000 et 100 000 tokens.
+
+Usage:
+    python bench_auth_tokens.py
+    python bench_auth_tokens.py --sizes 10,1000,100000 --repeat 2000 --json auth.json
+"""
+import argparse
+import hmac
+import json
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api_rest"))
+from auth import TokenStore, check_request  # noqa: E402
+import auth  # noqa: E402
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+
+def linear_check(provided, tokens):
+    """Vérification d'origine: O(nombre de tokens)"""
+    return any(hmac.compare_digest(provided, t) for t in tokens)
+
+
+def per_call_us(fn, repeat):
+    """Temps médian d'un appel en microsecondes (5 séries de `repeat` appels)"""
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        runs.append((time.perf_counter() - start) / repeat * 1e6)
+    return sorted(runs)[2]
+
+
+def bench_size(count, repeat):
+    tokens = [secrets.token_hex(32) for _ in range(count)]
+    # Pire cas de l'ancienne méthode: token valide en dernière position, ou invalide
+    last, unknown = tokens[-1], secrets.token_hex(32)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".tokens", delete=False) as f:
+        f.writelines(f"token-{i} {t}\n" for i, t in enumerate(tokens))
+        path = f.name
+    try:
+        start = time.perf_counter()
+        store = TokenStore(path=path)
+        load_ms = (time.perf_counter() - start) * 1000
+        assert store.verify(last) and not store.verify(unknown)
+
+        auth.token_store = store
+        headers = {"Authorization": f"Bearer {last}"}
+        linear_repeat = max(1, min(repeat, 200_000 // count))
+        return {
+            "tokens": count,
+            "linear_valid_us": per_call_us(lambda: linear_check(last, tokens), linear_repeat),
+            "linear_invalid_us": per_call_us(lambda: linear_check(unknown, tokens), linear_repeat),
+            "indexed_valid_us": per_call_us(lambda: store.verify(last), repeat),
+            "indexed_invalid_us": per_call_us(lambda: store.verify(unknown), repeat),
+            "check_request_us": per_call_us(lambda: check_request(headers, {}, "127.0.0.1"), repeat),
+            "file_load_ms": load_ms,
+        }
+    finally:
+        os.unlink(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût de la vérification des tokens API")
+    parser.add_argument("--sizes", default="10,1000,100000", help="Nombres de tokens (ex: 10,1000,100000)")
+    parser.add_argument("--repeat", type=int, default=5000, help="Appels par série")
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    args = parser.parse_args()
+
+    print(f"\n{YELLOW}{'=' * 72}")
+    print("AUTHENTIFICATION - COÛT PAR REQUÊTE (µs)")
+    print(f"{'=' * 72}{RESET}")
+    print(f"{'tokens':>8} {'linéaire ok':>12} {'linéaire ko':>12} {'index ok':>10} {'index ko':>10} "
+          f"{'check_request':>14} {'chargement':>11}")
+
+    results = []
+    for count in [int(n) for n in args.sizes.split(",")]:
+        print(f"{BLUE}{count:>8}{RESET}", end=" ", flush=True)
+        r = bench_size(count, args.repeat)
+        results.append(r)
+        print(f"{r['linear_valid_us']:>12.1f} {r['linear_invalid_us']:>12.1f} "
+              f"{GREEN}{r['indexed_valid_us']:>10.2f} {r['indexed_invalid_us']:>10.2f}{RESET} "
+              f"{r['check_request_us']:>14.2f} {r['file_load_ms']:>9.1f}ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
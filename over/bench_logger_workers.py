@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Montée en charge de l'ingestion MQTT selon le nombre de processus du logger
+Démarre mqtt_logger.py --workers N pour chaque palier, publie un volume fixe de
+messages telemetry répartis sur un parc d'appareils simulés, puis mesure le débit
+jusqu'à ce que tout soit traité (d'après les métriques additionnées du superviseur).
+
+Nécessite un broker MQTT et une base MariaDB locaux (MQTT_BROKER, MQTT_PORT,
+DB_HOST... comme pour mqtt_logger.py). Sans base, les lignes sont comptées en
+échec mais le débit de traitement (décodage, routage, déduplication) reste mesuré.
+
+Usage:
+    python bench_logger_workers.py                        # 1..nb_coeurs processus
+    python bench_logger_workers.py --workers 1,2,4 --messages 100000 --devices 1000
+    python bench_logger_workers.py --publishers 4 --json logger_workers.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+import paho.mqtt.client as mqtt
+
+# Configuration
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "admin")
+MQTT_PASS = os.getenv("MQTT_PASS", "")
+LOGGER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mqtt_logger")
+LOGGER_PROCESS = None
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+
+def cleanup():
+    """Arrête le logger si en cours"""
+    global LOGGER_PROCESS
+    if LOGGER_PROCESS:
+        try:
+            LOGGER_PROCESS.terminate()
+            LOGGER_PROCESS.wait(timeout=20)
+        except Exception:
+            try:
+                LOGGER_PROCESS.kill()
+            except Exception:
+                pass
+        LOGGER_PROCESS = None
+
+
+def signal_handler(sig, frame):
+    """Gestionnaire de signal pour arrêter proprement"""
+    cleanup()
+    sys.exit(0)
+
+
+def read_metrics(url):
+    """Somme de chaque métrique (toutes séries confondues) depuis /metrics"""
+    totals = {}
+    with urllib.request.urlopen(url, timeout=5) as response:
+        for line in response.read().decode().splitlines():
+            match = re.match(r"^(mqtt_logger_\w+?)(\{[^}]*\})? (\S+)$", line)
+            if match:
+                totals[match.group(1)] = totals.get(match.group(1), 0) + float(match.group(3))
+    return totals
+
+
+def start_logger(workers, metrics_port):
+    """Démarre le superviseur et attend que tous les processus soient connectés au broker"""
+    global LOGGER_PROCESS
+    env = os.environ.copy()
+    env.update({
+        "MQTT_BROKER": MQTT_BROKER,
+        "MQTT_PORT": str(MQTT_PORT),
+        "METRICS_PORT": str(metrics_port),
+        "STATS_INTERVAL": "0",
+        "LOG_LEVEL": "WARNING",
+        "LOGGER_INSTANCE": f"bench-{os.getpid()}",
+    })
+    LOGGER_PROCESS = subprocess.Popen(
+        [sys.executable, "mqtt_logger.py", "--workers", str(workers)] if workers > 1 else [sys.executable, "mqtt_logger.py"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=LOGGER_DIR
+    )
+
+    url = f"http://127.0.0.1:{metrics_port}/metrics"
+    for _ in range(80):
+        time.sleep(0.25)
+        if LOGGER_PROCESS.poll() is not None:
+            print(f"{RED}Erreur au démarrage du logger:{RESET}")
+            print(LOGGER_PROCESS.stderr.read().decode())
+            return None
+        try:
+            if read_metrics(url).get("mqtt_logger_mqtt_connected", 0) >= workers:
+                return url
+        except OSError:
+            pass
+    return None
+
+
+def publisher(index, count, devices, qos, results):
+    """Un publieur: `count` messages telemetry (seq croissant par appareil)"""
+    client = mqtt.Client(client_id=f"bench-pub-{os.getpid()}-{index}")
+    if MQTT_PASS:
+        client.username_pw_set(MQTT_USER, MQTT_PASS)
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    seqs = {}
+    start = time.perf_counter()
+    for i in range(count):
+        device = (i * 7919 + index) % devices
+        seq = seqs[device] = seqs.get(device, 0) + 1
+        payload = f'{{"ts":{time.time():.3f},"seq":{seq},"temperature":{20 + i % 7}.5,"humidity":{40 + i % 11}}}'
+        info = client.publish(f"server-room/bench/pub{index}-dev{device}/telemetry", payload, qos=qos)
+        if qos and i % 1000 == 999:
+            info.wait_for_publish(10)
+    client.loop_stop()
+    client.disconnect()
+    results.put(time.perf_counter() - start)
+
+
+def run_step(url, messages, devices, publishers, qos, timeout):
+    before = read_metrics(url)
+    results = multiprocessing.Queue()
+    share = messages // publishers
+    procs = [multiprocessing.Process(target=publisher, args=(i, share, max(1, devices // publishers), qos, results))
+             for i in range(publishers)]
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    publish_time = max(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+
+    # Terminé quand chaque message publié a été reçu et chaque ligne écrite ou comptée en échec
+    expected_rows = 2 * share * publishers
+    deadline = start + timeout
+    while True:
+        now = read_metrics(url)
+        received = now.get("mqtt_logger_messages_received_total", 0) - before.get("mqtt_logger_messages_received_total", 0)
+        inserted = now.get("mqtt_logger_messages_inserted_total", 0) - before.get("mqtt_logger_messages_inserted_total", 0)
+        failed = now.get("mqtt_logger_messages_failed_total", 0) - before.get("mqtt_logger_messages_failed_total", 0)
+        if inserted + failed >= expected_rows or time.perf_counter() > deadline:
+            break
+        time.sleep(0.1)
+    elapsed = time.perf_counter() - start
+    return {
+        "published": share * publishers,
+        "received": int(received),
+        "rows_inserted": int(inserted),
+        "rows_failed": int(failed),
+        "publish_rate": share * publishers / publish_time,
+        "msgs_per_s": received / elapsed,
+        "rows_per_s": inserted / elapsed,
+        "elapsed": elapsed,
+        "complete": inserted + failed >= expected_rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit d'ingestion selon le nombre de processus du logger")
+    parser.add_argument("--workers", default=",".join(str(n) for n in range(1, os.cpu_count() + 1)),
+                        help="Liste de nombres de processus (ex: 1,2,4)")
+    parser.add_argument("--messages", type=int, default=50000, help="Messages publiés par palier")
+    parser.add_argument("--devices", type=int, default=500, help="Appareils simulés")
+    parser.add_argument("--publishers", type=int, default=max(2, os.cpu_count() // 2),
+                        help="Processus publieurs (le publieur ne doit pas être le goulot)")
+    parser.add_argument("--qos", type=int, default=1, choices=(0, 1))
+    parser.add_argument("--timeout", type=float, default=120, help="Durée max d'un palier (s)")
+    parser.add_argument("--metrics-port", type=int, default=9199)
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    print(f"\n{YELLOW}{'=' * 60}")
+    print("MONTÉE EN CHARGE - PROCESSUS DU LOGGER MQTT")
+    print(f"{'=' * 60}{RESET}")
+    print(f"Machine: {os.cpu_count()} coeurs | Broker: {MQTT_BROKER}:{MQTT_PORT} | "
+          f"{args.messages} messages, {args.devices} appareils, QoS {args.qos}\n")
+
+    results = []
+    baseline = None
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            print(f"{BLUE}Démarrage: {workers} processus...{RESET}")
+            url = start_logger(workers, args.metrics_port)
+            if url is None:
+                print(f"{RED}Impossible de démarrer le logger{RESET}")
+                return 1
+            r = run_step(url, args.messages, args.devices, args.publishers, args.qos, args.timeout)
+            cleanup()
+
+            baseline = baseline or r["msgs_per_s"]
+            r.update({"workers": workers, "speedup": r["msgs_per_s"] / baseline})
+            results.append(r)
+            color = GREEN if r["complete"] and r["rows_failed"] == 0 else RED
+            print(f"{color}  {workers:>3} processus: {r['msgs_per_s']:8.0f} msg/s  {r['rows_per_s']:8.0f} lignes/s  "
+                  f"x{r['speedup']:.2f}  (reçus {r['received']}/{r['published']}, "
+                  f"échecs {r['rows_failed']}, publication {r['publish_rate']:.0f} msg/s){RESET}")
+    finally:
+        cleanup()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "broker": f"{MQTT_BROKER}:{MQTT_PORT}",
+                       "messages": args.messages, "devices": args.devices, "qos": args.qos,
+                       "results": results}, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout: capteurs -> MQTT -> mqtt_logger -> MariaDB -> API -> tableau de bord
+Démarre le logger et l'API (gunicorn) sur un broker et une base locaux, puis mesure:
+- ingest: débit d'ingestion sous la charge d'un parc simulé (load_generator.py),
+  délai publication -> commit (métriques du logger);
+- queryable: délai publication -> mesure visible dans /api/history (sondes pendant la charge);
+- api: latence p50/p99 de l'API sous N tableaux de bord concurrents (cycle de index.html:
+  /api/dashboard + /api/photos toutes les --poll secondes, historique à l'ouverture);
+- command: aller-retour d'une commande jusqu'à la confirmation de l'appareil sur
+  server-room/<cible>/state, par POST /api/alarm et par WebSocket (/api/ws, si websockets).
+
+Environnement de test:
+- broker: MQTT_BROKER/MQTT_PORT, ou --mosquitto pour lancer un mosquitto jetable (anonyme);
+- base: DB_HOST, DB_NAME... comme l'API; --setup-db crée la table (database/setup_database.sql).
+  Utiliser une base dédiée (DB_NAME=serverroom_bench): le test y écrit des milliers de lignes;
+- l'appareil qui confirme les commandes est simulé (--no-actuator pour un vrai Arduino).
+
+Les résultats (JSON, --json) se comparent d'une version à l'autre:
+    python bench_pipeline.py --json v2.json --baseline v1.json --tolerance 0.2
+
+Usage:
+    python bench_pipeline.py --mosquitto --setup-db
+    python bench_pipeline.py --stages ingest,queryable --devices 5000 --interval 1
+    python bench_pipeline.py --stages api,command --dashboards 50 --json pipeline.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import paho.mqtt.client as mqtt
+import requests
+
+import load_generator
+from load_generator import actuator, histogram_delta, latency_summary, read_histogram, sample_percentile
+
+try:
+    import pymysql
+except ImportError:
+    pymysql = None
+
+try:
+    from websockets.sync.client import connect as ws_connect
+except ImportError:
+    ws_connect = None
+
+# Configuration
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "admin")
+MQTT_PASS = os.getenv("MQTT_PASS", "")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_USER = os.getenv("DB_USER", "apiuser")
+DB_PASS = os.getenv("DB_PASS", "apipass")
+DB_NAME = os.getenv("DB_NAME", "serverroom")
+TEST_TOKEN = os.getenv("TEST_TOKEN", "test-token-123")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OVER_DIR = os.path.join(ROOT_DIR, "over")
+PROBE_ROOM = "bench"
+PROBE_DEVICE = "probe"
+PROCESSES = []
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Métriques suivies d'une version à l'autre: (section, clé, True si plus grand = mieux)
+TRACKED = [
+    ("ingest", "rows_per_s", True),
+    ("ingest", "commit_latency_p99", False),
+    ("queryable", "p50", False),
+    ("queryable", "p99", False),
+    ("api", "p50", False),
+    ("api", "p99", False),
+    ("command", "post_p50", False),
+    ("command", "ws_p50", False),
+]
+
+
+def cleanup():
+    """Arrête les services démarrés par le benchmark"""
+    while PROCESSES:
+        process = PROCESSES.pop()
+        try:
+            process.terminate()
+            process.wait(timeout=20)
+        except Exception:
+            try:
+                process.kill()
+            except Exception:
+                pass
+
+
+def signal_handler(sig, frame):
+    """Gestionnaire de signal pour arrêter proprement"""
+    cleanup()
+    sys.exit(0)
+
+
+def service_env(extra):
+    env = os.environ.copy()
+    env.update({"MQTT_BROKER": MQTT_BROKER, "MQTT_PORT": str(MQTT_PORT),
+                "DB_HOST": DB_HOST, "DB_USER": DB_USER, "DB_PASS": DB_PASS, "DB_NAME": DB_NAME})
+    env.update(extra)
+    return env
+
+
+def wait_until(check, process, name, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.25)
+        if process.poll() is not None:
+            print(f"{RED}Erreur au démarrage ({name}):{RESET}")
+            print(process.stderr.read().decode())
+            return False
+        try:
+            if check():
+                return True
+        except (OSError, requests.RequestException):
+            pass
+    return False
+
+
+# ---------- environnement de test ----------
+def start_mosquitto(port):
+    """Broker jetable sans authentification (uniquement sur 127.0.0.1)"""
+    binary = shutil.which("mosquitto")
+    if binary is None:
+        print(f"{RED}mosquitto introuvable (apt install mosquitto){RESET}")
+        return False
+    config = tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False)
+    config.write(f"listener {port} 127.0.0.1\nallow_anonymous true\nmax_queued_messages 100000\n")
+    config.close()
+    process = subprocess.Popen([binary, "-c", config.name], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    PROCESSES.append(process)
+    time.sleep(0.5)
+    return process.poll() is None
+
+
+def setup_database():
+    """Crée la table sensor_data dans DB_NAME (instruction CREATE TABLE du script d'installation)"""
+    if pymysql is None:
+        print(f"{RED}pymysql requis pour --setup-db{RESET}")
+        return False
+    with open(os.path.join(ROOT_DIR, "database", "setup_database.sql")) as f:
+        statement = re.search(r"CREATE TABLE.*?\);", f.read(), re.S).group(0)
+    conn = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+
+def start_logger(metrics_port):
+    process = subprocess.Popen(
+        [sys.executable, "mqtt_logger.py"],
+        env=service_env({"METRICS_PORT": str(metrics_port), "STATS_INTERVAL": "0", "LOG_LEVEL": "WARNING",
+                         "LOGGER_INSTANCE": f"bench-{os.getpid()}"}),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=os.path.join(ROOT_DIR, "mqtt_logger")
+    )
+    PROCESSES.append(process)
+    url = f"http://127.0.0.1:{metrics_port}/metrics"
+    ok = wait_until(lambda: read_totals(url).get("mqtt_logger_mqtt_connected", 0) >= 1, process, "mqtt_logger")
+    return url if ok else None
+
+
+def start_api(port, workers, threads, photo_dir):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api:app"],
+        env=service_env({
+            "API_TOKEN": TEST_TOKEN,
+            "API_BIND": f"127.0.0.1:{port}",
+            "API_WORKERS": str(workers),
+            "API_THREADS": str(threads),
+            "API_LOG_LEVEL": "warning",
+            "RATE_LIMIT_ENABLED": "0",     # tous les clients partagent un token et une IP
+            "PHOTO_DIR": photo_dir,
+        }),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        cwd=os.path.join(ROOT_DIR, "api_rest")
+    )
+    PROCESSES.append(process)
+    base_url = f"http://127.0.0.1:{port}"
+    ok = wait_until(lambda: requests.get(f"{base_url}/api/health", timeout=2).status_code == 200, process, "API")
+    return base_url if ok else None
+
+
+def read_totals(url):
+    """Somme de chaque métrique (toutes séries confondues) depuis /metrics"""
+    totals = {}
+    with urllib.request.urlopen(url, timeout=5) as response:
+        for line in response.read().decode().splitlines():
+            match = re.match(r"^(mqtt_logger_\w+?)(\{[^}]*\})? (\S+)$", line)
+            if match:
+                totals[match.group(1)] = totals.get(match.group(1), 0) + float(match.group(3))
+    return totals
+
+
+def mqtt_client(name):
+    client = mqtt.Client(client_id=f"bench-{name}-{os.getpid()}")
+    if MQTT_PASS:
+        client.username_pw_set(MQTT_USER, MQTT_PASS)
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    return client
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    return {"count": len(samples), "p50": sample_percentile(samples, 0.50), "p95": sample_percentile(samples, 0.95),
+            "p99": sample_percentile(samples, 0.99), "max": max(samples)}
+
+
+def fmt_ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+# ---------- ingest + queryable ----------
+def probe_queryable(base_url, probes, timeout):
+    """Publie une valeur unique pour l'appareil sonde et attend qu'elle apparaisse dans l'historique"""
+    client = mqtt_client("probe")
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TEST_TOKEN}"
+    url = f"{base_url}/api/history/temperature?room={PROBE_ROOM}&device={PROBE_DEVICE}&limit=1"
+    seq0 = int(time.time())
+    delays = []
+    missed = 0
+    for i in range(probes):
+        value = float(100 + i % 50) + 0.5      # exacte en FLOAT, différente de la sonde précédente
+        payload = json.dumps({"ts": round(time.time(), 3), "seq": seq0 + i, "temperature": value})
+        start = time.perf_counter()
+        client.publish(f"server-room/{PROBE_ROOM}/{PROBE_DEVICE}/telemetry", payload, qos=1)
+        while True:
+            try:
+                rows = session.get(url, timeout=5).json()
+                if isinstance(rows, list) and rows and abs(float(rows[0]["value"]) - value) < 0.01:
+                    delays.append(time.perf_counter() - start)
+                    break
+            except (requests.RequestException, ValueError, KeyError, TypeError):
+                pass
+            if time.perf_counter() - start > timeout:
+                missed += 1
+                break
+            time.sleep(0.02)
+        time.sleep(0.2)
+    client.loop_stop()
+    client.disconnect()
+    return delays, missed
+
+
+def run_ingest(args, logger_url, base_url):
+    """Charge du parc simulé; sondes de visibilité dans l'API pendant la charge"""
+    before = read_totals(logger_url)
+    latency_before = read_histogram(logger_url)
+    report = tempfile.NamedTemporaryFile(suffix=".json", delete=False).name
+    generator = subprocess.Popen(
+        [sys.executable, "load_generator.py", "--devices", str(args.devices), "--interval", str(args.interval),
+         "--duration", str(args.duration), "--processes", str(args.publishers), "--qos", "1",
+         "--report", str(args.duration), "--logger-metrics", logger_url, "--json", report],
+        env=service_env({}), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=OVER_DIR
+    )
+    PROCESSES.append(generator)
+
+    delays, missed = [], 0
+    if "queryable" in args.stages and base_url:
+        time.sleep(min(2.0, args.duration / 4))     # régime établi
+        delays, missed = probe_queryable(base_url, args.probes, args.probe_timeout)
+    generator.wait()
+    PROCESSES.remove(generator)
+
+    try:
+        with open(report) as f:
+            generated = json.load(f)
+    except (OSError, ValueError):
+        print(f"{RED}load_generator.py a échoué:{RESET} {generator.stderr.read().decode()[-500:]}")
+        return None, None
+    finally:
+        os.unlink(report)
+
+    # Terminé quand tout ce qui a été publié est reçu et que la file d'écriture est vide
+    expected = generated["published"] + len(delays) + missed
+    deadline = time.monotonic() + args.drain_timeout
+    while True:
+        now = read_totals(logger_url)
+        delta = {name: now.get(name, 0) - before.get(name, 0) for name in now}
+        received = delta.get("mqtt_logger_messages_received_total", 0)
+        drained = received >= expected and now.get("mqtt_logger_queue_depth", 0) == 0
+        if drained or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+
+    elapsed = generated["duration"]
+    commit = latency_summary(histogram_delta(read_histogram(logger_url), latency_before))
+    ingest = {
+        "devices": args.devices,
+        "interval": args.interval,
+        "published": generated["published"],
+        "publish_rate": generated["publish_rate"],
+        "received": int(received),
+        "complete": drained,
+        "rows_inserted": int(delta.get("mqtt_logger_messages_inserted_total", 0)),
+        "rows_failed": int(delta.get("mqtt_logger_messages_failed_total", 0)),
+        "msgs_per_s": received / elapsed,
+        "rows_per_s": delta.get("mqtt_logger_messages_inserted_total", 0) / elapsed,
+        "commit_latency_p50": commit["p50"],
+        "commit_latency_p99": commit["p99"],
+    }
+    queryable = None
+    if delays or missed:
+        queryable = percentiles(delays)
+        queryable["missed"] = missed
+    return ingest, queryable
+
+
+# ---------- api ----------
+def dashboard_client(base_url, duration, poll, results):
+    """Un tableau de bord: historique à l'ouverture, puis dashboard + photos toutes les `poll` secondes"""
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TEST_TOKEN}"
+    samples = {}
+    errors = 0
+
+    def get(name, path):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = session.get(base_url + path, timeout=10).status_code < 500
+        except requests.RequestException:
+            ok = False
+        if ok:
+            samples.setdefault(name, []).append(time.perf_counter() - start)
+        else:
+            errors += 1
+
+    time.sleep(random.uniform(0, poll))     # ouvertures étalées
+    get("history", "/api/history/temperature?limit=100")
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        cycle = time.perf_counter()
+        get("dashboard", "/api/dashboard")
+        get("photos", "/api/photos")
+        time.sleep(max(0.0, poll - (time.perf_counter() - cycle)))
+    results.put((samples, errors))
+
+
+def dashboard_process(base_url, clients, duration, poll, results):
+    local = queue.Queue()
+    threads = [threading.Thread(target=dashboard_client, args=(base_url, duration, poll, local)) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    merged, errors = {}, 0
+    for _ in threads:
+        samples, e = local.get()
+        errors += e
+        for name, values in samples.items():
+            merged.setdefault(name, []).extend(values)
+    results.put((merged, errors))
+
+
+def run_api(args, base_url):
+    results = multiprocessing.Queue()
+    per_process = -(-args.dashboards // args.client_processes)
+    procs = []
+    for i in range(args.client_processes):
+        count = min(per_process, args.dashboards - i * per_process)
+        if count > 0:
+            procs.append(multiprocessing.Process(target=dashboard_process,
+                                                 args=(base_url, count, args.api_duration, args.poll, results)))
+    start = time.perf_counter()
+    for p in procs:
+        p.start()
+    merged, errors = {}, 0
+    for _ in procs:
+        samples, e = results.get()
+        errors += e
+        for name, values in samples.items():
+            merged.setdefault(name, []).extend(values)
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - start
+    every = [value for values in merged.values() for value in values]
+    api = percentiles(every)
+    api.update({"dashboards": args.dashboards, "poll": args.poll, "errors": errors,
+                "rps": len(every) / elapsed,
+                "endpoints": {name: percentiles(values) for name, values in sorted(merged.items())}})
+    return api
+
+
+# ---------- command ----------
+class StateWatcher:
+    """Suit server-room/<cible>/state (la valeur retenue arrive à l'abonnement)"""
+
+    def __init__(self):
+        self.states = {}
+        self.changed = threading.Condition()
+        self.client = mqtt.Client(client_id=f"bench-state-{os.getpid()}")
+        if MQTT_PASS:
+            self.client.username_pw_set(MQTT_USER, MQTT_PASS)
+        self.client.on_connect = lambda c, u, f, rc: c.subscribe("server-room/+/state", qos=1)
+        self.client.on_message = self.on_message
+        self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        self.client.loop_start()
+
+    def on_message(self, client, userdata, msg):
+        with self.changed:
+            self.states[msg.topic.split("/")[1]] = msg.payload.decode(errors="replace").strip().upper()
+            self.changed.notify_all()
+
+    def wait_for(self, target, state, timeout):
+        with self.changed:
+            return self.changed.wait_for(lambda: self.states.get(target) == state, timeout)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+def run_command(args, base_url):
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TEST_TOKEN}"
+    watcher = StateWatcher()
+    time.sleep(0.5)                               # état retenu reçu
+    post, post_failed = [], 0
+    for i in range(args.commands):
+        state = "OFF" if watcher.states.get("alarm") == "ON" else "ON"
+        start = time.perf_counter()
+        try:
+            sent = session.post(f"{base_url}/api/alarm", json={"state": state}, timeout=5).status_code == 200
+        except requests.RequestException:
+            sent = False
+        if sent and watcher.wait_for("alarm", state, args.command_timeout):
+            post.append(time.perf_counter() - start)
+        else:
+            post_failed += 1
+    watcher.close()
+
+    ws, ws_failed = [], 0
+    if ws_connect is None:
+        print(f"{YELLOW}  websockets non installé: aller-retour WebSocket non mesuré{RESET}")
+    else:
+        try:
+            with ws_connect(f"{base_url.replace('http', 'ws', 1)}/api/ws?token={TEST_TOKEN}") as connection:
+                state = "ON"
+                for i in range(args.commands):
+                    state = "OFF" if state == "ON" else "ON"
+                    start = time.perf_counter()
+                    connection.send(json.dumps({"type": "command", "id": f"b{i}", "target": "buzzer", "state": state}))
+                    status = None
+                    while status is None:
+                        message = json.loads(connection.recv(timeout=args.command_timeout + 5))
+                        if message.get("type") == "ack" and message.get("id") == f"b{i}":
+                            status = message.get("status")
+                    if status == "ok":
+                        ws.append(time.perf_counter() - start)
+                    else:
+                        ws_failed += 1
+        except Exception as e:
+            print(f"{RED}  WebSocket: {e}{RESET}")
+            ws_failed = args.commands - len(ws)
+
+    post_stats, ws_stats = percentiles(post), percentiles(ws)
+    return {"commands": args.commands,
+            "post_p50": post_stats["p50"], "post_p99": post_stats["p99"], "post_failed": post_failed,
+            "ws_p50": ws_stats["p50"], "ws_p99": ws_stats["p99"], "ws_failed": ws_failed}
+
+
+# ---------- comparaison ----------
+def compare(results, baseline, tolerance):
+    """Compare aux résultats d'une version précédente; True si aucune régression au-delà de `tolerance`"""
+    print(f"\n{BLUE}Comparaison avec la référence (tolérance {tolerance * 100:.0f}%){RESET}")
+    ok = True
+    for section, key, higher_is_better in TRACKED:
+        new = (results.get(section) or {}).get(key)
+        old = (baseline.get(section) or {}).get(key)
+        if new is None or old is None or old == 0:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        regressed = worse > tolerance
+        ok = ok and not regressed
+        color = RED if regressed else GREEN
+        print(f"{color}  {'❌' if regressed else '✅'} {section}.{key}: {old:.4g} -> {new:.4g} ({change * 100:+.0f}%){RESET}")
+    return ok
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    global MQTT_BROKER, MQTT_PORT
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout du pipeline capteurs -> API")
+    parser.add_argument("--stages", default="ingest,queryable,api,command",
+                        help="Étapes (ingest, queryable, api, command)")
+    parser.add_argument("--mosquitto", action="store_true", help="Lance un mosquitto jetable sur --mqtt-port")
+    parser.add_argument("--mqtt-port", type=int, default=18883)
+    parser.add_argument("--setup-db", action="store_true", help="Crée la table sensor_data dans DB_NAME")
+    parser.add_argument("--no-actuator", action="store_true", help="Un vrai Arduino confirme les commandes")
+    parser.add_argument("--devices", type=int, default=2000, help="Appareils simulés (ingest)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Secondes entre deux envois d'un appareil")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée de la charge (s)")
+    parser.add_argument("--publishers", type=int, default=max(1, min(4, os.cpu_count() // 2)))
+    parser.add_argument("--probes", type=int, default=20, help="Sondes de visibilité dans l'API")
+    parser.add_argument("--probe-timeout", type=float, default=15.0)
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--dashboards", type=int, default=50, help="Tableaux de bord concurrents")
+    parser.add_argument("--poll", type=float, default=3.0, help="Période de rafraîchissement (index.html: 3 s)")
+    parser.add_argument("--api-duration", type=float, default=30.0)
+    parser.add_argument("--client-processes", type=int, default=max(1, min(8, os.cpu_count())))
+    parser.add_argument("--api-workers", type=int, default=max(2, os.cpu_count()))
+    parser.add_argument("--api-threads", type=int, default=8, help="Threads par worker (WebSocket inclus)")
+    parser.add_argument("--commands", type=int, default=20, help="Commandes par méthode (POST, WebSocket)")
+    parser.add_argument("--command-timeout", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--metrics-port", type=int, default=9198)
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    parser.add_argument("--baseline", help="Résultats JSON d'une version précédente à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation tolérée (0.2 = 20%%)")
+    args = parser.parse_args()
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    if args.mosquitto:
+        MQTT_BROKER, MQTT_PORT = "127.0.0.1", args.mqtt_port
+        load_generator.MQTT_BROKER, load_generator.MQTT_PORT = MQTT_BROKER, MQTT_PORT
+        if not start_mosquitto(args.mqtt_port):
+            return 1
+
+    print(f"\n{YELLOW}{'=' * 60}")
+    print("BENCHMARK DE BOUT EN BOUT - PIPELINE CAPTEURS -> API")
+    print(f"{'=' * 60}{RESET}")
+    print(f"Machine: {os.cpu_count()} coeurs | Broker: {MQTT_BROKER}:{MQTT_PORT} | Base: {DB_HOST}/{DB_NAME} | "
+          f"Étapes: {', '.join(args.stages)}\n")
+
+    results = {"meta": {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "broker": f"{MQTT_BROKER}:{MQTT_PORT}",
+        "database": f"{DB_HOST}/{DB_NAME}",
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+    }}
+    photo_dir = tempfile.mkdtemp(prefix="bench-photos-")
+    for i in range(3):
+        with open(os.path.join(photo_dir, f"motion_2026010{i}_000000.jpg"), "wb") as f:
+            f.write(b"\xff\xd8\xff\xd9")
+
+    stop = multiprocessing.Event()
+    try:
+        if args.setup_db and not setup_database():
+            return 1
+        if not args.no_actuator:
+            multiprocessing.Process(target=actuator, args=(stop,), daemon=True).start()
+
+        logger_url = None
+        if "ingest" in args.stages or "queryable" in args.stages:
+            print(f"{BLUE}Démarrage de mqtt_logger...{RESET}")
+            logger_url = start_logger(args.metrics_port)
+            if logger_url is None:
+                print(f"{RED}Impossible de démarrer le logger{RESET}")
+                return 1
+        print(f"{BLUE}Démarrage de l'API ({args.api_workers} workers x {args.api_threads} threads)...{RESET}")
+        base_url = start_api(args.port, args.api_workers, args.api_threads, photo_dir)
+        if base_url is None:
+            print(f"{RED}Impossible de démarrer l'API{RESET}")
+            return 1
+        if requests.get(f"{base_url}/api/health", timeout=5).json().get("database") != "ok":
+            print(f"{YELLOW}Base de données injoignable: lignes en échec, historique vide{RESET}")
+
+        if "ingest" in args.stages or "queryable" in args.stages:
+            print(f"\n{BLUE}Ingestion: {args.devices} appareils, un envoi toutes les {args.interval}s, "
+                  f"{args.duration}s...{RESET}")
+            ingest, queryable = run_ingest(args, logger_url, base_url)
+            if ingest and "ingest" in args.stages:
+                results["ingest"] = ingest
+                color = GREEN if ingest["rows_failed"] == 0 else RED
+                print(f"{color}  {ingest['msgs_per_s']:.0f} msg/s reçus, {ingest['rows_per_s']:.0f} lignes/s "
+                      f"(publiés {ingest['published']}, échecs {ingest['rows_failed']}), "
+                      f"commit p50 {fmt_ms(ingest['commit_latency_p50'])} p99 {fmt_ms(ingest['commit_latency_p99'])}{RESET}")
+            if queryable:
+                results["queryable"] = queryable
+                color = GREEN if queryable["missed"] == 0 else RED
+                print(f"{color}  Visible dans l'API: p50 {fmt_ms(queryable['p50'])}  p99 {fmt_ms(queryable['p99'])}  "
+                      f"({queryable['count']} sondes, {queryable['missed']} non vues){RESET}")
+
+        if "api" in args.stages:
+            print(f"\n{BLUE}API: {args.dashboards} tableaux de bord, rafraîchissement {args.poll}s, "
+                  f"{args.api_duration}s...{RESET}")
+            api = results["api"] = run_api(args, base_url)
+            color = GREEN if api["errors"] == 0 else RED
+            print(f"{color}  {api['rps']:.0f} req/s  p50 {fmt_ms(api['p50'])}  p99 {fmt_ms(api['p99'])}  "
+                  f"(erreurs: {api['errors']}){RESET}")
+            for name, stats in api["endpoints"].items():
+                print(f"    {name:<10} p50 {fmt_ms(stats['p50']):>7}  p99 {fmt_ms(stats['p99']):>7}  ({stats['count']})")
+
+        if "command" in args.stages:
+            print(f"\n{BLUE}Commandes: {args.commands} aller-retours par méthode...{RESET}")
+            command = results["command"] = run_command(args, base_url)
+            color = GREEN if command["post_failed"] == 0 and command["ws_failed"] == 0 else RED
+            print(f"{color}  POST /api/alarm -> état: p50 {fmt_ms(command['post_p50'])}  p99 {fmt_ms(command['post_p99'])}  "
+                  f"(échecs {command['post_failed']}){RESET}")
+            print(f"{color}  WebSocket -> accusé:    p50 {fmt_ms(command['ws_p50'])}  p99 {fmt_ms(command['ws_p99'])}  "
+                  f"(échecs {command['ws_failed']}){RESET}")
+    finally:
+        stop.set()
+        cleanup()
+        shutil.rmtree(photo_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            if not compare(results, json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
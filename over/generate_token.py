@@ -3,6 +3,9 @@
 Générateur de tokens sécurisés pour l'API REST
 Génère des tokens cryptographiquement sécurisés
 """
+import hashlib
+import hmac
+import os
 import secrets
 import sys
 import argparse
@@ -39,6 +42,19 @@ def generate_url_safe_token(length=32):
     token = base64.urlsafe_b64encode(token_bytes).decode('utf-8').rstrip('=')
     return token
 
+def token_digest(token, key):
+    """
+    Empreinte HMAC-SHA256 d'un token, pour API_TOKENS_FILE (voir api_rest/auth.py)
+    
+    Args:
+        token: Token en clair
+        key: Clé API_TOKEN_KEY de l'API (bytes)
+    
+    Returns:
+        Empreinte hexadécimale
+    """
+    return hmac.new(key, token.encode(), hashlib.sha256).hexdigest()
+
 def main():
     parser = argparse.ArgumentParser(
         description='Générateur de tokens sécurisés pour l\'API REST',
@@ -56,6 +72,9 @@ Exemples:
   
   # Générer plusieurs tokens
   python3 generate_token.py --count 5
+  
+  # Ligne pour API_TOKENS_FILE (empreinte seule, avec la même API_TOKEN_KEY que l'API)
+  API_TOKEN_KEY=... python3 generate_token.py --digest capteur-salle-1
         """
     )
     
@@ -85,8 +104,19 @@ Exemples:
         help='Affiche la commande export pour copier-coller'
     )
     
+    parser.add_argument(
+        '--digest',
+        metavar='NOM',
+        help='Affiche la ligne "NOM hmac:<empreinte>" pour API_TOKENS_FILE (nécessite API_TOKEN_KEY)'
+    )
+    
     args = parser.parse_args()
     
+    key = os.getenv("API_TOKEN_KEY", "").encode()
+    if args.digest and not key:
+        print("❌ --digest nécessite API_TOKEN_KEY (la même clé que l'API)", file=sys.stderr)
+        return 1
+    
     # Validation
     if args.length < 16:
         print("⚠️  Attention: Les tokens de moins de 16 bytes (32 caractères) ne sont pas recommandés pour la sécurité", file=sys.stderr)
@@ -125,6 +155,16 @@ Exemples:
             print(f"export API_TOKENS='{','.join(tokens)}'")
         print()
     
+    if args.digest:
+        print("=" * 60)
+        print("LIGNES POUR API_TOKENS_FILE (le token en clair n'est pas stocké):")
+        print("=" * 60)
+        print()
+        for i, token in enumerate(tokens):
+            name = args.digest if len(tokens) == 1 else f"{args.digest}-{i+1}"
+            print(f"{name} hmac:{token_digest(token, key)}")
+        print()
+    
     print("=" * 60)
     print("UTILISATION:")
     print("=" * 60)
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge MQTT: simule un parc d'ESP32 / Arduino
+Chaque appareil simulé publie comme le firmware (esp32.ino, arduino-serverroom.ino):
+- ESP32 DHT11: {"ts", "seq", "temperature", "humidity"} sur .../<appareil>/telemetry;
+- Arduino: {"seq", "light", "distance"} (pas d'horloge) sur .../<appareil>/telemetry;
+- --legacy: une valeur par topic (server-room/temperature...), comme le firmware d'origine.
+Topics: server-room/<salle>/<appareil>/telemetry, appareils répartis sur --rooms salles.
+
+Un appareil publie toutes les --interval secondes (± --jitter), premier envoi étalé
+sur l'intervalle. Les appareils sont répartis sur --processes processus (une
+connexion MQTT par processus, au nom de tous ses appareils).
+
+Rapport toutes les --report secondes et en fin d'exécution:
+- débit de publication obtenu / visé, erreurs, retard sur le planning (le générateur suit-il?);
+- délai publication -> commit en base (p50/p95/p99), lu dans les métriques de
+  mqtt_logger.py (ingest_latency_seconds{source="device"}, --logger-metrics).
+
+Options utiles aux autres tests:
+- --anomalies 0.05: 5% de valeurs hors seuils (déclenche scripts/buzzer_controller.py);
+- --actuator: un Arduino simulé répond aux commandes alarm/buzzer (état retenu sur .../state).
+
+Usage:
+    python load_generator.py --devices 2000 --interval 10 --duration 60
+    python load_generator.py --devices 5000 --interval 1 --jitter 0.2 --processes 4 --json charge.json
+    python load_generator.py --devices 50 --legacy --anomalies 0.1 --actuator
+"""
+import argparse
+import heapq
+import json
+import math
+import multiprocessing
+import os
+import random
+import re
+import signal
+import sys
+import time
+import urllib.request
+
+import paho.mqtt.client as mqtt
+
+# Configuration
+MQTT_BROKER = os.getenv("MQTT_BROKER", "localhost")
+MQTT_PORT = int(os.getenv("MQTT_PORT", "1883"))
+MQTT_USER = os.getenv("MQTT_USER", "admin")
+MQTT_PASS = os.getenv("MQTT_PASS", "")
+LOGGER_METRICS = os.getenv("LOGGER_METRICS", "http://127.0.0.1:9101/metrics")
+LATENCY_METRIC = "mqtt_logger_ingest_latency_seconds"
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+# Plages normales (sous les seuils de scripts/buzzer_controller.py) et pas de la marche aléatoire
+RANGES = {"temperature": (18.0, 28.0, 0.2), "humidity": (30.0, 60.0, 0.5),
+          "light": (150.0, 900.0, 15.0), "distance": (60.0, 350.0, 10.0)}
+# Valeurs anormales: au-delà des seuils du contrôleur de buzzer
+ANOMALIES = {"temperature": 35.0, "humidity": 80.0, "light": 20, "distance": 20.0}
+
+
+# ---------- appareils simulés ----------
+class Device:
+    """Un appareil: topic, numéro de séquence et valeurs qui dérivent lentement"""
+
+    def __init__(self, kind, room, name, rng):
+        self.kind = kind
+        self.room = room
+        self.name = name
+        self.topic = f"server-room/{room}/{name}/telemetry"
+        self.seq = 0
+        self.rng = rng
+        if kind == "esp32":
+            self.values = {"temperature": rng.uniform(19, 26), "humidity": rng.uniform(35, 55)}
+        else:
+            self.values = {"light": rng.uniform(200, 800), "distance": rng.uniform(80, 300)}
+
+    def reading(self, anomalies):
+        """Mesures suivantes (marche aléatoire bornée, parfois anormales)"""
+        for name, value in self.values.items():
+            low, high, step = RANGES[name]
+            self.values[name] = min(max(value + self.rng.uniform(-step, step), low), high)
+        reading = dict(self.values)
+        if anomalies and self.rng.random() < anomalies:
+            name = self.rng.choice(list(reading))
+            reading[name] = ANOMALIES[name]
+        return reading
+
+    def messages(self, anomalies, legacy):
+        """[(topic, charge utile)] comme le firmware correspondant"""
+        reading = self.reading(anomalies)
+        if legacy:
+            return [(f"server-room/{name}", f"{value:.2f}") for name, value in reading.items()]
+        self.seq += 1
+        if self.kind == "esp32":
+            return [(self.topic, f'{{"ts":{time.time():.3f},"seq":{self.seq},'
+                                 f'"temperature":{reading["temperature"]:.2f},"humidity":{reading["humidity"]:.2f}}}')]
+        return [(self.topic, f'{{"seq":{self.seq},"light":{int(reading["light"])},"distance":{reading["distance"]:.2f}}}')]
+
+
+def make_devices(first, count, rooms, esp32_ratio, seed):
+    rng = random.Random(seed)
+    devices = []
+    for index in range(first, first + count):
+        kind = "esp32" if (index * 0.618034) % 1 < esp32_ratio else "arduino"
+        devices.append(Device(kind, f"salle-{index % rooms + 1:02d}", f"{kind}-{index:05d}", rng))
+    return devices
+
+
+def connect(client_id):
+    client = mqtt.Client(client_id=client_id)
+    if MQTT_PASS:
+        client.username_pw_set(MQTT_USER, MQTT_PASS)
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    return client
+
+
+def publisher(index, first, count, args, stats, stop):
+    """Processus publieur: planning (tas) des prochains envois de ses appareils"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    devices = make_devices(first, count, args.rooms, args.esp32_ratio, args.seed + index)
+    client = connect(f"loadgen-{os.getpid()}-{index}")
+    rng = random.Random(args.seed * 1000 + index)
+
+    start = time.monotonic()
+    schedule = [(start + rng.uniform(0, args.interval), i) for i in range(len(devices))]
+    heapq.heapify(schedule)
+    published = errors = 0
+    lags = []
+    while not stop.is_set() and schedule:
+        due, i = schedule[0]
+        now = time.monotonic()
+        if due > now:
+            time.sleep(min(due - now, 0.05))
+            continue
+        heapq.heapreplace(schedule, (due + args.interval * (1 + rng.uniform(-args.jitter, args.jitter)), i))
+        lags.append(now - due)
+        for topic, payload in devices[i].messages(args.anomalies, args.legacy):
+            if client.publish(topic, payload, qos=args.qos).rc == mqtt.MQTT_ERR_SUCCESS:
+                published += 1
+            else:
+                errors += 1
+        if len(lags) >= 200:
+            stats.put((index, published, errors, lags))
+            published = errors = 0
+            lags = []
+    stats.put((index, published, errors, lags))
+    client.loop_stop()
+    client.disconnect()
+
+
+def actuator(stop):
+    """Arduino simulé: applique les commandes alarm/buzzer et confirme l'état (retenu)"""
+    client = mqtt.Client(client_id=f"loadgen-actuator-{os.getpid()}")
+    if MQTT_PASS:
+        client.username_pw_set(MQTT_USER, MQTT_PASS)
+
+    def on_connect(client, userdata, flags, rc):
+        client.subscribe([("server-room/alarm/cmd", 1), ("server-room/buzzer/cmd", 1)])
+
+    def on_message(client, userdata, msg):
+        state = msg.payload.decode(errors="replace").strip().upper()
+        if state in ("ON", "OFF"):
+            target = msg.topic.split("/")[1]
+            client.publish(f"server-room/{target}/state", state, qos=1, retain=True)
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client.loop_start()
+    stop.wait()
+    client.loop_stop()
+    client.disconnect()
+
+
+# ---------- délai d'ingestion (métriques du logger) ----------
+def read_histogram(url, name=LATENCY_METRIC, label='source="device"'):
+    """{borne: nombre cumulé} d'un histogramme Prometheus (toutes séries portant `label`), ou None"""
+    try:
+        with urllib.request.urlopen(url, timeout=3) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    buckets = {}
+    for line in text.splitlines():
+        if not line.startswith(f"{name}_bucket{{") or label not in line:
+            continue
+        match = re.search(r'le="([^"]+)"\} (\S+)$', line)
+        if match:
+            bound = float(match.group(1))
+            buckets[bound] = buckets.get(bound, 0) + float(match.group(2))
+    return buckets
+
+
+def histogram_delta(after, before):
+    return {bound: count - (before or {}).get(bound, 0) for bound, count in (after or {}).items()}
+
+
+def percentile(buckets, q):
+    """Percentile estimé par interpolation linéaire dans le bucket (comme histogram_quantile)"""
+    if not buckets:
+        return None
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]]
+    if total <= 0:
+        return None
+    rank = q * total
+    previous_bound, previous_count = 0.0, 0.0
+    for bound in bounds:
+        count = buckets[bound]
+        if count >= rank:
+            if bound == float("inf"):
+                return previous_bound
+            if count == previous_count:
+                return bound
+            return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+        previous_bound, previous_count = bound, count
+    return bounds[-1]
+
+
+def latency_summary(buckets):
+    total = max(buckets.values()) if buckets else 0
+    return {
+        "count": int(total),
+        "p50": percentile(buckets, 0.50),
+        "p95": percentile(buckets, 0.95),
+        "p99": percentile(buckets, 0.99),
+    }
+
+
+def fmt_ms(seconds):
+    return "   n/a" if seconds is None else f"{seconds * 1000:6.0f}"
+
+
+def sample_percentile(values, q):
+    """Quantile q (0..1) par rang le plus proche (valeurs non triées acceptées)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))]
+
+
+# ---------- exécution ----------
+def run(args):
+    stop = multiprocessing.Event()
+    stats = multiprocessing.Queue()
+    per_process = -(-args.devices // args.processes)
+    procs = []
+    for index in range(args.processes):
+        first = index * per_process
+        count = min(per_process, args.devices - first)
+        if count > 0:
+            procs.append(multiprocessing.Process(target=publisher, args=(index, first, count, args, stats, stop)))
+    if args.actuator:
+        procs.append(multiprocessing.Process(target=actuator, args=(stop,), daemon=True))
+
+    messages_per_tick = 2 if args.legacy else 1
+    target_rate = args.devices / args.interval * messages_per_tick
+    latency_start = read_histogram(args.logger_metrics)
+    if latency_start is None:
+        print(f"{YELLOW}Métriques du logger indisponibles ({args.logger_metrics}): délai d'ingestion non mesuré{RESET}")
+
+    for p in procs:
+        p.start()
+    start = time.monotonic()
+    published = errors = 0
+    lags = []
+    window_published, window_start = 0, start
+    latency_window = latency_start
+    report = []
+    try:
+        while time.monotonic() - start < args.duration:
+            deadline = min(window_start + args.report, start + args.duration)
+            while time.monotonic() < deadline:
+                try:
+                    _, n, e, l = stats.get(timeout=max(0.01, deadline - time.monotonic()))
+                except Exception:
+                    continue
+                published += n
+                window_published += n
+                errors += e
+                lags += l
+            now = time.monotonic()
+            rate = window_published / (now - window_start)
+            latency_now = read_histogram(args.logger_metrics) if latency_start is not None else None
+            window_latency = latency_summary(histogram_delta(latency_now, latency_window)) if latency_now else None
+            report.append({"t": round(now - start, 1), "publish_rate": rate,
+                           "ingest_latency": window_latency})
+            color = GREEN if rate >= 0.95 * target_rate else YELLOW
+            line = f"{color}t={now - start:6.1f}s  {rate:9.0f} msg/s (visé {target_rate:.0f}){RESET}"
+            if window_latency and window_latency["count"]:
+                line += (f"  ingestion p50 {fmt_ms(window_latency['p50'])} ms  "
+                         f"p99 {fmt_ms(window_latency['p99'])} ms  ({window_latency['count']} mesures)")
+            print(line)
+            window_published, window_start, latency_window = 0, now, latency_now
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}Interruption{RESET}")
+    finally:
+        elapsed = time.monotonic() - start
+        stop.set()
+        for p in procs:
+            if not p.daemon:
+                p.join(timeout=10)
+        while not stats.empty():
+            _, n, e, l = stats.get()
+            published += n
+            errors += e
+            lags += l
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+
+    # Laisser le logger écrire les derniers lots avant de lire la latence totale
+    time.sleep(args.settle)
+    latency_end = read_histogram(args.logger_metrics) if latency_start is not None else None
+    return {
+        "devices": args.devices,
+        "interval": args.interval,
+        "jitter": args.jitter,
+        "legacy": args.legacy,
+        "duration": elapsed,
+        "published": published,
+        "errors": errors,
+        "target_rate": target_rate,
+        "publish_rate": published / elapsed,
+        "schedule_lag_p50": sample_percentile(lags, 0.50),
+        "schedule_lag_p99": sample_percentile(lags, 0.99),
+        "ingest_latency": latency_summary(histogram_delta(latency_end, latency_start)) if latency_end else None,
+        "timeline": report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulation d'un parc d'ESP32/Arduino publiant sur MQTT")
+    parser.add_argument("--devices", type=int, default=1000, help="Appareils simulés")
+    parser.add_argument("--interval", type=float, default=10.0, help="Secondes entre deux envois d'un appareil")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variation aléatoire de l'intervalle (0.1 = ±10%%)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Durée (s)")
+    parser.add_argument("--rooms", type=int, default=10, help="Salles sur lesquelles répartir les appareils")
+    parser.add_argument("--esp32-ratio", type=float, default=0.5, help="Part d'ESP32 (le reste: Arduino)")
+    parser.add_argument("--legacy", action="store_true", help="Une valeur par topic (firmware d'origine)")
+    parser.add_argument("--anomalies", type=float, default=0.0, help="Part de valeurs hors seuils")
+    parser.add_argument("--actuator", action="store_true", help="Simule l'Arduino qui confirme alarm/buzzer")
+    parser.add_argument("--processes", type=int, default=max(1, min(4, os.cpu_count() // 2)), help="Processus publieurs")
+    parser.add_argument("--qos", type=int, default=0, choices=(0, 1), help="QoS (PubSubClient publie en QoS 0)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", type=float, default=5.0, help="Secondes entre deux lignes de rapport")
+    parser.add_argument("--settle", type=float, default=2.0, help="Attente finale avant la lecture des métriques (s)")
+    parser.add_argument("--logger-metrics", default=LOGGER_METRICS, help="URL /metrics de mqtt_logger.py")
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    args = parser.parse_args()
+
+    print(f"\n{YELLOW}{'=' * 60}")
+    print("GÉNÉRATEUR DE CHARGE MQTT - PARC SIMULÉ")
+    print(f"{'=' * 60}{RESET}")
+    print(f"Broker: {MQTT_BROKER}:{MQTT_PORT} | {args.devices} appareils, {args.rooms} salles, "
+          f"envoi toutes les {args.interval}s ±{args.jitter * 100:.0f}% | {args.processes} processus\n")
+
+    result = run(args)
+
+    color = GREEN if result["errors"] == 0 and result["publish_rate"] >= 0.95 * result["target_rate"] else RED
+    print(f"\n{BLUE}Résumé{RESET}")
+    print(f"{color}  Publication: {result['publish_rate']:.0f} msg/s (visé {result['target_rate']:.0f}), "
+          f"{result['published']} messages, {result['errors']} erreurs{RESET}")
+    print(f"  Retard sur le planning: p50 {result['schedule_lag_p50'] * 1000:.1f} ms, "
+          f"p99 {result['schedule_lag_p99'] * 1000:.1f} ms")
+    latency = result["ingest_latency"]
+    if latency and latency["count"]:
+        print(f"  Publication -> commit: p50 {fmt_ms(latency['p50'])} ms  p95 {fmt_ms(latency['p95'])} ms  "
+              f"p99 {fmt_ms(latency['p99'])} ms  ({latency['count']} mesures horodatées)")
+    elif latency is not None:
+        print(f"{YELLOW}  Aucune mesure horodatée écrite par le logger pendant le test{RESET}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    return 0 if result["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
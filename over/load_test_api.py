@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Test de charge de l'API REST: balayage du nombre de clients concurrents
+Démarre l'API (comme test_auth_token_with_server.py), puis pour chaque palier de
+concurrence (1 -> 500 clients) fait tourner des clients en boucle fermée sur un
+mélange d'endpoints proche de l'usage réel (tableau de bord, historique, photos,
+commandes). Rapporte par palier et par endpoint: débit, latences p50/p95/p99,
+taux d'erreurs et de refus (429/503 du contrôle d'admission).
+
+Un client = un thread avec sa connexion keep-alive; les clients sont répartis sur
+--client-processes processus pour que le GIL du client ne soit pas le goulot.
+
+Serveur testé:
+- --server gunicorn (défaut): mode production, --api-workers x --api-threads;
+- --server dev: `python api.py` (serveur de développement, port 5000);
+- --url http://...: API déjà démarrée (TEST_TOKEN doit y être valide).
+
+Les commandes (/api/alarm, /api/buzzer) publient sur MQTT (MQTT_BROKER...): sans
+broker joignable elles comptent en erreur. Les lectures dépendent de MariaDB (DB_HOST...).
+
+Usage:
+    python load_test_api.py                                   # 1,5,10,25,50,100,200,500 clients
+    python load_test_api.py --levels 10,100,500 --duration 20 --json capacite.json
+    python load_test_api.py --mix dashboard=70,photos=30 --think 3    # tableaux de bord seuls
+    python load_test_api.py --url http://raspberrypi:5000 --levels 1,10,50
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from load_generator import sample_percentile
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Configuration
+TEST_TOKEN = os.getenv("TEST_TOKEN", "test-token-123")
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api_rest")
+API_PROCESS = None
+SENSORS = ["temperature", "humidity", "light", "distance", "motion"]
+HISTORY_LIMITS = [50, 100, 500]
+DEFAULT_MIX = "dashboard=40,history=20,photos=20,photo=15,alarm=3,buzzer=2"
+
+# Couleurs pour l'affichage
+GREEN = "\033[92m"
+RED = "\033[91m"
+YELLOW = "\033[93m"
+BLUE = "\033[94m"
+RESET = "\033[0m"
+
+
+def cleanup():
+    """Arrête le processus API si en cours"""
+    global API_PROCESS
+    if API_PROCESS:
+        try:
+            API_PROCESS.terminate()
+            API_PROCESS.wait(timeout=10)
+        except Exception:
+            try:
+                API_PROCESS.kill()
+            except Exception:
+                pass
+        API_PROCESS = None
+
+
+def signal_handler(sig, frame):
+    """Gestionnaire de signal pour arrêter proprement"""
+    cleanup()
+    sys.exit(0)
+
+
+def start_api(server, port, workers, threads, env_extra):
+    """Démarre l'API en arrière-plan et attend qu'elle réponde"""
+    global API_PROCESS
+    env = os.environ.copy()
+    env.update({
+        "API_TOKEN": TEST_TOKEN,
+        "API_BIND": f"127.0.0.1:{port}",
+        "API_WORKERS": str(workers),
+        "API_THREADS": str(threads),
+        "API_LOG_LEVEL": "warning",
+    })
+    env.update(env_extra)
+    if server == "dev":
+        command, port = [sys.executable, "api.py"], 5000
+    else:
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "api:app"]
+
+    API_PROCESS = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=API_DIR)
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(60):
+        time.sleep(0.25)
+        if API_PROCESS.poll() is not None:
+            print(f"{RED}Erreur au démarrage de l'API:{RESET}")
+            print(API_PROCESS.stderr.read().decode())
+            return None
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return base_url
+        except requests.RequestException:
+            pass
+    return None
+
+
+def make_photos(count):
+    """Dossier photos temporaire; vraies images si Pillow est là (miniatures générées par l'API)"""
+    photo_dir = tempfile.mkdtemp(prefix="loadtest-photos-")
+    names = []
+    for i in range(count):
+        name = f"motion_2026010{i % 10}_{i:06d}.jpg"
+        with open(os.path.join(photo_dir, name), "wb") as f:
+            if Image is not None:
+                buffer = io.BytesIO()
+                Image.new("RGB", (640, 480), (40 * i % 256, 90, 160)).save(buffer, "JPEG")
+                f.write(buffer.getvalue())
+            else:
+                f.write(b"\xff\xd8\xff\xd9")
+        names.append(name)
+    return photo_dir, names
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Endpoint inconnu: {name} (valides: {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# ---------- requêtes ----------
+def dashboard(session, base_url, rng, photos):
+    return session.get(f"{base_url}/api/dashboard", timeout=30)
+
+
+def history(session, base_url, rng, photos):
+    return session.get(f"{base_url}/api/history/{rng.choice(SENSORS)}?limit={rng.choice(HISTORY_LIMITS)}", timeout=30)
+
+
+def photos_list(session, base_url, rng, photos):
+    return session.get(f"{base_url}/api/photos", timeout=30)
+
+
+def photo(session, base_url, rng, photos):
+    size = "?size=thumb" if Image is not None else ""
+    return session.get(f"{base_url}/api/photo/{rng.choice(photos)}{size}", timeout=30)
+
+
+def alarm(session, base_url, rng, photos):
+    return session.post(f"{base_url}/api/alarm", json={"state": rng.choice(("ON", "OFF"))}, timeout=30)
+
+
+def buzzer(session, base_url, rng, photos):
+    return session.post(f"{base_url}/api/buzzer", json={"state": rng.choice(("ON", "OFF"))}, timeout=30)
+
+
+ENDPOINTS = {
+    "dashboard": dashboard,
+    "history": history,
+    "photos": photos_list,
+    "photo": photo,
+    "alarm": alarm,
+    "buzzer": buzzer,
+}
+
+
+# ---------- clients ----------
+def new_stats():
+    return {"latencies": [], "ok": 0, "shed": 0, "errors": 0, "failures": {}}
+
+
+def client_loop(base_url, mix, photos, think, measure_start, deadline, seed, out):
+    """Un client: requêtes enchaînées (pause `think` entre deux), mesurées après l'échauffement"""
+    rng = random.Random(seed)
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {TEST_TOKEN}"
+    names, weights = list(mix), list(mix.values())
+    stats = {}
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            status = ENDPOINTS[name](session, base_url, rng, photos).status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+        if time.time() >= measure_start:
+            s = stats.setdefault(name, new_stats())
+            if isinstance(status, int) and status < 400:
+                s["ok"] += 1
+                s["latencies"].append(elapsed)
+            elif status in (429, 503):
+                s["shed"] += 1
+            else:
+                s["errors"] += 1
+                s["failures"][str(status)] = s["failures"].get(str(status), 0) + 1
+        if think:
+            time.sleep(rng.uniform(0.5, 1.5) * think)
+    out.put(stats)
+
+
+def merge(total, stats):
+    for name, s in stats.items():
+        t = total.setdefault(name, new_stats())
+        t["latencies"] += s["latencies"]
+        t["ok"] += s["ok"]
+        t["shed"] += s["shed"]
+        t["errors"] += s["errors"]
+        for kind, count in s["failures"].items():
+            t["failures"][kind] = t["failures"].get(kind, 0) + count
+
+
+def client_process(base_url, clients, mix, photos, think, measure_start, deadline, seed, results):
+    """Processus client: `clients` threads, résultats fusionnés avant envoi au parent"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    local = queue.Queue()
+    threads = [threading.Thread(target=client_loop,
+                                args=(base_url, mix, photos, think, measure_start, deadline, seed * 1000 + i, local))
+               for i in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    total = {}
+    while not local.empty():
+        merge(total, local.get())
+    results.put(total)
+
+
+def summarize(s, duration):
+    latencies = sorted(s["latencies"])
+    total = s["ok"] + s["shed"] + s["errors"]
+    return {
+        "requests": total,
+        "rps": s["ok"] / duration,
+        # None sans aucune mesure (affiché "-", palier hors objectif)
+        "p50": sample_percentile(latencies, 0.50) if latencies else None,
+        "p95": sample_percentile(latencies, 0.95) if latencies else None,
+        "p99": sample_percentile(latencies, 0.99) if latencies else None,
+        "max": latencies[-1] if latencies else None,
+        "error_rate": s["errors"] / total if total else 0.0,
+        "shed_rate": s["shed"] / total if total else 0.0,
+        "failures": s["failures"],          # code HTTP ou exception -> nombre
+    }
+
+
+def run_level(base_url, clients, args, mix, photos):
+    processes = min(clients, args.client_processes)
+    results = multiprocessing.Queue()
+    measure_start = time.time() + args.warmup
+    deadline = measure_start + args.duration
+    procs = []
+    for i in range(processes):
+        count = clients // processes + (1 if i < clients % processes else 0)
+        procs.append(multiprocessing.Process(
+            target=client_process,
+            args=(base_url, count, mix, photos, args.think, measure_start, deadline, args.seed + i, results)))
+    for p in procs:
+        p.start()
+    total = {}
+    for _ in procs:
+        merge(total, results.get())
+    for p in procs:
+        p.join()
+
+    everything = {}
+    for s in total.values():
+        merge(everything, {"all": s})
+    everything = everything.get("all", new_stats())
+    level = {"clients": clients, **summarize(everything, args.duration)}
+    level["endpoints"] = {name: summarize(s, args.duration) for name, s in sorted(total.items())}
+    return level
+
+
+def fmt_ms(seconds):
+    return "     -" if seconds is None else f"{seconds * 1000:6.0f}"
+
+
+def print_level(level, slo):
+    healthy = level["error_rate"] < 0.01 and level["p99"] is not None and level["p99"] <= slo
+    color = GREEN if healthy else (YELLOW if level["error_rate"] < 0.01 else RED)
+    print(f"{color}{level['clients']:>5} clients: {level['rps']:8.1f} req/s  p50 {fmt_ms(level['p50'])} ms  "
+          f"p95 {fmt_ms(level['p95'])} ms  p99 {fmt_ms(level['p99'])} ms  "
+          f"erreurs {level['error_rate'] * 100:5.1f}%  refus {level['shed_rate'] * 100:5.1f}%{RESET}")
+    for name, e in level["endpoints"].items():
+        print(f"      {name:<10} {e['rps']:8.1f} req/s  p50 {fmt_ms(e['p50'])}  p99 {fmt_ms(e['p99'])}  "
+              f"erreurs {e['error_rate'] * 100:5.1f}%  refus {e['shed_rate'] * 100:5.1f}%  ({e['requests']})"
+              + (f"  {e['failures']}" if e["failures"] else ""))
+    return healthy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'API REST par paliers de concurrence")
+    parser.add_argument("--levels", default="1,5,10,25,50,100,200,500", help="Clients concurrents par palier")
+    parser.add_argument("--duration", type=float, default=15, help="Durée mesurée de chaque palier (s)")
+    parser.add_argument("--warmup", type=float, default=3, help="Échauffement non mesuré (s)")
+    parser.add_argument("--think", type=float, default=0.0, help="Pause moyenne entre deux requêtes d'un client (s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Poids des endpoints (dashboard, history, photos, "
+                                                           "photo, alarm, buzzer)")
+    parser.add_argument("--slo", type=float, default=500, help="p99 visé (ms) pour la capacité annoncée")
+    parser.add_argument("--server", choices=("gunicorn", "dev"), default="gunicorn")
+    parser.add_argument("--url", help="API déjà démarrée (ne démarre rien)")
+    parser.add_argument("--api-workers", type=int, default=os.cpu_count() + 1)
+    parser.add_argument("--api-threads", type=int, default=4)
+    parser.add_argument("--rate-limit", action="store_true", help="Garde le limiteur de débit (un seul token ici)")
+    parser.add_argument("--client-processes", type=int, default=max(2, os.cpu_count()))
+    parser.add_argument("--photos", type=int, default=10, help="Photos de test")
+    parser.add_argument("--port", type=int, default=5057)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Écrit les résultats au format JSON dans ce fichier")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+
+    photo_dir, photos = make_photos(args.photos)
+    print(f"\n{YELLOW}{'=' * 60}")
+    print("TEST DE CHARGE - API REST")
+    print(f"{'=' * 60}{RESET}")
+    print(f"Machine: {os.cpu_count()} coeurs | Paliers: {args.levels} clients | Mélange: {args.mix}\n")
+
+    results = []
+    try:
+        base_url = args.url
+        if base_url is None:
+            print(f"{BLUE}Démarrage de l'API ({args.server})...{RESET}")
+            base_url = start_api(args.server, args.port, args.api_workers, args.api_threads, {
+                "PHOTO_DIR": photo_dir,
+                # Tous les clients partagent un token et une IP: sans cela, on mesurerait le limiteur
+                "RATE_LIMIT_ENABLED": "1" if args.rate_limit else "0",
+            })
+            if base_url is None:
+                print(f"{RED}Impossible de démarrer l'API{RESET}")
+                return 1
+            if requests.get(f"{base_url}/api/health", timeout=5).json().get("database") != "ok":
+                print(f"{YELLOW}Base de données injoignable: dashboard et history en erreur{RESET}")
+
+        for clients in [int(c) for c in args.levels.split(",")]:
+            level = run_level(base_url, clients, args, mix, photos)
+            level["healthy"] = print_level(level, args.slo / 1000)
+            results.append(level)
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}Interruption{RESET}")
+    finally:
+        cleanup()
+        shutil.rmtree(photo_dir, ignore_errors=True)
+
+    if results:
+        peak = max(results, key=lambda r: r["rps"])
+        healthy = [r for r in results if r["healthy"]]
+        print(f"\n{BLUE}Capacité{RESET}")
+        print(f"  Débit maximal: {peak['rps']:.1f} req/s à {peak['clients']} clients")
+        if healthy:
+            best = max(healthy, key=lambda r: r["clients"])
+            print(f"{GREEN}  Dans l'objectif (p99 <= {args.slo:.0f} ms, erreurs < 1%): jusqu'à {best['clients']} clients, "
+                  f"{best['rps']:.1f} req/s{RESET}")
+        else:
+            print(f"{RED}  Aucun palier dans l'objectif (p99 <= {args.slo:.0f} ms, erreurs < 1%){RESET}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpu_count": os.cpu_count(), "server": args.url or args.server, "mix": mix,
+                       "duration": args.duration, "think": args.think, "slo_p99_ms": args.slo,
+                       "levels": results}, f, indent=2)
+        print(f"\nRésultats → {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())